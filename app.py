@@ -1,8 +1,5 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from streamlit_plotly_events import plotly_events
 import io
 import os
 import database as db
@@ -24,23 +21,6 @@ def processar_dados(arquivo_mensal, arquivo_equipamentos):
         # Carregar dados
         df_mensal = pd.read_excel(arquivo_mensal)
         df_equipamentos = pd.read_excel(arquivo_equipamentos)
-        # --- Substituição direta dos nomes por setor ---
-        SETOR_MAP_EXATO = {
-            "Setor 3 GWSB e Vitor Hugo": ["Victor Hugo Nascimento Soares", "GWSB"],
-            "Setor 1 Paco Ruhan e LUKREFRIGERAÇÃO": ["Pako Ruhan", "LUKREFRIGERACAO"],
-            "Setor 5 RNCLIMATIZACAO e Robson": ["Robson Roque Bernardo", "RN CLIMATIZACAO"],
-            "Setor 4 ADS e Wando": ["Wanderley Souza da Silva", "ADS"],
-            "Setor 2 Renan e MVF": ["Renan de Souza Miranda", "MVF Climatizacao"],
-        }
-        def substituir_por_setor(colaborador):
-            for setor, nomes in SETOR_MAP_EXATO.items():
-                for nome in nomes:
-                    if nome.lower() in str(colaborador).lower():
-                        return setor
-            return colaborador
-        if 'Colaborador' in df_mensal.columns:
-            df_mensal['Colaborador'] = df_mensal['Colaborador'].apply(substituir_por_setor)
-        # ------------------------------------------------
         
         # Verificar se as colunas necessárias existem
         colunas_necessarias_mensal = ['Colaborador', 'Identificador', 'Cliente']
@@ -54,23 +34,6 @@ def processar_dados(arquivo_mensal, arquivo_equipamentos):
             if coluna not in df_equipamentos.columns:
                 st.error(f"Coluna '{coluna}' não encontrada na planilha de equipamentos.")
                 return None, None
-        # --- Substituição direta dos nomes por setor ---
-        SETOR_MAP_EXATO = {
-            "Setor 3 GWSB e Vitor Hugo": ["Victor Hugo Nascimento Soares", "GWSB"],
-            "Setor 1 Paco Ruhan e LUKREFRIGERAÇÃO": ["Pako Ruhan", "LUKREFRIGERACAO"],
-            "Setor 5 RNCLIMATIZACAO e Robson": ["Robson Roque Bernardo", "RN CLIMATIZACAO"],
-            "Setor 4 ADS e Wando": ["Wanderley Souza da Silva", "ADS"],
-            "Setor 2 Renan e MVF": ["Renan de Souza Miranda", "MVF Climatizacao"],
-        }
-        def substituir_por_setor(colaborador):
-            for setor, nomes in SETOR_MAP_EXATO.items():
-                for nome in nomes:
-                    if nome.lower() in str(colaborador).lower():
-                        return setor
-            return colaborador
-        if 'Colaborador' in df_mensal.columns:
-            df_mensal['Colaborador'] = df_mensal['Colaborador'].apply(substituir_por_setor)
-        # ------------------------------------------------
         
         # Importar dados para o banco de dados
         sucesso = db.importar_dados_excel(arquivo_mensal, arquivo_equipamentos)
@@ -91,6 +54,9 @@ def processar_dados(arquivo_mensal, arquivo_equipamentos):
 
 # Função para criar gráficos
 def criar_graficos(resumo_colaborador, total_por_colaborador, colaborador_selecionado=None):
+    # Módulos de gráficos importados só quando algum gráfico é exibido (início mais rápido do servidor)
+    import plotly.express as px
+    
     if colaborador_selecionado and colaborador_selecionado != "Todos":
         # Filtrar dados para o colaborador selecionado
         dados_filtrados = resumo_colaborador[resumo_colaborador['Colaborador'] == colaborador_selecionado]
@@ -196,6 +162,8 @@ def criar_graficos(resumo_colaborador, total_por_colaborador, colaborador_seleci
         
         # Gráfico interativo para clique
         st.subheader("Clique em um Colaborador para ver detalhes:")
+        import plotly.graph_objects as go
+        from streamlit_plotly_events import plotly_events
         fig_click = go.Figure()
         
         for i, row in total_por_colaborador.iterrows():
@@ -248,8 +216,8 @@ with st.sidebar:
     if st.button("🗑️ Limpar Dados Salvos"):
         # Criar tabelas novamente (limpa os dados)
         try:
-            db.Base.metadata.drop_all(db.engine)
-            db.Base.metadata.create_all(db.engine)
+            db.Base.metadata.drop_all(db.obter_engine())
+            db.Base.metadata.create_all(db.obter_engine())
             st.sidebar.success("Dados anteriores foram removidos com sucesso.")
         except Exception as e:
             st.sidebar.error(f"Erro ao limpar dados: {str(e)}")
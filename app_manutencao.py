@@ -1,30 +1,101 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import io
 import os
 from datetime import datetime
-import sqlite3
 import json
-import pytz  # Importar pytz para lidar com fusos horários
+from armazenamento import (
+    TIPO_MANUTENCAO_MENSAL,
+    TIPO_MANUTENCAO_SEMESTRAL,
+    TIPO_MANUTENCAO_CORRETIVA,
+    ORIGEM_EQUIPAMENTOS,
+    BancoOcupadoError,
+    COLUNAS_STATUS,
+    COLUNAS_FOTOS,
+    RETENCAO_VERSOES,
+    RETENCAO_MESES,
+    migrar,
+    salvar_ultima_atualizacao,
+    obter_ultima_atualizacao,
+    obter_fotos,
+    listar_snapshots,
+    fixar_snapshot,
+)
+from cache_compartilhado import (
+    obter_dados_manutencao,
+    obter_status_planilhas,
+    obter_cubo,
+    obter_indice_busca,
+    obter_ordem,
+    resumir_cubo,
+    totais_cubo,
+)
+from busca import BUSCA_EXATA, BUSCA_PREFIXO, BUSCA_CONTEM
+from tarefas import (
+    ESTADOS_ATIVOS,
+    enviar_atualizacao_diaria,
+    enviar_compactacao,
+    enviar_configuracao_inicial,
+    ha_tarefa_em_andamento,
+    marcar_tarefas_interrompidas,
+    obter_tarefa,
+    obter_tarefa_ativa,
+)
+from diagnostico import (
+    iniciar_execucao,
+    concluir_execucao,
+    iniciar_trecho,
+    concluir_trecho,
+    trecho,
+    linhas_da_arvore,
+    gravar_registro,
+)
+from memoria import iniciar_registro_periodico, resumo_memoria, tamanho_em_bytes
+
+# Definir variáveis globais para colunas de fotos a excluir (gravadas à parte, em anexos_fotos)
+FOTO_COLUMNS = COLUNAS_FOTOS
+
+# Rótulo de cada tipo de manutenção no seletor de visualização
+ROTULOS_TIPOS = {
+    TIPO_MANUTENCAO_MENSAL: "Mensal",
+    TIPO_MANUTENCAO_SEMESTRAL: "Semestral",
+    TIPO_MANUTENCAO_CORRETIVA: "Corretiva",
+}
 
-# Definir variáveis globais para colunas de fotos a excluir
-FOTO_COLUMNS = [
-    'FOTO 1 - ANTES - Tampa da Maquina Aberta com os Filtros SUJOS Instalados na Maquina.',
-    'FOTO 2 - ANTES - Foto com Etiqueta QRCODE (Mar Brasil) da Maquina.',
-    'FOTO 3 - ANTES - Foto com Etiqueta técnica da maquina (Etiqueta de Identificação do Fabricante na Evaporadora).',
-    'Foto 1 - DEPOIS - Tampa da Maquina Aberta com os Filtros LIMPOS Instalados na Maquina.',
-    'Foto 2 - DEPOIS - Limpeza geral da maquina e display de funcionamento (Se houver display)'
-]
+# Intervalo, em segundos, da consulta ao andamento de uma atualização em segundo plano
+INTERVALO_ACOMPANHAMENTO = 1
 
-# Definir tipos de manutenção
-TIPO_MANUTENCAO_MENSAL = 'mensal'
-TIPO_MANUTENCAO_SEMESTRAL = 'semestral'
-TIPO_MANUTENCAO_CORRETIVA = 'corretiva'
+# Opções de linhas por página na tabela de todos os equipamentos
+TAMANHOS_PAGINA = [50, 100, 250, 500]
+
+# Modos da busca por identificador e limite de equipamentos detalhados por busca
+ROTULOS_BUSCA = {
+    BUSCA_CONTEM: "Contém",
+    BUSCA_PREFIXO: "Começa com",
+    BUSCA_EXATA: "Exato",
+}
+LIMITE_RESULTADOS_BUSCA = 50
+
+# Equipamentos por página nos detalhes de um cliente (drill-down por Colaborador e por Cliente)
+TAMANHO_PAGINA_DETALHE = 50
+
+# Aviso para uma escrita que esperou demais pela gravação de uma atualização em segundo plano
+AVISO_BANCO_OCUPADO = "Há uma atualização gravando no banco de dados. Tente novamente quando ela terminar."
+
+# Função para registrar a data e hora da carga dos dados sem interromper a carga:
+# com o banco ocupado por uma gravação, a data fica para a próxima carga
+def registrar_data_da_carga():
+    if ha_tarefa_em_andamento():
+        # A atualização em segundo plano grava a data ao terminar
+        return
+    try:
+        salvar_ultima_atualizacao()
+    except BancoOcupadoError:
+        pass
 
-# Função para obter colunas excluídas (incluindo colunas de fotos)
+# Função para obter colunas excluídas (incluindo colunas de fotos e de status por tipo)
 def get_excluded_columns():
-    return ['Colaborador', 'Cliente', 'Identificador', 'Manutencao_Realizada'] + FOTO_COLUMNS
+    return ['Colaborador', 'Cliente', 'Identificador', 'Manutencao_Realizada'] + FOTO_COLUMNS + list(COLUNAS_STATUS.values())
 
 # Configuração da página
 st.set_page_config(
@@ -33,540 +104,169 @@ st.set_page_config(
     layout="wide"
 )
 
+# Diagnóstico de desempenho desta execução (?diagnostico=1 na URL ou MANUTENCAO_DIAGNOSTICO=1)
+iniciar_execucao("execucao", ativo=st.query_params.get("diagnostico") == "1")
+# Registro periódico da memória no arquivo de diagnóstico (iniciado uma vez por processo, se configurado)
+iniciar_registro_periodico()
+
 # Título principal
 st.title("Painel dos Oficiais e Credenciados")
 st.markdown("---")
 
-# Função para criar ou conectar ao banco de dados SQLite
-def get_db_connection():
-    conn = sqlite3.connect('manutencao.db')
-    
-    # Desativar temporariamente a verificação de chaves estrangeiras para permitir
-    # a exclusão das tabelas sem problemas
-    conn.execute("PRAGMA foreign_keys = OFF")
-    
-    # Create or recreate tables with the correct structure
-    # Vamos apenas criar as tabelas sem tentar excluí-las primeiro
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS planilha_mensal (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data_upload TEXT,
-        dados TEXT,
-        tipo_manutencao TEXT DEFAULT 'mensal'
-    )
-    ''')
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS planilha_semestral (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data_upload TEXT,
-        dados TEXT,
-        tipo_manutencao TEXT DEFAULT 'semestral'
-    )
-    ''')
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS planilha_corretiva (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data_upload TEXT,
-        dados TEXT,
-        tipo_manutencao TEXT DEFAULT 'corretiva'
-    )
-    ''')
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS equipamentos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data_upload TEXT,
-        dados TEXT
-    )
-    ''')
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS manutencoes_realizadas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data_upload TEXT,
-        identificador TEXT,
-        colaborador TEXT,
-        cliente TEXT,
-        data_manutencao TEXT,
-        tipo_manutencao TEXT,
-        cumprimento TEXT
-    )
-    ''')
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS ultima_atualizacao (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data_hora TEXT
-    )
-    ''')
-    return conn
+# Criar ou atualizar o esquema do banco de dados (executado uma vez por processo)
+migrar()
+# Atualizações deixadas pela metade por um processo anterior passam a constar como interrompidas (uma vez por processo)
+marcar_tarefas_interrompidas()
 
-# Função para obter a data e hora atual no fuso horário de São Paulo
-def obter_data_hora_sao_paulo():
-    # Definir o fuso horário de São Paulo
-    fuso_horario_sp = pytz.timezone('America/Sao_Paulo')
-    
-    # Obter a data e hora atual no fuso horário UTC
-    data_hora_utc = datetime.now(pytz.UTC)
-    
-    # Converter para o fuso horário de São Paulo
-    data_hora_sp = data_hora_utc.astimezone(fuso_horario_sp)
-    
-    # Formatar a data e hora
-    return data_hora_sp.strftime('%d/%m/%Y %H:%M:%S')
-
-# Função para salvar a data e hora da última atualização
-def salvar_ultima_atualizacao():
-    conn = get_db_connection()
-    
-    # Obter data e hora no fuso horário de São Paulo
-    data_hora_atual = obter_data_hora_sao_paulo()
-    
-    # Limpar tabela antes de inserir novo registro
-    conn.execute("DELETE FROM ultima_atualizacao")
-    
-    # Inserir nova data/hora
-    conn.execute(
-        "INSERT INTO ultima_atualizacao (data_hora) VALUES (?)",
-        (data_hora_atual,)
-    )
-    conn.commit()
-    conn.close()
-    return data_hora_atual
+# Função para exibir os equipamentos de um grupo em uma tabela paginada, com as informações adicionais.
+# Roda como fragmento: abrir o grupo ou trocar de página refaz apenas este trecho da tela, e nada
+# é montado enquanto o grupo estiver fechado (com sob_demanda=True).
+@st.fragment
+def exibir_equipamentos(dados, filtros, chave, rotulo=None, sob_demanda=True):
+    if sob_demanda and not st.toggle(rotulo, key=f"abrir_{chave}"):
+        return
+    
+    selecao = pd.Series(True, index=dados.index)
+    for coluna, valor in filtros.items():
+        selecao &= dados[coluna] == valor
+    equips = dados[selecao]
+    total_paginas = max(1, -(-len(equips) // TAMANHO_PAGINA_DETALHE))
+    pagina = 1
+    if total_paginas > 1:
+        pagina = st.number_input(f"Página (de {total_paginas}):", min_value=1, max_value=total_paginas, step=1, key=f"pagina_{chave}")
+    inicio = (pagina - 1) * TAMANHO_PAGINA_DETALHE
+    pagina_equips = equips.iloc[inicio:inicio + TAMANHO_PAGINA_DETALHE]
+    
+    # Informações adicionais: colunas fora das excluídas com algum valor nesta página
+    excluded_columns = get_excluded_columns()
+    info_columns = [
+        col for col in pagina_equips.columns
+        if col not in excluded_columns and (pagina_equips[col].notna() & pagina_equips[col].astype(str).str.strip().ne('')).any()
+    ]
+    
+    tabela = pd.DataFrame({
+        'Status': pagina_equips['Manutencao_Realizada'].map({True: "✅", False: "❌"}).to_numpy(),
+        'Identificador': pagina_equips['Identificador'].to_numpy(),
+        'Colaborador responsável': pagina_equips['Colaborador'].to_numpy(),
+    })
+    for col in info_columns:
+        tabela[col] = pagina_equips[col].to_numpy()
+    st.dataframe(tabela, hide_index=True, use_container_width=True)
+    if total_paginas > 1:
+        st.caption(f"Exibindo {inicio + 1}–{inicio + len(pagina_equips)} de {len(equips)} equipamentos.")
 
-# Função para obter a data e hora da última atualização
-def obter_ultima_atualizacao():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT data_hora FROM ultima_atualizacao ORDER BY id DESC LIMIT 1")
-    resultado = cursor.fetchone()
-    conn.close()
-    
-    if resultado:
-        return resultado[0]
-    else:
-        return "Nenhuma atualização registrada"
-
-# Função para salvar a planilha no banco de dados de acordo com o tipo
-def salvar_planilha(df, tipo_manutencao=TIPO_MANUTENCAO_MENSAL):
-    conn = get_db_connection()
-    # Converter o DataFrame para JSON
-    df_json = df.to_json(orient='records')
-    
-    # Determinar a tabela correta com base no tipo de manutenção
-    tabela = None
-    if tipo_manutencao == TIPO_MANUTENCAO_MENSAL:
-        tabela = "planilha_mensal"
-    elif tipo_manutencao == TIPO_MANUTENCAO_SEMESTRAL:
-        tabela = "planilha_semestral"
-    elif tipo_manutencao == TIPO_MANUTENCAO_CORRETIVA:
-        tabela = "planilha_corretiva"
-    else:
-        # Se não for um tipo conhecido, usar mensal como padrão
-        tabela = "planilha_mensal"
-    
-    # Salvar no banco de dados
-    conn.execute(
-        f"INSERT INTO {tabela} (data_upload, dados, tipo_manutencao) VALUES (?, ?, ?)",
-        (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), df_json, tipo_manutencao)
-    )
-    conn.commit()
-    conn.close()
+# Fragmento que acompanha uma atualização em segundo plano, refeito a cada segundo enquanto ela executa.
+# Ao terminar, recarrega a página inteira para exibir o resultado e a nova versão dos dados.
+@st.fragment(run_every=INTERVALO_ACOMPANHAMENTO)
+def acompanhar_tarefa(tarefa_id):
+    tarefa = obter_tarefa(tarefa_id)
+    if tarefa is None or tarefa['estado'] not in ESTADOS_ATIVOS:
+        st.rerun()
+    st.markdown("### Atualização em andamento")
+    texto = tarefa['fase'] or ""
+    if tarefa.get('linhas'):
+        texto += f" ({tarefa['linhas']} linhas)"
+    st.progress(tarefa.get('fracao', 0.0), text=texto)
+    st.caption("Os dados atuais continuam disponíveis até a atualização terminar.")
 
-# Função para salvar a planilha mensal no banco de dados (mantida para compatibilidade)
-def salvar_planilha_mensal(df):
-    salvar_planilha(df, TIPO_MANUTENCAO_MENSAL)
+# Função para exibir o andamento ou o resultado da atualização em segundo plano da sessão
+def exibir_tarefa(tarefa_id):
+    tarefa = obter_tarefa(tarefa_id)
+    if tarefa is None:
+        return
+    if tarefa['estado'] in ESTADOS_ATIVOS:
+        acompanhar_tarefa(tarefa_id)
+        return
+    
+    for nivel, texto in tarefa['mensagens']:
+        getattr(st, nivel)(texto)
+    
+    # Selecionar na sessão os dados da atualização (uma vez, antes de criar os seletores)
+    resultado = tarefa['resultado']
+    if st.session_state.get('tarefa_aplicada') != tarefa_id:
+        st.session_state['tarefa_aplicada'] = tarefa_id
+        if resultado.get('dados_selecionados'):
+            st.session_state['dados_selecionados'] = resultado['dados_selecionados']
+            st.session_state['tipo_visualizacao'] = ROTULOS_TIPOS[resultado['tipo_visualizacao']]
 
-# Função para salvar a planilha de equipamentos no banco de dados
-def salvar_equipamentos(df):
-    conn = get_db_connection()
-    # Converter o DataFrame para JSON
-    df_json = df.to_json(orient='records')
-    # Salvar no banco de dados
-    conn.execute(
-        "INSERT INTO equipamentos (data_upload, dados) VALUES (?, ?)",
-        (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), df_json)
+# Função para exibir o catálogo de versões das planilhas, com a fixação e a compactação manual
+def exibir_versoes(tarefa_em_andamento):
+    catalogo = listar_snapshots()
+    if catalogo.empty:
+        st.info("Nenhuma versão de planilha armazenada.")
+        return
+    st.dataframe(
+        catalogo[['origem', 'id', 'data_upload', 'linhas', 'atual', 'fixado']],
+        hide_index=True,
+        use_container_width=True,
     )
-    conn.commit()
-    conn.close()
-
-# Função para obter a planilha mensal mais recente
-def obter_planilha_mensal():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT dados FROM planilha_mensal ORDER BY id DESC LIMIT 1")
-    resultado = cursor.fetchone()
-    conn.close()
-    
-    if resultado:
-        # Converter JSON de volta para DataFrame
-        return pd.read_json(resultado[0], orient='records')
-    return None
-
-# Função para obter a planilha de equipamentos mais recente
-def obter_equipamentos():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT dados FROM equipamentos ORDER BY id DESC LIMIT 1")
-    resultado = cursor.fetchone()
-    conn.close()
     
-    if resultado:
-        # Converter JSON de volta para DataFrame
-        return pd.read_json(resultado[0], orient='records')
-    return None
-
-# Função para combinar dados da planilha mensal com a de equipamentos
-def combinar_dados():
-    df_mensal = obter_planilha_mensal()
-    df_equipamentos = obter_equipamentos()
-    
-    if df_mensal is None or df_equipamentos is None:
-        return None
-    
-    # Garantir que ambos os dataframes tenham a coluna 'Identificador'
-    if 'Identificador' not in df_mensal.columns or 'Identificador' not in df_equipamentos.columns:
-        st.error("As planilhas devem conter a coluna 'Identificador' para a combinação de dados.")
-        return None
-    
-    # Combinar os dados com base no identificador
-    df_combinado = pd.merge(
-        df_mensal,
-        df_equipamentos,
-        on='Identificador',
-        how='left',
-        suffixes=('', '_equip')
+    # Versões fixadas nunca são removidas pela compactação
+    opcoes = list(catalogo[['origem', 'id', 'fixado']].itertuples(index=False, name=None))
+    escolhida = st.selectbox(
+        "Versão",
+        opcoes,
+        format_func=lambda opcao: f"{opcao[0]} #{opcao[1]}{' (fixada)' if opcao[2] else ''}",
+        key="versao_fixar",
     )
-    
-    return df_combinado
-
-# Função para registrar manutenções realizadas
-def registrar_manutencao(df_diaria, tipo_manutencao=TIPO_MANUTENCAO_MENSAL):
-    conn = None
-    try:
-        conn = get_db_connection()
-        data_atual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Obter registros da planilha inicial para o tipo de manutenção atual
-        cursor = conn.cursor()
-        
-        # Verificar qual tabela consultar para obter os dados iniciais
-        tabela_inicial = "planilha_mensal"
-        if tipo_manutencao == TIPO_MANUTENCAO_SEMESTRAL:
-            tabela_inicial = "planilha_semestral"
-        elif tipo_manutencao == TIPO_MANUTENCAO_CORRETIVA:
-            tabela_inicial = "planilha_corretiva"
-        
-        # Consultar dados iniciais mais recentes
-        cursor.execute(f"SELECT dados FROM {tabela_inicial} ORDER BY id DESC LIMIT 1")
-        resultado_inicial = cursor.fetchone()
-        
-        if resultado_inicial:
-            # Carregar dados iniciais
-            import io
-            try:
-                df_inicial = pd.read_json(io.StringIO(resultado_inicial[0]), orient='records')
-            except Exception as json_err:
-                st.error(f"Erro ao carregar JSON: {str(json_err)}")
-                # Tentar método alternativo
-                dados_json = resultado_inicial[0]
-                if isinstance(dados_json, str):
-                    df_inicial = pd.read_json(dados_json, orient='records')
-            
-            # Para cada registro na planilha diária (que representa manutenção realizada)
-            st.info(f"Processando {len(df_diaria)} registros da planilha diária...")
-            registros_processados = 0
-            
-            for index, row in df_diaria.iterrows():
-                # Extrair identificador da planilha diária
-                identificador = str(row.get('Identificador', ''))
-                data_manutencao = str(row.get('Data', datetime.now().strftime('%Y-%m-%d')))
-                
-                # Se não tem identificador, pular
-                if not identificador or identificador == 'nan' or identificador == 'None':
-                    continue
-                
-                # Verificar se este identificador existe na planilha inicial
-                # Usar apenas o identificador como chave para registrar manutenções
-                # Isso resolve o problema de duplicidade
-                if 'Identificador' in df_inicial.columns:
-                    # Verificar se já existe registro para este identificador
-                    cursor.execute(
-                        "SELECT COUNT(*) FROM manutencoes_realizadas WHERE identificador = ? AND tipo_manutencao = ?",
-                        (identificador, tipo_manutencao)
-                    )
-                    ja_registrado = cursor.fetchone()[0] > 0
-                    
-                    if ja_registrado:
-                        # Já existe registro para este identificador, pular
-                        continue
-                    
-                    # Encontrar todos os registros correspondentes na planilha inicial com este identificador
-                    registros_iniciais = df_inicial[df_inicial['Identificador'].astype(str) == identificador]
-                    
-                    if not registros_iniciais.empty:
-                        # Para cada registro inicial correspondente, pegar colaborador e cliente
-                        for idx, reg_inicial in registros_iniciais.iterrows():
-                            colaborador = str(reg_inicial.get('Colaborador', ''))
-                            cliente = str(reg_inicial.get('Cliente', ''))
-                            
-                            # Marcar como manutenção realizada para este identificador
-                            conn.execute(
-                                "INSERT INTO manutencoes_realizadas (data_upload, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, cumprimento) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                (data_atual, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, 'Sim')
-                            )
-                            registros_processados += 1
-                    else:
-                        # Se não encontrou na planilha inicial, pegar cliente e colaborador da planilha diária
-                        colaborador = str(row.get('Colaborador', ''))
-                        cliente = str(row.get('Cliente', ''))
-                        
-                        # Usar dados da planilha diária se estiverem disponíveis
-                        if colaborador and cliente and colaborador != 'nan' and cliente != 'nan' and colaborador != 'None' and cliente != 'None':
-                            conn.execute(
-                                "INSERT INTO manutencoes_realizadas (data_upload, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, cumprimento) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                (data_atual, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, 'Sim')
-                            )
-                            registros_processados += 1
-            
-            st.success(f"Total de {registros_processados} manutenções registradas com sucesso!")
+    origem, snapshot_id, fixado = escolhida
+    if st.button("Liberar versão" if fixado else "Fixar versão", disabled=tarefa_em_andamento):
+        try:
+            fixar_snapshot(origem, snapshot_id, not fixado)
+        except BancoOcupadoError:
+            st.warning(AVISO_BANCO_OCUPADO)
         else:
-            # Se não encontrou registros iniciais, continuar com o processo antigo
-            st.warning("Não foram encontrados dados iniciais. Processando apenas com dados da planilha diária.")
-            for index, row in df_diaria.iterrows():
-                identificador = str(row.get('Identificador', ''))
-                colaborador = str(row.get('Colaborador', ''))
-                cliente = str(row.get('Cliente', ''))
-                data_manutencao = str(row.get('Data', datetime.now().strftime('%Y-%m-%d')))
-                
-                if identificador and colaborador and cliente and identificador != 'nan' and colaborador != 'nan' and cliente != 'nan':
-                    # Verificar se já existe registro para este identificador
-                    cursor.execute(
-                        "SELECT COUNT(*) FROM manutencoes_realizadas WHERE identificador = ? AND tipo_manutencao = ?",
-                        (identificador, tipo_manutencao)
-                    )
-                    ja_registrado = cursor.fetchone()[0] > 0
-                    
-                    if not ja_registrado:
-                        conn.execute(
-                            "INSERT INTO manutencoes_realizadas (data_upload, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, cumprimento) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                            (data_atual, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, 'Sim')
-                        )
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        st.error(f"Erro ao registrar manutenções: {str(e)}")
-        if conn:
-            try:
-                conn.close()
-            except:
-                pass
+            st.rerun()
+    
+    st.caption(
+        f"A compactação mantém as {RETENCAO_VERSOES} versões mais recentes de cada planilha, "
+        f"a última versão de cada um dos {RETENCAO_MESES} meses mais recentes e as versões fixadas."
+    )
+    if st.button("Compactar agora", disabled=tarefa_em_andamento):
+        st.session_state['tarefa_id'] = enviar_compactacao()
+        st.rerun()
 
-# Função para verificar se um equipamento já recebeu manutenção
-def verificar_manutencao_realizada(identificador, colaborador=None, cliente=None, tipo_manutencao=None):
+# Função para carregar os dados armazenados (planilha mensal combinada com a de equipamentos)
+def processar_dados_manutencao():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Construir a consulta base (usar apenas identificador, sem depender de cliente e colaborador)
-        consulta = "SELECT COUNT(*) FROM manutencoes_realizadas WHERE identificador = ?"
-        parametros = [identificador]
+        # Verificar se existem planilha mensal e de equipamentos armazenadas
+        status_planilhas = obter_status_planilhas()
         
-        # Adicionar filtro por tipo de manutenção, se fornecido
-        if tipo_manutencao and tipo_manutencao in [TIPO_MANUTENCAO_MENSAL, TIPO_MANUTENCAO_SEMESTRAL, TIPO_MANUTENCAO_CORRETIVA]:
-            consulta += " AND tipo_manutencao = ?"
-            parametros.append(tipo_manutencao)
-        
-        # Executar a consulta
-        cursor.execute(consulta, parametros)
-        resultado = cursor.fetchone()
-        conn.close()
-        return bool(resultado and resultado[0] > 0)
-    except Exception as e:
-        st.error(f"Erro ao verificar manutenção: {str(e)}")
-        return False
-
-# Função para processar os dados das planilhas
-def processar_dados_manutencao(arquivo_mensal=None, arquivo_equipamentos=None, arquivo_diario=None, usar_armazenado=False):
-    try:
-        # Se usar_armazenado for True, carregar dados do banco de dados
-        if usar_armazenado:
-            # Obter planilha mensal mais recente
-            df_mensal = obter_planilha_mensal()
-            # Obter planilha de equipamentos mais recente
-            df_equipamentos = obter_equipamentos()
+        if status_planilhas[TIPO_MANUTENCAO_MENSAL] and status_planilhas['equipamentos']:
+            # Dados combinados compartilhados entre as sessões (refeitos apenas quando os dados mudam)
+            df_combinado = obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL)
             
-            if df_mensal is not None and df_equipamentos is not None:
-                # Combinar dados
-                df_combinado = combinar_dados()
+            if df_combinado is not None:
+                # Atualizar a data e hora da última atualização
+                registrar_data_da_carga()
                 
-                if df_combinado is not None:
-                    # Atualizar a data e hora da última atualização
-                    salvar_ultima_atualizacao()
-                    
-                    # Armazenar na sessão
-                    st.session_state['dados_carregados'] = df_combinado
-                    return df_combinado
-                else:
-                    st.error("Erro ao combinar os dados.")
-                    return None
+                # Guardar na sessão apenas a seleção; o DataFrame fica no cache compartilhado
+                st.session_state['dados_selecionados'] = TIPO_MANUTENCAO_MENSAL
+                return df_combinado
             else:
-                st.error("Não foi possível carregar os dados armazenados.")
+                st.error("Erro ao combinar os dados.")
                 return None
+        else:
+            st.error("Não foi possível carregar os dados armazenados.")
+            return None
     except Exception as e:
         st.error(f"Erro ao processar dados: {str(e)}")
         return None
-        
-    # Processar planilha mensal e de equipamentos
-    if usar_armazenado:
-        df_combinado = combinar_dados()
-        if df_combinado is None and (arquivo_mensal is None or arquivo_equipamentos is None):
-            st.error("Não há dados armazenados. Faça o upload das planilhas mensal e de equipamentos.")
-            return None
-    else:
-        # Se foram fornecidos arquivos para a planilha mensal e de equipamentos
-        if arquivo_mensal is not None and arquivo_equipamentos is not None:
-            try:
-                df_mensal = pd.read_excel(arquivo_mensal)
-                df_equipamentos = pd.read_excel(arquivo_equipamentos)
-                # --- Substituição direta dos nomes por setor ---
-                SETOR_MAP_EXATO = {
-                    "Setor 3 GWSB e Vitor Hugo": ["Victor Hugo Nascimento Soares", "GWSB"],
-                    "Setor 1 Paco Ruhan e LUKREFRIGERAÇÃO": ["Pako Ruhan", "LUKREFRIGERACAO"],
-                    "Setor 5 RNCLIMATIZACAO e Robson": ["Robson Roque Bernardo", "RN CLIMATIZACAO"],
-                    "Setor 4 ADS e Wando": ["Wanderley Souza da Silva", "ADS"],
-                    "Setor 2 Renan e MVF": ["Renan de Souza Miranda", "MVF Climatizacao"],
-                }
-                def substituir_por_setor(colaborador):
-                    for setor, nomes in SETOR_MAP_EXATO.items():
-                        for nome in nomes:
-                            if nome.lower() in str(colaborador).lower():
-                                return setor
-                    return colaborador
-                if 'Colaborador' in df_mensal.columns:
-                    df_mensal['Colaborador'] = df_mensal['Colaborador'].apply(substituir_por_setor)
-                # ------------------------------------------------
-                
-                # Verificar colunas necessárias
-                if 'Identificador' not in df_mensal.columns:
-                    st.error("A planilha mensal deve conter a coluna 'Identificador'.")
-                    return None
-                
-                if 'Identificador' not in df_equipamentos.columns:
-                    st.error("A planilha de equipamentos deve conter a coluna 'Identificador'.")
-                    return None
-                
-                # Limpar a tabela de manutenções realizadas para que todas comecem como "não realizadas"
-                try:
-                    conn = get_db_connection()
-                    # Verificar se a tabela existe antes de tentar excluir os dados
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='manutencoes_realizadas'")
-                    if cursor.fetchone():
-                        conn.execute("DELETE FROM manutencoes_realizadas")
-                    conn.commit()
-                    conn.close()
-                except Exception as e:
-                    st.error(f"Erro ao limpar tabela de manutenções: {str(e)}")
-                
-                # Salvar ambas as planilhas no banco de dados
-                salvar_planilha_mensal(df_mensal)
-                salvar_equipamentos(df_equipamentos)
-                
-                # Combinar os dados
-                df_combinado = pd.merge(
-                    df_mensal,
-                    df_equipamentos,
-                    on='Identificador',
-                    how='left',
-                    suffixes=('', '_equip')
-                )
-            except Exception as e:
-                st.error(f"Erro ao processar as planilhas: {str(e)}")
-                return None
-        else:
-            # Se não foram fornecidos os arquivos necessários e não estamos usando dados armazenados
-            return None
-    
-    # Se o arquivo diário foi fornecido, processá-lo
-    if arquivo_diario is not None:
-        try:
-            df_diario = pd.read_excel(arquivo_diario)
-            # --- Substituição direta dos nomes por setor ---
-            SETOR_MAP_EXATO = {
-                "Setor 3 GWSB e Vitor Hugo": ["Victor Hugo Nascimento Soares", "GWSB"],
-                "Setor 1 Paco Ruhan e LUKREFRIGERAÇÃO": ["Pako Ruhan", "LUKREFRIGERACAO"],
-                "Setor 5 RNCLIMATIZACAO e Robson": ["Robson Roque Bernardo", "RN CLIMATIZACAO"],
-                "Setor 4 ADS e Wando": ["Wanderley Souza da Silva", "ADS"],
-                "Setor 2 Renan e MVF": ["Renan de Souza Miranda", "MVF Climatizacao"],
-            }
-            def substituir_por_setor(colaborador):
-                for setor, nomes in SETOR_MAP_EXATO.items():
-                    for nome in nomes:
-                        if nome.lower() in str(colaborador).lower():
-                            return setor
-                return colaborador
-            if 'Colaborador' in df_diario.columns:
-                df_diario['Colaborador'] = df_diario['Colaborador'].apply(substituir_por_setor)
-            # ------------------------------------------------
-            # Registrar as manutenções realizadas no banco de dados
-            registrar_manutencao(df_diario)
-        except Exception as e:
-            st.error(f"Erro ao processar a planilha diária: {str(e)}")
-            return None
-    
-    # Se chegou até aqui, pelo menos temos os dados combinados
-    if 'df_combinado' in locals() and df_combinado is not None:
-        # Atualizar a data e hora da última atualização
-        salvar_ultima_atualizacao()
-        
-        # --- Substituição direta dos nomes por setor ---
-        SETOR_MAP_EXATO = {
-            "Setor 3 GWSB e Vitor Hugo": ["Victor Hugo Nascimento Soares", "GWSB"],
-            "Setor 1 Paco Ruhan e LUKREFRIGERAÇÃO": ["Pako Ruhan", "LUKREFRIGERACAO"],
-            "Setor 5 RNCLIMATIZACAO e Robson": ["Robson Roque Bernardo", "RN CLIMATIZACAO"],
-            "Setor 4 ADS e Wando": ["Wanderley Souza da Silva", "ADS"],
-            "Setor 2 Renan e MVF": ["Renan de Souza Miranda", "MVF Climatizacao"],
-        }
-        def substituir_por_setor(colaborador):
-            for setor, nomes in SETOR_MAP_EXATO.items():
-                for nome in nomes:
-                    if nome.lower() in str(colaborador).lower():
-                        return setor
-            return colaborador
-        if 'Colaborador' in df_combinado.columns:
-            df_combinado['Colaborador'] = df_combinado['Colaborador'].apply(substituir_por_setor)
-        # ------------------------------------------------
-        # Adicionar status de manutenção para cada identificador
-        for index, row in df_combinado.iterrows():
-            identificador = str(row.get('Identificador', ''))
-            colaborador = str(row.get('Colaborador', ''))
-            cliente = str(row.get('Cliente', ''))
-            df_combinado.at[index, 'Manutencao_Realizada'] = verificar_manutencao_realizada(identificador, colaborador, cliente)
-        return df_combinado
-    else:
-        # Se não temos os dados combinados, tentar usar os dados armazenados
-        if usar_armazenado:
-            df_combinado = combinar_dados()
-            if df_combinado is not None:
-                # Atualizar a data e hora da última atualização
-                salvar_ultima_atualizacao()
-                
-                # Adicionar status de manutenção para cada identificador
-                for index, row in df_combinado.iterrows():
-                    identificador = str(row.get('Identificador', ''))
-                    colaborador = str(row.get('Colaborador', ''))
-                    cliente = str(row.get('Cliente', ''))
-                    df_combinado.at[index, 'Manutencao_Realizada'] = verificar_manutencao_realizada(
-                        identificador, colaborador, cliente
-                    )
-                
-                return df_combinado
-    
-    return None
+
+# Atualização em segundo plano desta sessão; depois de recarregar a página, reconectar à que estiver em andamento
+if 'tarefa_id' not in st.session_state:
+    tarefa_ativa = obter_tarefa_ativa()
+    if tarefa_ativa is not None:
+        st.session_state['tarefa_id'] = tarefa_ativa['id']
+tarefa_em_andamento = ha_tarefa_em_andamento()
 
 # Interface principal
-with st.sidebar:
+with st.sidebar, trecho("barra_lateral"):
     st.header("Configurações")
     
+    if 'tarefa_id' in st.session_state:
+        exibir_tarefa(st.session_state['tarefa_id'])
+    
     # Tabs para upload das planilhas
     tab1, tab2 = st.tabs(["Configuração Inicial", "Atualização Diária"])
     
@@ -575,26 +275,11 @@ with st.sidebar:
         st.write("Este passo é realizado apenas uma vez no início do mês")
         
         # Verificar se já existem dados no banco de dados
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verificar planilha mensal
-        cursor.execute("SELECT COUNT(*) FROM planilha_mensal")
-        tem_mensal = cursor.fetchone()[0] > 0
-        
-        # Verificar planilha semestral
-        cursor.execute("SELECT COUNT(*) FROM planilha_semestral")
-        tem_semestral = cursor.fetchone()[0] > 0
-        
-        # Verificar planilha corretiva
-        cursor.execute("SELECT COUNT(*) FROM planilha_corretiva")
-        tem_corretiva = cursor.fetchone()[0] > 0
-        
-        # Verificar equipamentos
-        cursor.execute("SELECT COUNT(*) FROM equipamentos")
-        tem_equipamentos = cursor.fetchone()[0] > 0
-        
-        conn.close()
+        status_planilhas = obter_status_planilhas()
+        tem_mensal = status_planilhas[TIPO_MANUTENCAO_MENSAL]
+        tem_semestral = status_planilhas[TIPO_MANUTENCAO_SEMESTRAL]
+        tem_corretiva = status_planilhas[TIPO_MANUTENCAO_CORRETIVA]
+        tem_equipamentos = status_planilhas['equipamentos']
         
         # Mostrar status das planilhas carregadas
         st.markdown("### Status das Planilhas")
@@ -617,116 +302,22 @@ with st.sidebar:
         uploaded_corretiva = st.file_uploader("Selecione a planilha CORRETIVA", type=["xls", "xlsx"], key="planilha_corretiva")
         uploaded_equipamentos = st.file_uploader("Selecione a planilha de EQUIPAMENTOS", type=["xls", "xlsx"], key="equipamentos")
         
-        if st.button("Carregar e Salvar Todas as Planilhas"):
-            with st.spinner("Processando todas as planilhas..."):
-                # Limpar todas as tabelas de manutenções realizadas
-                try:
-                    conn = get_db_connection()
-                    # Verificar se a tabela existe antes de tentar excluir os dados
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='manutencoes_realizadas'")
-                    if cursor.fetchone():
-                        conn.execute("DELETE FROM manutencoes_realizadas")
-                    conn.commit()
-                    conn.close()
-                except Exception as e:
-                    st.error(f"Erro ao limpar tabela de manutenções: {str(e)}")
-                
-                # Flag para rastrear se pelo menos uma planilha foi processada com sucesso
-                alguma_planilha_processada = False
-                
-                # Processar planilha de equipamentos primeiro (necessária para todos os tipos)
-                if uploaded_equipamentos is not None:
-                    try:
-                        df_equipamentos = pd.read_excel(uploaded_equipamentos)
-                        
-                        # Verificar coluna identificador
-                        if 'Identificador' not in df_equipamentos.columns:
-                            st.error("A planilha de equipamentos deve conter a coluna 'Identificador'.")
-                        else:
-                            # Salvar equipamentos
-                            salvar_equipamentos(df_equipamentos)
-                            st.success("Planilha de equipamentos carregada com sucesso!")
-                            
-                            # Processar cada tipo de planilha
-                            if uploaded_mensal is not None:
-                                try:
-                                    df_mensal = pd.read_excel(uploaded_mensal)
-                                    if 'Identificador' not in df_mensal.columns:
-                                        st.warning("A planilha mensal deve conter a coluna 'Identificador'. Esta planilha foi ignorada.")
-                                    else:
-                                        # Salvar planilha mensal
-                                        salvar_planilha(df_mensal, TIPO_MANUTENCAO_MENSAL)
-                                        
-                                        # Combinar dados para mensal
-                                        df_combinado_mensal = pd.merge(
-                                            df_mensal, df_equipamentos,
-                                            on='Identificador', how='left', suffixes=('', '_equip')
-                                        )
-                                        
-                                        st.success("Planilha mensal processada com sucesso!")
-                                        alguma_planilha_processada = True
-                                        
-                                        # Armazenar na sessão (último tipo processado)
-                                        st.session_state['dados_carregados'] = df_combinado_mensal
-                                        st.session_state['tipo_manutencao_atual'] = TIPO_MANUTENCAO_MENSAL
-                                except Exception as e:
-                                    st.error(f"Erro ao processar a planilha mensal: {str(e)}")
-                            
-                            if uploaded_semestral is not None:
-                                try:
-                                    df_semestral = pd.read_excel(uploaded_semestral)
-                                    if 'Identificador' not in df_semestral.columns:
-                                        st.warning("A planilha semestral deve conter a coluna 'Identificador'. Esta planilha foi ignorada.")
-                                    else:
-                                        # Salvar planilha semestral
-                                        salvar_planilha(df_semestral, TIPO_MANUTENCAO_SEMESTRAL)
-                                        
-                                        # Combinar dados para semestral
-                                        df_combinado_semestral = pd.merge(
-                                            df_semestral, df_equipamentos,
-                                            on='Identificador', how='left', suffixes=('', '_equip')
-                                        )
-                                        
-                                        st.success("Planilha semestral processada com sucesso!")
-                                        alguma_planilha_processada = True
-                                        
-                                        # Armazenar na sessão (último tipo processado)
-                                        st.session_state['dados_carregados'] = df_combinado_semestral
-                                        st.session_state['tipo_manutencao_atual'] = TIPO_MANUTENCAO_SEMESTRAL
-                                except Exception as e:
-                                    st.error(f"Erro ao processar a planilha semestral: {str(e)}")
-                            
-                            if uploaded_corretiva is not None:
-                                try:
-                                    df_corretiva = pd.read_excel(uploaded_corretiva)
-                                    if 'Identificador' not in df_corretiva.columns:
-                                        st.warning("A planilha corretiva deve conter a coluna 'Identificador'. Esta planilha foi ignorada.")
-                                    else:
-                                        # Salvar planilha corretiva
-                                        salvar_planilha(df_corretiva, TIPO_MANUTENCAO_CORRETIVA)
-                                        
-                                        # Combinar dados para corretiva
-                                        df_combinado_corretiva = pd.merge(
-                                            df_corretiva, df_equipamentos,
-                                            on='Identificador', how='left', suffixes=('', '_equip')
-                                        )
-                                        
-                                        st.success("Planilha corretiva processada com sucesso!")
-                                        alguma_planilha_processada = True
-                                        
-                                        # Armazenar na sessão (último tipo processado)
-                                        st.session_state['dados_carregados'] = df_combinado_corretiva
-                                        st.session_state['tipo_manutencao_atual'] = TIPO_MANUTENCAO_CORRETIVA
-                                except Exception as e:
-                                    st.error(f"Erro ao processar a planilha corretiva: {str(e)}")
-                            
-                            if not alguma_planilha_processada:
-                                st.warning("Nenhuma planilha de manutenção foi processada. Carregue pelo menos uma planilha (Mensal, Semestral ou Corretiva).")
-                    except Exception as e:
-                        st.error(f"Erro ao processar a planilha de equipamentos: {str(e)}")
-                else:
-                    st.error("A planilha de equipamentos é obrigatória para a configuração inicial.")
+        if st.button("Carregar e Salvar Todas as Planilhas", disabled=tarefa_em_andamento):
+            # Processar planilha de equipamentos primeiro (necessária para todos os tipos)
+            if uploaded_equipamentos is not None:
+                planilhas_iniciais = {
+                    ORIGEM_EQUIPAMENTOS: uploaded_equipamentos,
+                    TIPO_MANUTENCAO_MENSAL: uploaded_mensal,
+                    TIPO_MANUTENCAO_SEMESTRAL: uploaded_semestral,
+                    TIPO_MANUTENCAO_CORRETIVA: uploaded_corretiva,
+                }
+                # A leitura e a gravação acontecem em segundo plano; o progresso aparece acima
+                st.session_state['tarefa_id'] = enviar_configuracao_inicial(
+                    {origem: arquivo for origem, arquivo in planilhas_iniciais.items() if arquivo is not None}
+                )
+                st.rerun()
+            else:
+                st.error("A planilha de equipamentos é obrigatória para a configuração inicial.")
     
     with tab2:
         st.subheader("Atualização Diária")
@@ -739,85 +330,35 @@ with st.sidebar:
         uploaded_semestral_diario = st.file_uploader("Selecione a planilha diária SEMESTRAL", type=["xls", "xlsx"], key="diario_semestral")
         uploaded_corretiva_diario = st.file_uploader("Selecione a planilha diária CORRETIVA", type=["xls", "xlsx"], key="diario_corretiva")
         
-        if st.button("Processar Todas as Planilhas Diárias"):
-            with st.spinner("Processando todas as planilhas diárias..."):
-                # Flag para rastrear se pelo menos uma planilha foi processada
-                alguma_diaria_processada = False
-                ultimo_tipo_processado = None
-                
-                # Processar cada tipo de planilha diária
-                if uploaded_mensal_diario is not None:
-                    try:
-                        df_diario_mensal = pd.read_excel(uploaded_mensal_diario)
-                        
-                        # Registrar as manutenções (com o tipo específico)
-                        registrar_manutencao(df_diario_mensal, TIPO_MANUTENCAO_MENSAL)
-                        
-                        st.success("Planilha diária mensal processada com sucesso!")
-                        alguma_diaria_processada = True
-                        ultimo_tipo_processado = TIPO_MANUTENCAO_MENSAL
-                    except Exception as e:
-                        st.error(f"Erro ao processar a planilha diária mensal: {str(e)}")
-                
-                if uploaded_semestral_diario is not None:
-                    try:
-                        df_diario_semestral = pd.read_excel(uploaded_semestral_diario)
-                        
-                        # Registrar as manutenções (com o tipo específico)
-                        registrar_manutencao(df_diario_semestral, TIPO_MANUTENCAO_SEMESTRAL)
-                        
-                        st.success("Planilha diária semestral processada com sucesso!")
-                        alguma_diaria_processada = True
-                        ultimo_tipo_processado = TIPO_MANUTENCAO_SEMESTRAL
-                    except Exception as e:
-                        st.error(f"Erro ao processar a planilha diária semestral: {str(e)}")
-                
-                if uploaded_corretiva_diario is not None:
-                    try:
-                        df_diario_corretiva = pd.read_excel(uploaded_corretiva_diario)
-                        
-                        # Registrar as manutenções (com o tipo específico)
-                        registrar_manutencao(df_diario_corretiva, TIPO_MANUTENCAO_CORRETIVA)
-                        
-                        st.success("Planilha diária corretiva processada com sucesso!")
-                        alguma_diaria_processada = True
-                        ultimo_tipo_processado = TIPO_MANUTENCAO_CORRETIVA
-                    except Exception as e:
-                        st.error(f"Erro ao processar a planilha diária corretiva: {str(e)}")
-                
-                # Se alguma planilha foi processada, atualizar a visualização
-                if alguma_diaria_processada and ultimo_tipo_processado is not None:
-                    # Obter os dados para exibição
-                    df_combinado = combinar_dados()
-                    
-                    if df_combinado is not None:
-                        # Atualizar a data e hora da última atualização
-                        salvar_ultima_atualizacao()
-                        
-                        # Adicionar status de manutenção para cada identificador, filtrando pelo tipo
-                        for index, row in df_combinado.iterrows():
-                            identificador = str(row.get('Identificador', ''))
-                            colaborador = str(row.get('Colaborador', ''))
-                            cliente = str(row.get('Cliente', ''))
-                            # Usar o último tipo processado para visualização
-                            df_combinado.at[index, 'Manutencao_Realizada'] = verificar_manutencao_realizada(
-                                identificador, colaborador, cliente, ultimo_tipo_processado
-                            )
-                        
-                        st.session_state['dados_carregados'] = df_combinado
-                        st.session_state['tipo_manutencao_atual'] = ultimo_tipo_processado
-                    else:
-                        st.error("Não foi possível carregar os dados armazenados. Faça o upload das planilhas iniciais primeiro.")
-                elif not alguma_diaria_processada:
-                    st.warning("Nenhuma planilha diária foi processada. Carregue pelo menos uma planilha (Mensal, Semestral ou Corretiva).")
+        if st.button("Processar Todas as Planilhas Diárias", disabled=tarefa_em_andamento):
+            planilhas_diarias = {
+                TIPO_MANUTENCAO_MENSAL: uploaded_mensal_diario,
+                TIPO_MANUTENCAO_SEMESTRAL: uploaded_semestral_diario,
+                TIPO_MANUTENCAO_CORRETIVA: uploaded_corretiva_diario,
+            }
+            planilhas_diarias = {tipo: arquivo for tipo, arquivo in planilhas_diarias.items() if arquivo is not None}
+            
+            if planilhas_diarias:
+                # Registro das manutenções em segundo plano; o progresso aparece acima
+                st.session_state['tarefa_id'] = enviar_atualizacao_diaria(planilhas_diarias)
+                st.rerun()
+            else:
+                st.warning("Nenhuma planilha diária foi processada. Carregue pelo menos uma planilha (Mensal, Semestral ou Corretiva).")
     
     # Adicionar o botão de atualizar data e hora abaixo das tabs
     st.markdown("---")
     st.subheader("Atualizar Data e Hora")
-    if st.button("Atualizar Data/Hora", key="atualizar_data_hora_sidebar"):
-        data_hora_atual = salvar_ultima_atualizacao()
-        st.success(f"Data e hora atualizadas: {data_hora_atual}")
-        st.rerun()  # Recarregar a página para mostrar a nova data/hora
+    if st.button("Atualizar Data/Hora", key="atualizar_data_hora_sidebar", disabled=tarefa_em_andamento):
+        try:
+            data_hora_atual = salvar_ultima_atualizacao()
+        except BancoOcupadoError:
+            st.warning(AVISO_BANCO_OCUPADO)
+        else:
+            st.success(f"Data e hora atualizadas: {data_hora_atual}")
+            st.rerun()  # Recarregar a página para mostrar a nova data/hora
+    
+    with st.expander("Versões das planilhas"):
+        exibir_versoes(tarefa_em_andamento)
     
     st.sidebar.markdown("---")
     st.sidebar.markdown("### Instruções")
@@ -831,27 +372,19 @@ with st.sidebar:
     """)
 
 # Carregar dados automaticamente ao iniciar o aplicativo
-if 'dados_carregados' not in st.session_state:
+trecho_carregamento = iniciar_trecho("carregamento")
+if 'dados_selecionados' not in st.session_state:
     # Verificar se existem dados no banco de dados
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Verificar se há dados nas tabelas
-    cursor.execute("SELECT COUNT(*) FROM planilha_mensal")
-    tem_mensal = cursor.fetchone()[0] > 0
-    
-    cursor.execute("SELECT COUNT(*) FROM equipamentos")
-    tem_equipamentos = cursor.fetchone()[0] > 0
-    
-    conn.close()
+    status_planilhas = obter_status_planilhas()
+    tem_mensal = status_planilhas[TIPO_MANUTENCAO_MENSAL]
+    tem_equipamentos = status_planilhas['equipamentos']
     
     # Se existirem dados, carregá-los automaticamente
     if tem_mensal and tem_equipamentos:
         with st.spinner("Carregando dados armazenados..."):
-            dados_processados = processar_dados_manutencao(usar_armazenado=True)
+            dados_processados = processar_dados_manutencao()
             if dados_processados is not None:
-                st.session_state['dados_carregados'] = dados_processados
-                st.session_state['tipo_manutencao_atual'] = TIPO_MANUTENCAO_MENSAL
+                st.session_state['dados_selecionados'] = TIPO_MANUTENCAO_MENSAL
 
 # Criar um container para a data e hora com estilo destacado
 data_hora_container = st.container()
@@ -875,73 +408,57 @@ show_by = st.radio(
 )
 
 # Adicionar seleção de tipo de manutenção para visualização
+# (trocar o tipo apenas seleciona outra coluna de status, sem consultar o banco)
 tipo_visualizacao = st.radio(
     "Selecione o tipo de manutenção para visualizar:",
-    ["Mensal", "Semestral", "Corretiva"],
+    list(ROTULOS_TIPOS.values()),
     horizontal=True,
     key="tipo_visualizacao"
 )
 
 # Converter escolha do usuário para o tipo no sistema
-tipo_sistema_visualizacao = TIPO_MANUTENCAO_MENSAL
-if tipo_visualizacao == "Semestral":
-    tipo_sistema_visualizacao = TIPO_MANUTENCAO_SEMESTRAL
-elif tipo_visualizacao == "Corretiva":
-    tipo_sistema_visualizacao = TIPO_MANUTENCAO_CORRETIVA
+tipo_sistema_visualizacao = {rotulo: tipo for tipo, rotulo in ROTULOS_TIPOS.items()}[tipo_visualizacao]
 
 # Botão para carregar os dados atuais
 if st.button(f"Carregar Dados Atuais ({tipo_visualizacao})"):
     with st.spinner(f"Carregando dados de {tipo_visualizacao.lower()}..."):
-        # Combinar os dados disponíveis
-        df_combinado = combinar_dados()
+        # Combinar os dados disponíveis (com o status de todos os tipos)
+        df_combinado = obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL)
         
         if df_combinado is not None:
-            # Atualizar a data e hora da última atualização
-            salvar_ultima_atualizacao()
-            
-            # Adicionar status de manutenção para cada identificador, filtrando pelo tipo
-            for index, row in df_combinado.iterrows():
-                identificador = str(row.get('Identificador', ''))
-                colaborador = str(row.get('Colaborador', ''))
-                cliente = str(row.get('Cliente', ''))
-                df_combinado.at[index, 'Manutencao_Realizada'] = verificar_manutencao_realizada(
-                    identificador, colaborador, cliente, tipo_sistema_visualizacao
-                )
+            # Atualizar a data e hora da última atualização (exceto durante uma atualização em segundo plano)
+            registrar_data_da_carga()
             
-            st.session_state['dados_carregados'] = df_combinado
-            st.session_state['tipo_manutencao_atual'] = tipo_sistema_visualizacao
+            st.session_state['dados_selecionados'] = TIPO_MANUTENCAO_MENSAL
             st.success(f"Dados de {tipo_visualizacao.lower()} carregados com sucesso!")
         else:
             st.warning("Nenhum dado disponível. Faça o upload das planilhas iniciais primeiro.")
 
-# Se os dados estiverem disponíveis na sessão, exibi-los
-if 'dados_carregados' in st.session_state:
-    dados_manutencao = st.session_state['dados_carregados']
-    
-    # Verificar se a coluna Manutencao_Realizada existe, se não, adicioná-la como False (não realizada)
-    if 'Manutencao_Realizada' not in dados_manutencao.columns:
-        # Adicionar a coluna faltante
-        dados_manutencao['Manutencao_Realizada'] = False
-        
-        # Atualizar o status das manutenções realizadas com base no tipo atual
-        tipo_atual = st.session_state.get('tipo_manutencao_atual', TIPO_MANUTENCAO_MENSAL)
-        for index, row in dados_manutencao.iterrows():
-            identificador = str(row.get('Identificador', ''))
-            colaborador = str(row.get('Colaborador', ''))
-            cliente = str(row.get('Cliente', ''))
-            dados_manutencao.at[index, 'Manutencao_Realizada'] = verificar_manutencao_realizada(
-                identificador, colaborador, cliente, tipo_atual
-            )
-        
-        # Atualizar dados na sessão
-        st.session_state['dados_carregados'] = dados_manutencao
-    
+# Dados da seleção da sessão, lidos do cache compartilhado (sempre na versão mais recente)
+dados_manutencao = None
+if 'dados_selecionados' in st.session_state:
+    try:
+        dados_manutencao = obter_dados_manutencao(st.session_state['dados_selecionados'])
+    except ValueError as e:
+        st.error(str(e))
+concluir_trecho(trecho_carregamento)
+
+# Status do tipo selecionado: apenas a coluna correspondente já calculada
+if dados_manutencao is not None:
+    dados_manutencao['Manutencao_Realizada'] = dados_manutencao[COLUNAS_STATUS[tipo_sistema_visualizacao]]
+
+# Se os dados estiverem disponíveis, exibi-los
+if dados_manutencao is not None:
+    # O plotly é importado só quando há gráficos a exibir (resumo e visões por Colaborador e Cliente)
+    import plotly.express as px
+
     # Exibir estatísticas resumidas
+    trecho_resumo = iniciar_trecho("resumo")
     col1, col2, col3, col4 = st.columns(4)
     
-    # Contar status de manutenção
-    total_equipamentos = len(dados_manutencao)
-    realizadas = dados_manutencao['Manutencao_Realizada'].sum()
+    # Contar status de manutenção (cubo de contagens montado uma vez por versão dos dados)
+    cubo = obter_cubo(dados_manutencao)
+    total_equipamentos, realizadas = totais_cubo(cubo, tipo_sistema_visualizacao)
     pendentes = total_equipamentos - realizadas
     
     with col1:
@@ -959,31 +476,17 @@ if 'dados_carregados' in st.session_state:
             color_discrete_map={'Realizadas': 'green', 'Pendentes': 'red'}
         )
         st.plotly_chart(fig, use_container_width=True)
+    concluir_trecho(trecho_resumo)
     
     st.markdown("---")
     
     # Visualização de acordo com a seleção
+    trecho_visao = iniciar_trecho(f"visao_{show_by}")
     if show_by == "Colaborador":
         st.subheader("Status por Colaborador")
         
         # Preparar dados por colaborador
-        resumo_colaborador = dados_manutencao.groupby('Colaborador').agg({
-            'Identificador': 'count',
-            'Manutencao_Realizada': 'sum'
-        }).reset_index()
-        
-        resumo_colaborador.rename(columns={
-            'Identificador': 'Total_Equipamentos',
-            'Manutencao_Realizada': 'Manutencoes_Realizadas'
-        }, inplace=True)
-        
-        resumo_colaborador['Manutencoes_Pendentes'] = resumo_colaborador['Total_Equipamentos'] - resumo_colaborador['Manutencoes_Realizadas']
-        # Evitar divisão por zero
-        resumo_colaborador['Percentual_Concluido'] = resumo_colaborador.apply(
-            lambda row: round(row['Manutencoes_Realizadas'] / row['Total_Equipamentos'] * 100, 2) 
-            if row['Total_Equipamentos'] > 0 else 0.0, 
-            axis=1
-        )
+        resumo_colaborador = resumir_cubo(cubo, tipo_sistema_visualizacao, 'Colaborador')
         
         # Criar gráfico de barras
         fig = px.bar(
@@ -1003,28 +506,15 @@ if 'dados_carregados' in st.session_state:
         # Adicionar filtro por colaborador
         colaborador_selecionado = st.selectbox(
             "Selecione um colaborador para ver os detalhes:",
-            ["Todos"] + sorted([str(c) for c in dados_manutencao['Colaborador'].unique() if c is not None and pd.notna(c)])
+            ["Todos"] + sorted(str(c) for c in resumo_colaborador['Colaborador'])
         )
         
         if colaborador_selecionado != "Todos":
-            # Filtrar dados por colaborador
-            dados_filtrados = dados_manutencao[dados_manutencao['Colaborador'] == colaborador_selecionado]
-            
             # Mostrar clientes atendidos
             st.subheader(f"Clientes atendidos por {colaborador_selecionado}")
             
             # Agrupar por cliente
-            clientes = dados_filtrados.groupby('Cliente').agg({
-                'Identificador': 'count',
-                'Manutencao_Realizada': 'sum'
-            }).reset_index()
-            
-            clientes.rename(columns={
-                'Identificador': 'Total_Equipamentos',
-                'Manutencao_Realizada': 'Manutencoes_Realizadas'
-            }, inplace=True)
-            
-            clientes['Manutencoes_Pendentes'] = clientes['Total_Equipamentos'] - clientes['Manutencoes_Realizadas']
+            clientes = resumir_cubo(cubo, tipo_sistema_visualizacao, 'Cliente', Colaborador=colaborador_selecionado)
             
             # Exibir em formato de tabela com ícones
             for _, row in clientes.iterrows():
@@ -1039,73 +529,35 @@ if 'dados_carregados' in st.session_state:
                     with cols[3]:
                         st.markdown(f"❌ {int(row['Manutencoes_Pendentes'])}")
                     
-                    # Expandir para mostrar equipamentos
-                    with st.expander(f"Ver equipamentos de {row['Cliente']}"):
-                        equips = dados_filtrados[dados_filtrados['Cliente'] == row['Cliente']]
-                        for _, equip in equips.iterrows():
-                            status_icon = "✅" if equip['Manutencao_Realizada'] else "❌"
-                            st.markdown(f"{status_icon} **{equip['Identificador']}**")
-                            st.write(f"Colaborador responsável: {equip['Colaborador']}")
-                            
-                            # Adicionar mais informações dos equipamentos se disponíveis
-                            # Verificar colunas que possam conter informações adicionais, excluindo colunas de fotos
-                            foto_columns = [
-                                'FOTO 1 - ANTES - Tampa da Maquina Aberta com os Filtros SUJOS Instalados na Maquina.',
-                                'FOTO 2 - ANTES - Foto com Etiqueta QRCODE (Mar Brasil) da Maquina.',
-                                'FOTO 3 - ANTES - Foto com Etiqueta técnica da maquina (Etiqueta de Identificação do Fabricante na Evaporadora).',
-                                'Foto 1 - DEPOIS - Tampa da Maquina Aberta com os Filtros LIMPOS Instalados na Maquina.',
-                                'Foto 2 - DEPOIS - Limpeza geral da maquina e display de funcionamento (Se houver display)'
-                            ]
-                            excluded_columns = ['Colaborador', 'Cliente', 'Identificador', 'Manutencao_Realizada'] + foto_columns
-                            info_columns = [col for col in equip.index if col not in excluded_columns]
-                            
-                            for col in info_columns:
-                                if pd.notna(equip[col]) and str(equip[col]).strip() != '':
-                                    st.write(f"**{col}:** {equip[col]}")
-                            
-                            st.markdown("---")
+                    # Equipamentos do cliente montados apenas quando abertos
+                    exibir_equipamentos(
+                        dados_manutencao, {'Colaborador': colaborador_selecionado, 'Cliente': row['Cliente']},
+                        chave=f"colaborador_{colaborador_selecionado}_{row['Cliente']}",
+                        rotulo=f"Ver equipamentos de {row['Cliente']}"
+                    )
         else:
             # Mostrar todos os colaboradores
             st.subheader("Todos os Colaboradores")
             
             # Criar tabela com status de cada colaborador
-            # --- Substituição direta dos nomes por setor antes da exibição ---
-            SETOR_MAP_EXATO = {
-                "Setor 3 GWSB e Vitor Hugo": ["Victor Hugo Nascimento Soares", "GWSB"],
-                "Setor 1 Paco Ruhan e LUKREFRIGERAÇÃO": ["Pako Ruhan", "LUKREFRIGERACAO"],
-                "Setor 5 RNCLIMATIZACAO e Robson": ["Robson Roque Bernardo", "RN CLIMATIZACAO"],
-                "Setor 4 ADS e Wando": ["Wanderley Souza da Silva", "ADS"],
-                "Setor 2 Renan e MVF": ["Renan de Souza Miranda", "MVF Climatizacao"],
-            }
-            def substituir_por_setor(colaborador):
-                for setor, nomes in SETOR_MAP_EXATO.items():
-                    for nome in nomes:
-                        if nome.lower() in str(colaborador).lower():
-                            return setor
-                return colaborador
-            if 'Colaborador' in dados_manutencao.columns:
-                dados_manutencao['Colaborador'] = dados_manutencao['Colaborador'].apply(substituir_por_setor)
-            # --------------------------------------------------------------
-            for colaborador in dados_manutencao['Colaborador'].unique():
-                dados_colab = dados_manutencao[dados_manutencao['Colaborador'] == colaborador]
-                total = len(dados_colab)
-                realizados = dados_colab['Manutencao_Realizada'].sum()
+            for _, row in resumo_colaborador.iterrows():
+                total = int(row['Linhas'])
+                realizados = int(row['Manutencoes_Realizadas'])
                 pendentes = total - realizados
                 
                 with st.container():
                     cols = st.columns([3, 1, 1, 1])
                     with cols[0]:
-                        st.markdown(f"**{colaborador}**")
+                        st.markdown(f"**{row['Colaborador']}**")
                     with cols[1]:
                         st.markdown(f"Total: {total}")
                     with cols[2]:
-                        st.markdown(f"✅ {int(realizados)}")
+                        st.markdown(f"✅ {realizados}")
                     with cols[3]:
-                        st.markdown(f"❌ {int(pendentes)}")
+                        st.markdown(f"❌ {pendentes}")
                 
                 # Adicionar barra de progresso
                 progresso = int(realizados / total * 100) if total > 0 else 0
-                progresso = int(realizadas / total * 100) if total > 0 else 0
                 st.progress(min(progresso/100, 1.0))
                 st.markdown("---")
                 
@@ -1113,23 +565,7 @@ if 'dados_carregados' in st.session_state:
         st.subheader("Status por Cliente")
         
         # Preparar dados por cliente
-        resumo_cliente = dados_manutencao.groupby('Cliente').agg({
-            'Identificador': 'count',
-            'Manutencao_Realizada': 'sum'
-        }).reset_index()
-        
-        resumo_cliente.rename(columns={
-            'Identificador': 'Total_Equipamentos',
-            'Manutencao_Realizada': 'Manutencoes_Realizadas'
-        }, inplace=True)
-        
-        resumo_cliente['Manutencoes_Pendentes'] = resumo_cliente['Total_Equipamentos'] - resumo_cliente['Manutencoes_Realizadas']
-        # Evitar divisão por zero
-        resumo_cliente['Percentual_Concluido'] = resumo_cliente.apply(
-            lambda row: round(row['Manutencoes_Realizadas'] / row['Total_Equipamentos'] * 100, 2) 
-            if row['Total_Equipamentos'] > 0 else 0.0, 
-            axis=1
-        )
+        resumo_cliente = resumir_cubo(cubo, tipo_sistema_visualizacao, 'Cliente')
         
         # Criar gráfico de barras
         fig = px.bar(
@@ -1149,28 +585,15 @@ if 'dados_carregados' in st.session_state:
         # Adicionar filtro por cliente
         cliente_selecionado = st.selectbox(
             "Selecione um cliente para ver os detalhes:",
-            ["Todos"] + sorted([str(c) for c in dados_manutencao['Cliente'].unique() if c is not None and pd.notna(c)])
+            ["Todos"] + sorted(str(c) for c in resumo_cliente['Cliente'])
         )
         
         if cliente_selecionado != "Todos":
-            # Filtrar dados por cliente
-            dados_filtrados = dados_manutencao[dados_manutencao['Cliente'] == cliente_selecionado]
-            
             # Mostrar colaboradores que atendem o cliente
             st.subheader(f"Colaboradores que atendem {cliente_selecionado}")
             
             # Agrupar por colaborador
-            colaboradores = dados_filtrados.groupby('Colaborador').agg({
-                'Identificador': 'count',
-                'Manutencao_Realizada': 'sum'
-            }).reset_index()
-            
-            colaboradores.rename(columns={
-                'Identificador': 'Total_Equipamentos',
-                'Manutencao_Realizada': 'Manutencoes_Realizadas'
-            }, inplace=True)
-            
-            colaboradores['Manutencoes_Pendentes'] = colaboradores['Total_Equipamentos'] - colaboradores['Manutencoes_Realizadas']
+            colaboradores = resumir_cubo(cubo, tipo_sistema_visualizacao, 'Colaborador', Cliente=cliente_selecionado)
             
             # Exibir em formato de tabela com ícones
             for _, row in colaboradores.iterrows():
@@ -1188,46 +611,34 @@ if 'dados_carregados' in st.session_state:
             # Mostrar equipamentos
             st.subheader(f"Equipamentos de {cliente_selecionado}")
             
+            # Totais do cliente (inclusive equipamentos sem colaborador)
+            total_cliente, realizadas_cliente = totais_cubo(
+                cubo[cubo['Cliente'] == cliente_selecionado], tipo_sistema_visualizacao
+            )
+            
             # Criar duas colunas: Pendentes e Realizados
             col1, col2 = st.columns(2)
             
+            # Cada coluna mostra uma página por vez (fragmento próprio para trocar de página)
             with col1:
                 st.markdown("### ❌ Manutenções Pendentes")
-                pendentes = dados_filtrados[dados_filtrados['Manutencao_Realizada'] == False]
                 
-                if len(pendentes) > 0:
-                    for _, equip in pendentes.iterrows():
-                        st.markdown(f"**{equip['Identificador']}**")
-                        st.write(f"Colaborador responsável: {equip['Colaborador']}")
-                        
-                        # Adicionar mais informações dos equipamentos se disponíveis
-                        info_columns = [col for col in equip.index if col not in ['Colaborador', 'Cliente', 'Identificador', 'Manutencao_Realizada']]
-                        
-                        for col in info_columns:
-                            if pd.notna(equip[col]) and str(equip[col]).strip() != '':
-                                st.write(f"**{col}:** {equip[col]}")
-                                
-                        st.markdown("---")
+                if total_cliente > realizadas_cliente:
+                    exibir_equipamentos(
+                        dados_manutencao, {'Cliente': cliente_selecionado, 'Manutencao_Realizada': False},
+                        chave=f"cliente_{cliente_selecionado}_pendentes", sob_demanda=False
+                    )
                 else:
                     st.success("Não há manutenções pendentes!")
             
             with col2:
                 st.markdown("### ✅ Manutenções Realizadas")
-                realizadas = dados_filtrados[dados_filtrados['Manutencao_Realizada'] == True]
                 
-                if len(realizadas) > 0:
-                    for _, equip in realizadas.iterrows():
-                        st.markdown(f"**{equip['Identificador']}**")
-                        st.write(f"Colaborador responsável: {equip['Colaborador']}")
-                        
-                        # Adicionar mais informações dos equipamentos se disponíveis
-                        info_columns = [col for col in equip.index if col not in ['Colaborador', 'Cliente', 'Identificador', 'Manutencao_Realizada']]
-                        
-                        for col in info_columns:
-                            if pd.notna(equip[col]) and str(equip[col]).strip() != '':
-                                st.write(f"**{col}:** {equip[col]}")
-                                
-                        st.markdown("---")
+                if realizadas_cliente > 0:
+                    exibir_equipamentos(
+                        dados_manutencao, {'Cliente': cliente_selecionado, 'Manutencao_Realizada': True},
+                        chave=f"cliente_{cliente_selecionado}_realizadas", sob_demanda=False
+                    )
                 else:
                     st.error("Nenhuma manutenção foi realizada ainda!")
         else:
@@ -1235,22 +646,21 @@ if 'dados_carregados' in st.session_state:
             st.subheader("Todos os Clientes")
             
             # Criar tabela com status de cada cliente
-            for cliente in sorted([str(c) for c in dados_manutencao['Cliente'].unique() if c is not None and pd.notna(c)]):
-                df_cliente = dados_manutencao[dados_manutencao['Cliente'] == cliente]
-                total = len(df_cliente)
-                realizadas = df_cliente['Manutencao_Realizada'].sum()
+            for _, row in resumo_cliente.iterrows():
+                total = int(row['Linhas'])
+                realizadas = int(row['Manutencoes_Realizadas'])
                 pendentes = total - realizadas
                 
                 with st.container():
                     cols = st.columns([3, 1, 1, 1])
                     with cols[0]:
-                        st.markdown(f"**{cliente}**")
+                        st.markdown(f"**{row['Cliente']}**")
                     with cols[1]:
                         st.markdown(f"Total: {total}")
                     with cols[2]:
-                        st.markdown(f"✅ {int(realizadas)}")
+                        st.markdown(f"✅ {realizadas}")
                     with cols[3]:
-                        st.markdown(f"❌ {int(pendentes)}")
+                        st.markdown(f"❌ {pendentes}")
                 
                 # Adicionar barra de progresso
                 progresso = int(realizadas / total * 100) if total > 0 else 0
@@ -1260,50 +670,86 @@ if 'dados_carregados' in st.session_state:
     else:  # Por Identificador
         st.subheader("Status por Identificador")
         
-        # Campo de busca
-        id_filtro = st.text_input("Buscar por identificador:")
+        # Campo de busca (texto literal, diferenciando maiúsculas de minúsculas)
+        col_busca, col_modo = st.columns([3, 1])
+        with col_busca:
+            id_filtro = st.text_input("Buscar por identificador:")
+        with col_modo:
+            modo_busca = st.selectbox("Tipo de busca:", list(ROTULOS_BUSCA), format_func=ROTULOS_BUSCA.get)
         
         if id_filtro:
-            dados_filtrados = dados_manutencao[dados_manutencao['Identificador'].astype(str).str.contains(id_filtro)]
+            # Índice montado uma vez por versão dos dados: a busca não percorre o DataFrame
+            posicoes = obter_indice_busca(dados_manutencao).buscar(id_filtro, modo_busca)
+            dados_filtrados = dados_manutencao.iloc[posicoes[:LIMITE_RESULTADOS_BUSCA]]
             
             if not dados_filtrados.empty:
-                st.success(f"Encontrado(s) {len(dados_filtrados)} equipamento(s).")
+                st.success(f"Encontrado(s) {len(posicoes)} equipamento(s).")
+                if len(posicoes) > LIMITE_RESULTADOS_BUSCA:
+                    st.info(f"Exibindo os primeiros {LIMITE_RESULTADOS_BUSCA}. Refine a busca para ver os demais.")
                 
-                for _, row in dados_filtrados.iterrows():
+                for posicao, (_, row) in enumerate(dados_filtrados.iterrows()):
                     status_icon = "✅" if row['Manutencao_Realizada'] else "❌"
                     st.markdown(f"### {status_icon} Equipamento: {row['Identificador']}")
                     st.write(f"**Cliente:** {row['Cliente']}")
                     st.write(f"**Colaborador:** {row['Colaborador']}")
                     
                     # Adicionar mais informações dos equipamentos se disponíveis
-                    info_columns = [col for col in row.index if col not in ['Colaborador', 'Cliente', 'Identificador', 'Manutencao_Realizada']]
+                    info_columns = [col for col in row.index if col not in get_excluded_columns()]
                     
                     for col in info_columns:
                         if pd.notna(row[col]) and str(row[col]).strip() != '':
                             st.write(f"**{col}:** {row[col]}")
                     
+                    # Fotos ficam fora dos dados carregados: buscar apenas quando pedidas
+                    if st.toggle("Mostrar fotos", key=f"fotos_{posicao}_{row['Identificador']}"):
+                        fotos = obter_fotos(row['Identificador'])
+                        if fotos:
+                            for origem_foto, coluna_foto, url_foto in fotos:
+                                st.markdown(f"**{coluna_foto}** ({origem_foto}): [{url_foto}]({url_foto})")
+                        else:
+                            st.write("Nenhuma foto registrada para este equipamento.")
+                    
                     st.markdown("---")
             else:
                 st.warning(f"Nenhum equipamento encontrado com o identificador '{id_filtro}'.")
         else:
-            # Mostrar tabela com todos os equipamentos
-            dados_ordenados = dados_manutencao.sort_values(['Cliente', 'Colaborador', 'Identificador'])
+            # Mostrar tabela com todos os equipamentos, uma página por vez
+            colunas_tabela = [c for c in ['Identificador', 'Cliente', 'Colaborador'] if c in dados_manutencao.columns]
             
-            for _, row in dados_ordenados.iterrows():
-                cols = st.columns([1, 2, 2, 3])
-                
-                status_icon = "✅" if row['Manutencao_Realizada'] else "❌"
-                
-                with cols[0]:
-                    st.markdown(f"### {status_icon}")
-                with cols[1]:
-                    st.markdown(f"**{row['Identificador']}**")
-                with cols[2]:
-                    st.write(f"Cliente: {row['Cliente']}")
-                with cols[3]:
-                    st.write(f"Colaborador: {row['Colaborador']}")
-                
-                st.markdown("---")
+            col_ordem, col_status, col_tamanho = st.columns(3)
+            with col_ordem:
+                ordenar_por = st.selectbox("Ordenar por:", colunas_tabela, index=colunas_tabela.index('Cliente') if 'Cliente' in colunas_tabela else 0)
+            with col_status:
+                filtro_status = st.selectbox("Status:", ["Todos", "Pendentes", "Realizadas"])
+            with col_tamanho:
+                tamanho_pagina = st.selectbox("Equipamentos por página:", TAMANHOS_PAGINA, index=1)
+            
+            # Ordenação feita uma vez por versão dos dados (compartilhada entre as sessões)
+            # e filtro de status aplicado sobre as posições, sem copiar o DataFrame
+            chaves_ordem = [ordenar_por] + [c for c in ['Cliente', 'Colaborador', 'Identificador'] if c in colunas_tabela and c != ordenar_por]
+            posicoes = obter_ordem(dados_manutencao, chaves_ordem)
+            realizadas_ordem = dados_manutencao['Manutencao_Realizada'].to_numpy(dtype=bool)[posicoes]
+            if filtro_status == "Pendentes":
+                posicoes = posicoes[~realizadas_ordem]
+            elif filtro_status == "Realizadas":
+                posicoes = posicoes[realizadas_ordem]
+            
+            total_paginas = max(1, -(-len(posicoes) // tamanho_pagina))
+            if st.session_state.get('pagina_equipamentos', 1) > total_paginas:
+                st.session_state['pagina_equipamentos'] = 1
+            pagina = st.number_input(f"Página (de {total_paginas}):", min_value=1, max_value=total_paginas, step=1, key='pagina_equipamentos')
+            
+            inicio = (pagina - 1) * tamanho_pagina
+            pagina_dados = dados_manutencao.iloc[posicoes[inicio:inicio + tamanho_pagina]]
+            
+            # Apenas as linhas da página vão para o navegador, em uma única tabela
+            tabela = pd.DataFrame({'Status': pagina_dados['Manutencao_Realizada'].map({True: "✅", False: "❌"}).to_numpy()})
+            for coluna in colunas_tabela:
+                tabela[coluna] = pagina_dados[coluna].to_numpy()
+            st.dataframe(tabela, hide_index=True, use_container_width=True)
+            st.caption(f"Exibindo {inicio + 1 if len(posicoes) else 0}–{inicio + len(pagina_dados)} de {len(posicoes)} equipamentos.")
+    
+    concluir_trecho(trecho_visao)
     
     # Botão para exportar dados filtrados
     st.markdown("---")
@@ -1314,7 +760,7 @@ if 'dados_carregados' in st.session_state:
         buffer = io.BytesIO()
         with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
             # Adicionar coluna com status em texto
-            df_export = dados_manutencao.copy()
+            df_export = dados_manutencao.drop(columns=list(COLUNAS_STATUS.values()))
             df_export['Status'] = df_export['Manutencao_Realizada'].apply(lambda x: 'Realizada' if x else 'Pendente')
             
             df_export.to_excel(writer, sheet_name='Status_Manutencoes', index=False)
@@ -1369,3 +815,33 @@ else:
         
         O sistema combina a planilha mensal com a de equipamentos, e depois verifica as atualizações diárias para determinar quais equipamentos já receberam manutenção.
         """)
+
+# Painel de diagnóstico: árvore de trechos desta execução (também gravada no arquivo de diagnóstico)
+arvore = concluir_execucao()
+if arvore is not None:
+    with st.expander(f"Diagnóstico de desempenho ({arvore['ms']:.0f} ms)"):
+        st.dataframe(pd.DataFrame(linhas_da_arvore(arvore)), hide_index=True, use_container_width=True)
+
+        # Memória do processo, dos dados em cache (compartilhados) e das sessões ativas
+        st.markdown("**Memória**")
+        memoria = resumo_memoria()
+        processo = memoria['processo']
+        texto = f"Processo: {processo['rss_kb'] or 0:,} KB residentes (pico {processo['rss_pico_kb'] or 0:,} KB)"
+        if 'tracemalloc_kb' in processo:
+            texto += f" · alocados pelo Python: {processo['tracemalloc_kb']:,.0f} KB (pico {processo['tracemalloc_pico_kb']:,.0f} KB)"
+        st.caption(texto)
+        if dados_manutencao is not None:
+            # Cópia rasa dos dados em cache: só a coluna de status do tipo exibido é desta sessão
+            st.caption(
+                f"Dados desta sessão: {len(dados_manutencao):,} linhas, "
+                f"{tamanho_em_bytes(dados_manutencao) / 1024:,.0f} KB (compartilhados com o cache, exceto Manutencao_Realizada)"
+            )
+        st.caption(f"Dados em cache: {memoria['cache_kb']:,.0f} KB")
+        if memoria['cache']:
+            st.dataframe(pd.DataFrame(memoria['cache']), hide_index=True, use_container_width=True)
+        if 'sessoes' in memoria:
+            st.caption(
+                f"Sessões ativas: {memoria['sessoes']} · chaves no session_state: {memoria['chaves_sessoes']} · "
+                f"DataFrames no session_state: {memoria['dataframes_sessoes_kb']:,.0f} KB"
+            )
+        gravar_registro(memoria)
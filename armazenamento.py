@@ -0,0 +1,1657 @@
+import os
+import io
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import pytz
+
+import arquivos_snapshot
+import setores
+from diagnostico import rastreado
+
+# Caminho do banco de dados SQLite (pode ser alterado pela variável de ambiente)
+DB_PATH = os.environ.get('MANUTENCAO_DB_PATH', 'manutencao.db')
+
+# Ajustes de desempenho aplicados a cada conexão
+CACHE_PAGINAS_KB = int(os.environ.get('MANUTENCAO_DB_CACHE_KB', 64 * 1024))
+MMAP_BYTES = int(os.environ.get('MANUTENCAO_DB_MMAP_BYTES', 256 * 1024 * 1024))
+TIMEOUT_SEGUNDOS = 30
+
+# Definir tipos de manutenção
+TIPO_MANUTENCAO_MENSAL = 'mensal'
+TIPO_MANUTENCAO_SEMESTRAL = 'semestral'
+TIPO_MANUTENCAO_CORRETIVA = 'corretiva'
+TIPOS_MANUTENCAO = [TIPO_MANUTENCAO_MENSAL, TIPO_MANUTENCAO_SEMESTRAL, TIPO_MANUTENCAO_CORRETIVA]
+
+# Coluna de status de cada tipo de manutenção nos dados combinados
+COLUNAS_STATUS = {tipo: f"Realizada_{tipo}" for tipo in TIPOS_MANUTENCAO}
+
+# Tabela de planilha inicial de cada tipo de manutenção
+TABELAS_PLANILHA = {
+    TIPO_MANUTENCAO_MENSAL: 'planilha_mensal',
+    TIPO_MANUTENCAO_SEMESTRAL: 'planilha_semestral',
+    TIPO_MANUTENCAO_CORRETIVA: 'planilha_corretiva',
+}
+
+# Tabela de cabeçalho de cada origem de planilha (as três planilhas iniciais e a de equipamentos)
+ORIGEM_EQUIPAMENTOS = 'equipamentos'
+TABELAS_SNAPSHOT = dict(TABELAS_PLANILHA, **{ORIGEM_EQUIPAMENTOS: 'equipamentos'})
+
+# Colunas das planilhas guardadas em colunas próprias (as demais vão para planilha_atributos)
+COLUNAS_TIPADAS = {
+    'Identificador': 'identificador',
+    'Colaborador': 'colaborador',
+    'Cliente': 'cliente',
+}
+
+# Quantidade máxima de identificadores por consulta "IN (...)" (limite de parâmetros do SQLite)
+TAMANHO_LOTE_CONSULTA = 500
+
+# Colunas de fotos (URLs): vão para a tabela anexos_fotos na gravação e não entram nas planilhas.
+# Outras colunas de anexo podem ser acrescentadas pela variável de ambiente, separadas por ";".
+COLUNAS_FOTOS = [
+    'FOTO 1 - ANTES - Tampa da Maquina Aberta com os Filtros SUJOS Instalados na Maquina.',
+    'FOTO 2 - ANTES - Foto com Etiqueta QRCODE (Mar Brasil) da Maquina.',
+    'FOTO 3 - ANTES - Foto com Etiqueta técnica da maquina (Etiqueta de Identificação do Fabricante na Evaporadora).',
+    'Foto 1 - DEPOIS - Tampa da Maquina Aberta com os Filtros LIMPOS Instalados na Maquina.',
+    'Foto 2 - DEPOIS - Limpeza geral da maquina e display de funcionamento (Se houver display)',
+] + [coluna.strip() for coluna in os.environ.get('MANUTENCAO_COLUNAS_FOTOS', '').split(';') if coluna.strip()]
+
+# Migrações do esquema, aplicadas em ordem e registradas em PRAGMA user_version.
+# Nunca altere uma migração já publicada: adicione uma nova ao final da lista.
+MIGRACOES = [
+    # 1 - esquema original
+    '''
+    CREATE TABLE IF NOT EXISTS planilha_mensal (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_upload TEXT,
+        dados TEXT,
+        tipo_manutencao TEXT DEFAULT 'mensal'
+    );
+    CREATE TABLE IF NOT EXISTS planilha_semestral (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_upload TEXT,
+        dados TEXT,
+        tipo_manutencao TEXT DEFAULT 'semestral'
+    );
+    CREATE TABLE IF NOT EXISTS planilha_corretiva (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_upload TEXT,
+        dados TEXT,
+        tipo_manutencao TEXT DEFAULT 'corretiva'
+    );
+    CREATE TABLE IF NOT EXISTS equipamentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_upload TEXT,
+        dados TEXT
+    );
+    CREATE TABLE IF NOT EXISTS manutencoes_realizadas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_upload TEXT,
+        identificador TEXT,
+        colaborador TEXT,
+        cliente TEXT,
+        data_manutencao TEXT,
+        tipo_manutencao TEXT,
+        cumprimento TEXT
+    );
+    CREATE TABLE IF NOT EXISTS ultima_atualizacao (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_hora TEXT
+    );
+    ''',
+    # 2 - uma linha por linha de planilha, no lugar do JSON em planilha_*.dados
+    '''
+    ALTER TABLE planilha_mensal ADD COLUMN colunas TEXT;
+    ALTER TABLE planilha_mensal ADD COLUMN linhas INTEGER;
+    ALTER TABLE planilha_semestral ADD COLUMN colunas TEXT;
+    ALTER TABLE planilha_semestral ADD COLUMN linhas INTEGER;
+    ALTER TABLE planilha_corretiva ADD COLUMN colunas TEXT;
+    ALTER TABLE planilha_corretiva ADD COLUMN linhas INTEGER;
+    ALTER TABLE equipamentos ADD COLUMN colunas TEXT;
+    ALTER TABLE equipamentos ADD COLUMN linhas INTEGER;
+    CREATE TABLE IF NOT EXISTS planilha_linhas (
+        origem TEXT NOT NULL,
+        snapshot_id INTEGER NOT NULL,
+        linha INTEGER NOT NULL,
+        identificador TEXT,
+        colaborador TEXT,
+        cliente TEXT,
+        PRIMARY KEY (origem, snapshot_id, linha)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_planilha_linhas_identificador
+        ON planilha_linhas (origem, snapshot_id, identificador);
+    CREATE TABLE IF NOT EXISTS planilha_atributos (
+        origem TEXT NOT NULL,
+        snapshot_id INTEGER NOT NULL,
+        linha INTEGER NOT NULL,
+        coluna TEXT NOT NULL,
+        valor,
+        PRIMARY KEY (origem, snapshot_id, coluna, linha)
+    ) WITHOUT ROWID;
+    ''',
+    # 3 - converter o JSON mais recente de cada origem para o novo formato
+    lambda conn: _migrar_planilhas_json(conn),
+    # 4 - ponteiro para o arquivo Arrow do snapshot (quando o pyarrow está disponível)
+    '''
+    ALTER TABLE planilha_mensal ADD COLUMN arquivo TEXT;
+    ALTER TABLE planilha_semestral ADD COLUMN arquivo TEXT;
+    ALTER TABLE planilha_corretiva ADD COLUMN arquivo TEXT;
+    ALTER TABLE equipamentos ADD COLUMN arquivo TEXT;
+    ''',
+    # 5 - um registro por identificador e tipo; índices usados pelas consultas de status
+    '''
+    DELETE FROM manutencoes_realizadas
+    WHERE id NOT IN (
+        SELECT MIN(id) FROM manutencoes_realizadas GROUP BY identificador, tipo_manutencao
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_manutencoes_identificador_tipo
+        ON manutencoes_realizadas (identificador, tipo_manutencao);
+    CREATE INDEX IF NOT EXISTS idx_manutencoes_tipo_identificador
+        ON manutencoes_realizadas (tipo_manutencao, identificador);
+    ''',
+    # 6 - hash do arquivo enviado, para reaproveitar o snapshot em reenvios idênticos
+    '''
+    ALTER TABLE planilha_mensal ADD COLUMN hash_conteudo TEXT;
+    ALTER TABLE planilha_semestral ADD COLUMN hash_conteudo TEXT;
+    ALTER TABLE planilha_corretiva ADD COLUMN hash_conteudo TEXT;
+    ALTER TABLE equipamentos ADD COLUMN hash_conteudo TEXT;
+    ''',
+    # 7 - fotos fora das planilhas, carregadas apenas quando pedidas
+    '''
+    CREATE TABLE IF NOT EXISTS anexos_fotos (
+        origem TEXT NOT NULL,
+        snapshot_id INTEGER NOT NULL,
+        linha INTEGER NOT NULL,
+        coluna TEXT NOT NULL,
+        identificador TEXT,
+        url TEXT NOT NULL,
+        PRIMARY KEY (origem, snapshot_id, linha, coluna)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_anexos_fotos_identificador
+        ON anexos_fotos (origem, snapshot_id, identificador);
+    ''',
+    # 8 - mover as fotos dos snapshots atuais para anexos_fotos
+    lambda conn: _migrar_fotos_para_anexos(conn),
+    # 9 - mapeamento de colaboradores para setores (a ordem do id é a prioridade)
+    '''
+    CREATE TABLE IF NOT EXISTS setores_mapa (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        setor TEXT NOT NULL,
+        nome TEXT NOT NULL
+    );
+    ''',
+    # 10 - popular o mapeamento e aplicá-lo aos snapshots atuais (antes era aplicado na exibição)
+    lambda conn: _migrar_setores(conn),
+    # 11 - contador de versão dos dados, incrementado por toda gravação que muda o que é exibido
+    '''
+    CREATE TABLE IF NOT EXISTS versao_dados (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        versao INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO versao_dados (id, versao) VALUES (1, 0);
+    ''',
+    # 12 - status materializado de cada equipamento das planilhas atuais e contadores por Colaborador e Cliente
+    '''
+    CREATE TABLE IF NOT EXISTS status_equipamento (
+        origem TEXT NOT NULL,
+        snapshot_id INTEGER NOT NULL,
+        identificador TEXT NOT NULL,
+        tipo_manutencao TEXT NOT NULL,
+        realizada INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (origem, snapshot_id, identificador, tipo_manutencao)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS resumo_status (
+        origem TEXT NOT NULL,
+        snapshot_id INTEGER NOT NULL,
+        tipo_manutencao TEXT NOT NULL,
+        dimensao TEXT NOT NULL,
+        valor TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        realizadas INTEGER NOT NULL,
+        PRIMARY KEY (origem, snapshot_id, tipo_manutencao, dimensao, valor)
+    ) WITHOUT ROWID;
+    ''',
+    # 13 - materializar o status das planilhas atuais
+    lambda conn: [_materializar_status(conn, origem) for origem in TABELAS_PLANILHA],
+    # 14 - tarefas de ingestão executadas em segundo plano
+    '''
+    CREATE TABLE IF NOT EXISTS tarefas_ingestao (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,
+        estado TEXT NOT NULL,
+        fase TEXT,
+        mensagens TEXT,
+        resultado TEXT,
+        criada_em TEXT NOT NULL,
+        atualizada_em TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_tarefas_ingestao_estado ON tarefas_ingestao (estado);
+    ''',
+    # 15 - snapshots fixados (nunca removidos pela retenção); JSON antigo dos snapshots já convertidos
+    '''
+    ALTER TABLE planilha_mensal ADD COLUMN fixado INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE planilha_semestral ADD COLUMN fixado INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE planilha_corretiva ADD COLUMN fixado INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE equipamentos ADD COLUMN fixado INTEGER NOT NULL DEFAULT 0;
+    UPDATE planilha_mensal SET dados = NULL WHERE colunas IS NOT NULL AND dados IS NOT NULL;
+    UPDATE planilha_semestral SET dados = NULL WHERE colunas IS NOT NULL AND dados IS NOT NULL;
+    UPDATE planilha_corretiva SET dados = NULL WHERE colunas IS NOT NULL AND dados IS NOT NULL;
+    UPDATE equipamentos SET dados = NULL WHERE colunas IS NOT NULL AND dados IS NOT NULL;
+    ''',
+    # 16 - catálogo com o snapshot atual de cada origem (evita consultar as tabelas de snapshot a cada leitura)
+    '''
+    CREATE TABLE IF NOT EXISTS catalogo_planilhas (
+        origem TEXT PRIMARY KEY,
+        snapshot_id INTEGER NOT NULL,
+        colunas TEXT NOT NULL,
+        arquivo TEXT,
+        linhas INTEGER,
+        data_upload TEXT,
+        hash_conteudo TEXT
+    );
+    ''',
+    # 17 - popular o catálogo com o snapshot mais recente de cada origem
+    lambda conn: _migrar_catalogo(conn),
+    # 18 - contadores por Colaborador e Cliente substituídos pelo cubo de contagens do cache compartilhado
+    '''
+    DROP TABLE IF EXISTS resumo_status;
+    ''',
+    # 19 - snapshots preparados em etapas ficam fora das leituras até serem publicados (junto com o catálogo)
+    '''
+    ALTER TABLE planilha_mensal ADD COLUMN publicado INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE planilha_semestral ADD COLUMN publicado INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE planilha_corretiva ADD COLUMN publicado INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE equipamentos ADD COLUMN publicado INTEGER NOT NULL DEFAULT 1;
+    ''',
+    # 20 - contadores por Colaborador, Cliente e tipo de manutenção das planilhas atuais (fonte do cubo de contagens)
+    '''
+    CREATE TABLE IF NOT EXISTS contagens_status (
+        origem TEXT NOT NULL,
+        snapshot_id INTEGER NOT NULL,
+        tipo_manutencao TEXT NOT NULL,
+        colaborador TEXT,
+        cliente TEXT,
+        linhas INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        realizadas INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_contagens_status
+        ON contagens_status (origem, snapshot_id, tipo_manutencao, colaborador, cliente);
+    ''',
+    # 21 - materializar os contadores das planilhas atuais
+    lambda conn: [_materializar_contagens(conn, origem) for origem in TABELAS_PLANILHA],
+    # 22 - converter os snapshots anteriores ao mais recente que ficaram em JSON desde a migração 3
+    lambda conn: _migrar_historico_json(conn),
+    # 23 - identificadores das manutenções já registradas no mesmo formato das planilhas ("123.0" -> "123")
+    lambda conn: _migrar_identificadores_realizados(conn),
+]
+
+# Política de retenção dos snapshots de cada tipo: as N versões mais recentes e a última versão de cada
+# um dos M meses mais recentes. O snapshot atual e os fixados nunca são removidos.
+RETENCAO_VERSOES = int(os.environ.get('MANUTENCAO_RETENCAO_VERSOES', 3))
+RETENCAO_MESES = int(os.environ.get('MANUTENCAO_RETENCAO_MESES', 12))
+
+# Páginas livres a partir das quais uma tarefa que não substituiu planilhas também compacta o banco
+LIMITE_PAGINAS_LIVRES = int(os.environ.get('MANUTENCAO_LIMITE_PAGINAS_LIVRES', 2560))
+
+# Dimensões com contadores materializados em contagens_status
+DIMENSOES_CONTAGENS = ['Colaborador', 'Cliente']
+
+# Tabelas com linhas de cada snapshot, removidas junto com ele
+TABELAS_POR_SNAPSHOT = [
+    'planilha_linhas', 'planilha_atributos', 'anexos_fotos', 'status_equipamento', 'contagens_status'
+]
+
+# Conexões reaproveitadas pelo processo inteiro. O Streamlit executa cada rerun em uma thread nova,
+# então as conexões ficam em um conjunto compartilhado: cada uso empresta uma conexão livre (já
+# configurada) e a devolve ao terminar. Enquanto emprestada, a conexão pertence à thread que a pediu,
+# e os usos aninhados nessa thread (por exemplo, leituras dentro de uma transação) recebem a mesma.
+MAX_CONEXOES_LIVRES = int(os.environ.get('MANUTENCAO_DB_CONEXOES', 8))
+_conexoes_livres = {}
+_conexoes_lock = threading.Lock()
+_emprestadas = threading.local()
+_migracao_lock = threading.Lock()
+_bancos_migrados = set()
+
+
+# Função para abrir uma conexão já configurada para leitura concorrente
+def _abrir_conexao(caminho):
+    # isolation_level=None: as transações são controladas explicitamente por transacao()
+    # check_same_thread=False: a conexão passa de uma thread para outra pelo conjunto de conexões livres,
+    # mas nunca é usada por duas threads ao mesmo tempo
+    conn = sqlite3.connect(caminho, timeout=TIMEOUT_SEGUNDOS, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_PAGINAS_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = OFF")
+    return conn
+
+
+# Função para aplicar as migrações pendentes (executada uma vez por processo e por banco)
+def migrar(caminho=None):
+    caminho = caminho or DB_PATH
+    if caminho in _bancos_migrados:
+        return
+    with _migracao_lock:
+        if caminho in _bancos_migrados:
+            return
+        conn = _abrir_conexao(caminho)
+        try:
+            versao_atual = conn.execute("PRAGMA user_version").fetchone()[0]
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Páginas livres devolvidas aos poucos pela compactação (PRAGMA incremental_vacuum).
+                # O modo WAL já gravou o cabeçalho do arquivo, então a mudança só vale depois do VACUUM: imediato
+                # no banco novo e, em um banco anterior ao auto_vacuum incremental, feito uma única vez aqui,
+                # antes das sessões (o trabalhador das tarefas nunca executa um VACUUM completo).
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                try:
+                    conn.execute("VACUUM")
+                except sqlite3.OperationalError:
+                    if versao_atual == 0:
+                        raise
+                    # Banco em uso por outro processo: a conversão fica para a próxima inicialização
+            for versao, script in enumerate(MIGRACOES, start=1):
+                if versao <= versao_atual:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if callable(script):
+                        script(conn)
+                    else:
+                        for comando in script.split(';'):
+                            if comando.strip():
+                                conn.execute(comando)
+                    conn.execute(f"PRAGMA user_version = {versao}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+        _bancos_migrados.add(caminho)
+
+
+# Contexto que empresta uma conexão à thread atual: a que ela já tem emprestada (usos aninhados),
+# uma livre do conjunto ou, se não houver, uma nova (o banco é migrado na primeira vez)
+@contextmanager
+def _emprestar_conexao(caminho=None):
+    caminho = caminho or DB_PATH
+    emprestadas = _emprestadas.__dict__.setdefault('conexoes', {})
+    emprestada = emprestadas.get(caminho)
+    if emprestada is not None:
+        emprestada[1] += 1
+        try:
+            yield emprestada[0]
+        finally:
+            emprestada[1] -= 1
+        return
+
+    with _conexoes_lock:
+        livres = _conexoes_livres.get(caminho)
+        conn = livres.pop() if livres else None
+    if conn is None:
+        migrar(caminho)
+        conn = _abrir_conexao(caminho)
+    emprestadas[caminho] = [conn, 1]
+    try:
+        yield conn
+    finally:
+        del emprestadas[caminho]
+        _devolver_conexao(caminho, conn)
+
+
+# Função para devolver uma conexão ao conjunto (fechada se o conjunto estiver cheio)
+def _devolver_conexao(caminho, conn):
+    if conn.in_transaction:
+        # Transação deixada aberta por um erro: nunca passa para o próximo uso
+        conn.execute("ROLLBACK")
+    with _conexoes_lock:
+        livres = _conexoes_livres.setdefault(caminho, [])
+        if len(livres) < MAX_CONEXOES_LIVRES:
+            livres.append(conn)
+            return
+    conn.close()
+
+
+# Contexto para leituras: empresta uma conexão sem abrir transação de escrita
+@contextmanager
+def conexao(caminho=None):
+    with _emprestar_conexao(caminho) as conn:
+        yield conn
+
+
+# Erro de uma escrita que esperou TIMEOUT_SEGUNDOS pela gravação de outra conexão sem conseguir começar
+class BancoOcupadoError(sqlite3.OperationalError):
+    pass
+
+
+# Contexto para escritas: tudo dentro do bloco é confirmado ou desfeito de uma vez.
+# Blocos aninhados participam da transação mais externa por meio de um savepoint:
+# um erro dentro deles desfaz apenas a parte deles, e nada é confirmado antes do bloco externo.
+# Com o banco reservado por outra gravação além do tempo de espera, levanta BancoOcupadoError.
+@contextmanager
+def transacao(caminho=None):
+    with _emprestar_conexao(caminho) as conn:
+        if conn.in_transaction:
+            conn.execute("SAVEPOINT transacao_aninhada")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO transacao_aninhada")
+                conn.execute("RELEASE transacao_aninhada")
+                raise
+            else:
+                conn.execute("RELEASE transacao_aninhada")
+            return
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                raise BancoOcupadoError("O banco de dados está ocupado por outra gravação.") from e
+            raise
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+
+# Função para fechar as conexões livres (útil em testes e scripts)
+def fechar_conexoes():
+    with _conexoes_lock:
+        conexoes = [conn for livres in _conexoes_livres.values() for conn in livres]
+        _conexoes_livres.clear()
+    for conn in conexoes:
+        conn.close()
+
+
+# Função para incrementar a versão dos dados dentro da transação de uma gravação
+def _incrementar_versao(conn):
+    conn.execute("UPDATE versao_dados SET versao = versao + 1 WHERE id = 1")
+
+
+# Função para obter a versão atual dos dados (muda a cada gravação de planilhas ou manutenções)
+def obter_versao_dados():
+    with conexao() as conn:
+        resultado = conn.execute("SELECT versao FROM versao_dados WHERE id = 1").fetchone()
+    return resultado[0] if resultado else 0
+
+
+# Função para obter a data e hora atual no fuso horário de São Paulo
+def obter_data_hora_sao_paulo():
+    # Definir o fuso horário de São Paulo
+    fuso_horario_sp = pytz.timezone('America/Sao_Paulo')
+
+    # Obter a data e hora atual no fuso horário UTC
+    data_hora_utc = datetime.now(pytz.UTC)
+
+    # Converter para o fuso horário de São Paulo
+    data_hora_sp = data_hora_utc.astimezone(fuso_horario_sp)
+
+    # Formatar a data e hora
+    return data_hora_sp.strftime('%d/%m/%Y %H:%M:%S')
+
+
+# Função para salvar a data e hora da última atualização
+def salvar_ultima_atualizacao():
+    # Obter data e hora no fuso horário de São Paulo
+    data_hora_atual = obter_data_hora_sao_paulo()
+
+    with transacao() as conn:
+        # Limpar tabela antes de inserir novo registro
+        conn.execute("DELETE FROM ultima_atualizacao")
+
+        # Inserir nova data/hora
+        conn.execute(
+            "INSERT INTO ultima_atualizacao (data_hora) VALUES (?)",
+            (data_hora_atual,)
+        )
+    return data_hora_atual
+
+
+# Função para obter a data e hora da última atualização
+def obter_ultima_atualizacao():
+    with conexao() as conn:
+        resultado = conn.execute("SELECT data_hora FROM ultima_atualizacao ORDER BY id DESC LIMIT 1").fetchone()
+
+    if resultado:
+        return resultado[0]
+    else:
+        return "Nenhuma atualização registrada"
+
+
+# Função para obter o maior id já usado em tarefas_ingestao (0 sem tarefas); é só leitura,
+# então não espera por uma gravação em andamento
+def obter_ultimo_id_tarefa_ingestao():
+    with conexao() as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM tarefas_ingestao").fetchone()[0]
+
+
+# Função para registrar uma tarefa de ingestão com o id já reservado em memória
+def criar_tarefa_ingestao(tarefa_id, tipo, estado, criada_em=None):
+    agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with transacao() as conn:
+        conn.execute(
+            "INSERT INTO tarefas_ingestao (id, tipo, estado, criada_em, atualizada_em) VALUES (?, ?, ?, ?, ?)",
+            (tarefa_id, tipo, estado, criada_em or agora, agora)
+        )
+
+
+# Função para atualizar o estado de uma tarefa de ingestão (mensagens e resultado são gravados como JSON)
+def atualizar_tarefa_ingestao(tarefa_id, estado, fase=None, mensagens=None, resultado=None):
+    agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with transacao() as conn:
+        conn.execute(
+            "UPDATE tarefas_ingestao SET estado = ?, fase = ?, mensagens = ?, resultado = ?, atualizada_em = ? WHERE id = ?",
+            (
+                estado, fase,
+                None if mensagens is None else json.dumps(mensagens, ensure_ascii=False),
+                None if resultado is None else json.dumps(resultado, ensure_ascii=False),
+                agora, tarefa_id
+            )
+        )
+
+
+# Função para converter uma linha de tarefas_ingestao em dicionário
+def _tarefa_ingestao(linha):
+    if linha is None:
+        return None
+    tarefa_id, tipo, estado, fase, mensagens, resultado, criada_em, atualizada_em = linha
+    return {
+        'id': tarefa_id,
+        'tipo': tipo,
+        'estado': estado,
+        'fase': fase,
+        'mensagens': json.loads(mensagens) if mensagens else [],
+        'resultado': json.loads(resultado) if resultado else {},
+        'criada_em': criada_em,
+        'atualizada_em': atualizada_em,
+    }
+
+
+# Função para obter uma tarefa de ingestão pelo id
+def obter_tarefa_ingestao(tarefa_id):
+    with conexao() as conn:
+        linha = conn.execute(
+            "SELECT id, tipo, estado, fase, mensagens, resultado, criada_em, atualizada_em FROM tarefas_ingestao WHERE id = ?",
+            (tarefa_id,)
+        ).fetchone()
+    return _tarefa_ingestao(linha)
+
+
+# Função para obter as tarefas de ingestão em um dos estados informados, da mais antiga para a mais nova
+def obter_tarefas_ingestao(estados):
+    marcadores = ', '.join('?' * len(estados))
+    with conexao() as conn:
+        linhas = conn.execute(
+            f"SELECT id, tipo, estado, fase, mensagens, resultado, criada_em, atualizada_em FROM tarefas_ingestao "
+            f"WHERE estado IN ({marcadores}) ORDER BY id",
+            list(estados)
+        ).fetchall()
+    return [_tarefa_ingestao(linha) for linha in linhas]
+
+
+# Função para obter a tabela da planilha inicial de um tipo (mensal como padrão)
+def tabela_planilha(tipo_manutencao):
+    return TABELAS_PLANILHA.get(tipo_manutencao, 'planilha_mensal')
+
+
+# Função para normalizar identificadores uma única vez (texto sem espaços; 123.0 vira "123")
+def normalizar_identificador(serie):
+    def normalizar(valor):
+        if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+            return None
+        if isinstance(valor, float) and valor.is_integer():
+            return str(int(valor))
+        texto = str(valor).strip()
+        return texto or None
+    return pd.Series([normalizar(valor) for valor in serie.tolist()], index=serie.index, dtype=object)
+
+
+# Função para converter um valor de célula em um tipo aceito pelo SQLite
+def _valor_sqlite(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, (int, float, str, bytes)):
+        return valor
+    return str(valor)
+
+
+# Função para converter uma coluna em valores do SQLite (None para células vazias)
+def _valores_sqlite(serie):
+    valores = serie.astype(object).where(serie.notna(), None).tolist()
+    return [_valor_sqlite(valor) for valor in valores]
+
+
+# Função para converter uma coluna de texto (Colaborador, Cliente) em valores do SQLite
+def _textos_sqlite(serie):
+    return [None if valor is None else str(valor) for valor in _valores_sqlite(serie)]
+
+
+# Função para gravar as linhas de uma planilha já com cabeçalho criado.
+# Com com_atributos=False, apenas as colunas tipadas vão para o SQLite (o restante está no arquivo Arrow).
+def _gravar_linhas(conn, origem, snapshot_id, df, inicio=0, com_atributos=True):
+    total = len(df)
+    linhas = range(inicio, inicio + total)
+    colunas_tipadas = {}
+    for coluna in COLUNAS_TIPADAS:
+        if coluna not in df.columns:
+            colunas_tipadas[coluna] = [None] * total
+        elif coluna == 'Identificador':
+            colunas_tipadas[coluna] = normalizar_identificador(df[coluna]).tolist()
+        else:
+            colunas_tipadas[coluna] = _textos_sqlite(df[coluna])
+
+    conn.executemany(
+        "INSERT INTO planilha_linhas (origem, snapshot_id, linha, identificador, colaborador, cliente) VALUES (?, ?, ?, ?, ?, ?)",
+        zip(
+            [origem] * total, [snapshot_id] * total, linhas,
+            colunas_tipadas['Identificador'], colunas_tipadas['Colaborador'], colunas_tipadas['Cliente']
+        )
+    )
+
+    if not com_atributos:
+        return
+
+    # Demais colunas: uma linha por célula preenchida
+    for coluna in df.columns:
+        if coluna in COLUNAS_TIPADAS:
+            continue
+        conn.executemany(
+            "INSERT INTO planilha_atributos (origem, snapshot_id, linha, coluna, valor) VALUES (?, ?, ?, ?, ?)",
+            (
+                (origem, snapshot_id, linha, str(coluna), valor)
+                for linha, valor in zip(linhas, _valores_sqlite(df[coluna]))
+                if valor is not None
+            )
+        )
+
+
+# Função para gravar as fotos de um bloco na tabela de anexos (linhas = posição de cada linha no snapshot)
+def _gravar_fotos(conn, origem, snapshot_id, df, colunas_fotos, linhas):
+    if 'Identificador' in df.columns:
+        identificadores = normalizar_identificador(df['Identificador']).tolist()
+    else:
+        identificadores = [None] * len(df)
+    for coluna in colunas_fotos:
+        conn.executemany(
+            "INSERT INTO anexos_fotos (origem, snapshot_id, linha, coluna, identificador, url) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (origem, snapshot_id, linha, coluna, identificador, str(valor))
+                for linha, identificador, valor in zip(linhas, identificadores, _valores_sqlite(df[coluna]))
+                if valor is not None and str(valor).strip()
+            )
+        )
+
+
+# Função para gravar um novo snapshot de uma origem a partir de blocos de linhas, sem publicá-lo.
+# Os blocos são lidos e o arquivo Arrow é escrito fora das transações; cada bloco vai para o SQLite em uma
+# transação curta, então uma planilha grande nunca reserva o banco por mais que um bloco. O snapshot só
+# passa a ser lido depois de publicar_snapshots; um erro remove o que já tinha sido gravado dele.
+@rastreado()
+def preparar_snapshot_em_blocos(origem, blocos, hash_conteudo=None):
+    tabela = TABELAS_SNAPSHOT[origem]
+    snapshot_id = None
+    escritor = None
+    total = 0
+    try:
+        for bloco in blocos:
+            # Fotos não entram no snapshot: vão para a tabela de anexos
+            colunas_fotos = [coluna for coluna in bloco.columns if coluna in COLUNAS_FOTOS]
+            colunas_snapshot = [coluna for coluna in bloco.columns if coluna not in COLUNAS_FOTOS]
+
+            if snapshot_id is None:
+                data_upload = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                colunas = json.dumps([str(coluna) for coluna in colunas_snapshot])
+                with transacao() as conn:
+                    if origem == ORIGEM_EQUIPAMENTOS:
+                        cursor = conn.execute(
+                            "INSERT INTO equipamentos (data_upload, colunas, linhas, hash_conteudo, publicado) "
+                            "VALUES (?, ?, 0, ?, 0)",
+                            (data_upload, colunas, hash_conteudo)
+                        )
+                    else:
+                        cursor = conn.execute(
+                            f"INSERT INTO {tabela} (data_upload, tipo_manutencao, colunas, linhas, hash_conteudo, publicado) "
+                            f"VALUES (?, ?, ?, 0, ?, 0)",
+                            (data_upload, origem, colunas, hash_conteudo)
+                        )
+                    snapshot_id = cursor.lastrowid
+
+                # Com o pyarrow disponível, a planilha completa vai para um arquivo Arrow e o SQLite
+                # guarda apenas o ponteiro e as colunas tipadas (usadas nos joins)
+                if arquivos_snapshot.arquivos_habilitados():
+                    escritor = arquivos_snapshot.EscritorArquivo(origem, snapshot_id, colunas_snapshot)
+
+            linhas = range(total, total + len(bloco))
+            bloco_snapshot = bloco[colunas_snapshot] if colunas_fotos else bloco
+            if escritor is not None:
+                bloco_arquivo = bloco_snapshot
+                if 'Identificador' in bloco_snapshot.columns:
+                    bloco_arquivo = bloco_snapshot.assign(
+                        Identificador=normalizar_identificador(bloco_snapshot['Identificador'])
+                    )
+                escritor.escrever(bloco_arquivo)
+
+            with transacao() as conn:
+                if colunas_fotos:
+                    _gravar_fotos(conn, origem, snapshot_id, bloco, colunas_fotos, linhas)
+                _gravar_linhas(conn, origem, snapshot_id, bloco_snapshot, inicio=total, com_atributos=escritor is None)
+            total += len(bloco)
+
+        if snapshot_id is None:
+            raise ValueError("A planilha não possui cabeçalho.")
+
+        arquivo = escritor.concluir() if escritor is not None else None
+        escritor = None
+        with transacao() as conn:
+            conn.execute(f"UPDATE {tabela} SET linhas = ?, arquivo = ? WHERE id = ?", (total, arquivo, snapshot_id))
+    except BaseException:
+        if escritor is not None:
+            escritor.descartar()
+        if snapshot_id is not None:
+            descartar_snapshots({origem: snapshot_id})
+        raise
+    return snapshot_id
+
+
+# Função para publicar, em uma única transação curta, snapshots já preparados ({origem: snapshot_id}):
+# o catálogo passa a apontar para eles, as manutenções dos tipos em tipos_a_limpar voltam a "não realizadas",
+# o status das planilhas publicadas é refeito e a versão dos dados muda. As sessões passam a ver todas
+# as planilhas novas juntas, nunca uma planilha nova ao lado das anteriores.
+def publicar_snapshots(snapshots, tipos_a_limpar=()):
+    with transacao() as conn:
+        for tipo_manutencao in tipos_a_limpar:
+            limpar_manutencoes_realizadas(tipo_manutencao)
+        for origem, snapshot_id in snapshots.items():
+            conn.execute(f"UPDATE {TABELAS_SNAPSHOT[origem]} SET publicado = 1 WHERE id = ?", (snapshot_id,))
+            _atualizar_catalogo(conn, origem, snapshot_id)
+        for origem in TABELAS_PLANILHA:
+            # Nova planilha: refazer o status materializado dela (o status não depende dos equipamentos)
+            if origem in snapshots:
+                _materializar_status(conn, origem)
+            # Os contadores dependem também dos equipamentos (uma linha por equipamento combinado)
+            if origem in snapshots or ORIGEM_EQUIPAMENTOS in snapshots:
+                _materializar_contagens(conn, origem)
+        _incrementar_versao(conn)
+
+
+# Função para remover um snapshot e as linhas dele na transação informada (o arquivo Arrow fica com quem chamou)
+def _remover_snapshot(conn, origem, snapshot_id):
+    for tabela_linhas in TABELAS_POR_SNAPSHOT:
+        conn.execute(f"DELETE FROM {tabela_linhas} WHERE origem = ? AND snapshot_id = ?", (origem, snapshot_id))
+    conn.execute(f"DELETE FROM {TABELAS_SNAPSHOT[origem]} WHERE id = ?", (snapshot_id,))
+
+
+# Função para descartar snapshots preparados e ainda não publicados ({origem: snapshot_id}), com os arquivos
+def descartar_snapshots(snapshots):
+    arquivos = []
+    with transacao() as conn:
+        for origem, snapshot_id in snapshots.items():
+            resultado = conn.execute(
+                f"SELECT arquivo FROM {TABELAS_SNAPSHOT[origem]} WHERE id = ? AND publicado = 0", (snapshot_id,)
+            ).fetchone()
+            if resultado is None:
+                continue
+            _remover_snapshot(conn, origem, snapshot_id)
+            if resultado[0]:
+                arquivos.append(resultado[0])
+    for arquivo in arquivos:
+        arquivos_snapshot.remover(arquivo)
+
+
+# Função para gravar e publicar um snapshot completo de uma origem
+def _salvar_snapshot(origem, blocos, hash_conteudo=None):
+    snapshot_id = preparar_snapshot_em_blocos(origem, blocos, hash_conteudo)
+    publicar_snapshots({origem: snapshot_id})
+    return snapshot_id
+
+
+# Função para mover para anexos_fotos as fotos dos snapshots atuais (migração 8)
+def _migrar_fotos_para_anexos(conn):
+    for origem, tabela in TABELAS_SNAPSHOT.items():
+        snapshot_id, colunas_planilha, arquivo = _snapshot_mais_recente(conn, origem)
+        if snapshot_id is None:
+            continue
+        colunas_fotos = [coluna for coluna in colunas_planilha if coluna in COLUNAS_FOTOS]
+        if not colunas_fotos:
+            continue
+        df = _ler_snapshot(
+            conn, origem, snapshot_id, colunas_planilha, ['Identificador'] + colunas_fotos, arquivo
+        )
+        _gravar_fotos(conn, origem, snapshot_id, df, colunas_fotos, df.index.tolist())
+        marcadores = ', '.join('?' * len(colunas_fotos))
+        conn.execute(
+            f"DELETE FROM planilha_atributos WHERE origem = ? AND snapshot_id = ? AND coluna IN ({marcadores})",
+            [origem, snapshot_id] + colunas_fotos
+        )
+        colunas_restantes = [coluna for coluna in colunas_planilha if coluna not in COLUNAS_FOTOS]
+        conn.execute(f"UPDATE {tabela} SET colunas = ? WHERE id = ?", (json.dumps(colunas_restantes), snapshot_id))
+
+
+# Função para popular setores_mapa e mapear os colaboradores já gravados (migração 10)
+def _migrar_setores(conn):
+    conn.executemany("INSERT INTO setores_mapa (setor, nome) VALUES (?, ?)", setores.REGRAS_PADRAO)
+    for origem in TABELAS_PLANILHA:
+        snapshot_id, _, arquivo = _snapshot_mais_recente(conn, origem)
+        if snapshot_id is None:
+            continue
+        colaboradores = [
+            linha[0] for linha in conn.execute(
+                "SELECT DISTINCT colaborador FROM planilha_linhas "
+                "WHERE origem = ? AND snapshot_id = ? AND colaborador IS NOT NULL",
+                (origem, snapshot_id)
+            )
+        ]
+        for colaborador in colaboradores:
+            setor = setores.substituir_por_setor(colaborador)
+            if setor != colaborador:
+                conn.execute(
+                    "UPDATE planilha_linhas SET colaborador = ? "
+                    "WHERE origem = ? AND snapshot_id = ? AND colaborador = ?",
+                    (setor, origem, snapshot_id, colaborador)
+                )
+        if arquivo:
+            df = arquivos_snapshot.ler(arquivo)
+            if df is not None and 'Colaborador' in df.columns:
+                arquivos_snapshot.gravar(origem, snapshot_id, setores.aplicar_setores(df))
+
+
+# Função para obter as regras de mapeamento de setores, em ordem de prioridade: ((setor, nome), ...)
+def obter_regras_setores():
+    with conexao() as conn:
+        return tuple(conn.execute("SELECT setor, nome FROM setores_mapa ORDER BY id").fetchall())
+
+
+# Função para refazer o status materializado da planilha atual de uma origem: uma linha por
+# identificador e tipo em status_equipamento
+@rastreado()
+def _materializar_status(conn, origem):
+    conn.execute("DELETE FROM status_equipamento WHERE origem = ?", (origem,))
+    planilha_id = _snapshot_atual(conn, origem)[0]
+    if planilha_id is None:
+        return
+
+    tipos = ' UNION ALL '.join('SELECT ? AS tipo' for _ in TIPOS_MANUTENCAO)
+    conn.execute(
+        f'''
+        INSERT INTO status_equipamento (origem, snapshot_id, identificador, tipo_manutencao, realizada)
+        SELECT ?, ?, p.identificador, t.tipo, EXISTS (
+            SELECT 1 FROM manutencoes_realizadas m
+            WHERE m.identificador = p.identificador AND m.tipo_manutencao = t.tipo
+        )
+        FROM (
+            SELECT DISTINCT identificador FROM planilha_linhas
+            WHERE origem = ? AND snapshot_id = ? AND identificador IS NOT NULL
+        ) p
+        CROSS JOIN ({tipos}) t
+        ''',
+        [origem, planilha_id, origem, planilha_id] + TIPOS_MANUTENCAO
+    )
+
+
+# Função para obter as expressões SQL de Colaborador e Cliente nos dados combinados: a coluna da planilha
+# quando ela existe, senão a do equipamento (como em combinar_planilhas, sem o sufixo _equip)
+def _dimensoes_contagens(colunas_planilha):
+    return [
+        f"{'p' if dimensao in colunas_planilha else 'e'}.{COLUNAS_TIPADAS[dimensao]}"
+        for dimensao in DIMENSOES_CONTAGENS
+    ]
+
+
+# Função para refazer os contadores da planilha atual de uma origem: uma linha por tipo de manutenção,
+# Colaborador e Cliente com as linhas, os equipamentos e as manutenções realizadas dos dados combinados
+# (cada linha da planilha conta uma vez por equipamento com o mesmo identificador)
+@rastreado()
+def _materializar_contagens(conn, origem):
+    conn.execute("DELETE FROM contagens_status WHERE origem = ?", (origem,))
+    planilha_id, colunas_planilha, _ = _snapshot_atual(conn, origem)
+    equipamentos_id = _snapshot_atual(conn, ORIGEM_EQUIPAMENTOS)[0]
+    if planilha_id is None:
+        return
+
+    colaborador, cliente = _dimensoes_contagens(colunas_planilha)
+    tipos = ' UNION ALL '.join('SELECT ? AS tipo' for _ in TIPOS_MANUTENCAO)
+    conn.execute(
+        f'''
+        INSERT INTO contagens_status (origem, snapshot_id, tipo_manutencao, colaborador, cliente, linhas, total, realizadas)
+        SELECT ?, ?, t.tipo, {colaborador}, {cliente}, COUNT(*), COUNT(p.identificador), COALESCE(SUM(s.realizada), 0)
+        FROM planilha_linhas p
+        LEFT JOIN planilha_linhas e
+            ON e.origem = ? AND e.snapshot_id = ? AND e.identificador = p.identificador
+        CROSS JOIN ({tipos}) t
+        LEFT JOIN status_equipamento s
+            ON s.origem = ? AND s.snapshot_id = ? AND s.identificador = p.identificador AND s.tipo_manutencao = t.tipo
+        WHERE p.origem = ? AND p.snapshot_id = ?
+        GROUP BY t.tipo, {colaborador}, {cliente}
+        ''',
+        [origem, planilha_id, ORIGEM_EQUIPAMENTOS, equipamentos_id] + TIPOS_MANUTENCAO
+        + [origem, planilha_id, origem, planilha_id]
+    )
+
+
+# Função para marcar como realizadas, no status materializado, manutenções recém-registradas,
+# somando as linhas combinadas de cada identificador marcado aos contadores do Colaborador e Cliente dele.
+# Só toca nos identificadores recebidos, então o custo acompanha o tamanho da planilha diária.
+def _marcar_realizadas(conn, pares):
+    por_tipo = {}
+    for identificador, tipo_manutencao in pares:
+        por_tipo.setdefault(tipo_manutencao, []).append(identificador)
+
+    equipamentos_id = _snapshot_atual(conn, ORIGEM_EQUIPAMENTOS)[0]
+    for origem in TABELAS_PLANILHA:
+        planilha_id, colunas_planilha, _ = _snapshot_atual(conn, origem)
+        if planilha_id is None:
+            continue
+        colaborador, cliente = _dimensoes_contagens(colunas_planilha)
+        for tipo_manutencao, identificadores in por_tipo.items():
+            for inicio in range(0, len(identificadores), TAMANHO_LOTE_CONSULTA):
+                lote = identificadores[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+                marcadores = ', '.join('?' * len(lote))
+                # Apenas os identificadores ainda pendentes mudam os contadores
+                marcados = [
+                    linha[0] for linha in conn.execute(
+                        f"SELECT identificador FROM status_equipamento "
+                        f"WHERE origem = ? AND snapshot_id = ? AND tipo_manutencao = ? AND realizada = 0 "
+                        f"AND identificador IN ({marcadores})",
+                        [origem, planilha_id, tipo_manutencao] + lote
+                    )
+                ]
+                if not marcados:
+                    continue
+                marcadores = ', '.join('?' * len(marcados))
+                conn.execute(
+                    f"UPDATE status_equipamento SET realizada = 1 "
+                    f"WHERE origem = ? AND snapshot_id = ? AND tipo_manutencao = ? AND identificador IN ({marcadores})",
+                    [origem, planilha_id, tipo_manutencao] + marcados
+                )
+                deltas = conn.execute(
+                    f'''
+                    SELECT {colaborador}, {cliente}, COUNT(*)
+                    FROM planilha_linhas p
+                    LEFT JOIN planilha_linhas e
+                        ON e.origem = ? AND e.snapshot_id = ? AND e.identificador = p.identificador
+                    WHERE p.origem = ? AND p.snapshot_id = ? AND p.identificador IN ({marcadores})
+                    GROUP BY {colaborador}, {cliente}
+                    ''',
+                    [ORIGEM_EQUIPAMENTOS, equipamentos_id, origem, planilha_id] + marcados
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE contagens_status SET realizadas = realizadas + ? "
+                    "WHERE origem = ? AND snapshot_id = ? AND tipo_manutencao = ? "
+                    "AND colaborador IS ? AND cliente IS ?",
+                    [
+                        (quantidade, origem, planilha_id, tipo_manutencao, valor_colaborador, valor_cliente)
+                        for valor_colaborador, valor_cliente, quantidade in deltas
+                    ]
+                )
+
+
+# Função para popular o catálogo com o snapshot mais recente de cada origem (migração 17)
+def _migrar_catalogo(conn):
+    for origem in TABELAS_SNAPSHOT:
+        snapshot_id = _snapshot_mais_recente(conn, origem)[0]
+        if snapshot_id is not None:
+            _atualizar_catalogo(conn, origem, snapshot_id)
+
+
+# Função para converter para o novo formato o JSON mais recente de cada origem (migração 3)
+def _migrar_planilhas_json(conn):
+    for origem, tabela in TABELAS_SNAPSHOT.items():
+        resultado = conn.execute(
+            f"SELECT id, dados FROM {tabela} WHERE dados IS NOT NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if not resultado:
+            continue
+        snapshot_id, dados = resultado
+        df = pd.read_json(io.StringIO(dados), orient='records')
+        conn.execute(
+            f"UPDATE {tabela} SET colunas = ?, linhas = ?, dados = NULL WHERE id = ?",
+            (json.dumps([str(coluna) for coluna in df.columns]), len(df), snapshot_id)
+        )
+        _gravar_linhas(conn, origem, snapshot_id, df)
+
+
+# Função para converter os snapshots que continuaram em JSON (migração 22): a migração 3 só converteu
+# o mais recente de cada origem, e os anteriores ficavam ilegíveis no histórico. Cada um recebe o formato
+# atual, como os convertidos pelas migrações 8 e 10: fotos em anexos_fotos e colaboradores mapeados para setores.
+# Um JSON inválido continua como está (ilegível, removido pela compactação).
+def _migrar_historico_json(conn):
+    regras = tuple(conn.execute("SELECT setor, nome FROM setores_mapa ORDER BY id").fetchall())
+    for origem, tabela in TABELAS_SNAPSHOT.items():
+        pendentes = [
+            linha[0] for linha in conn.execute(
+                f"SELECT id FROM {tabela} WHERE colunas IS NULL AND dados IS NOT NULL ORDER BY id"
+            )
+        ]
+        for snapshot_id in pendentes:
+            dados = conn.execute(f"SELECT dados FROM {tabela} WHERE id = ?", (snapshot_id,)).fetchone()[0]
+            try:
+                df = pd.read_json(io.StringIO(dados), orient='records')
+            except ValueError:
+                continue
+            colunas_fotos = [coluna for coluna in df.columns if coluna in COLUNAS_FOTOS]
+            if colunas_fotos:
+                _gravar_fotos(conn, origem, snapshot_id, df, colunas_fotos, range(len(df)))
+                df = df.drop(columns=colunas_fotos)
+            if origem in TABELAS_PLANILHA:
+                df = setores.aplicar_setores(df, regras)
+            conn.execute(
+                f"UPDATE {tabela} SET colunas = ?, linhas = ?, dados = NULL WHERE id = ?",
+                (json.dumps([str(coluna) for coluna in df.columns]), len(df), snapshot_id)
+            )
+            _gravar_linhas(conn, origem, snapshot_id, df)
+
+
+# Função para normalizar os identificadores já gravados em manutencoes_realizadas (migração 23).
+# O aplicativo original gravava str() da célula: "123.0" para números lidos como float pelo Excel e
+# "nan" para células vazias, que deixaram de casar com os identificadores normalizados das planilhas.
+# Cada texto volta ao valor da célula e passa por normalizar_identificador; quando dois registros do mesmo
+# tipo chegam ao mesmo identificador, fica o mais antigo (como na migração 5), e vazios são removidos.
+def _migrar_identificadores_realizados(conn):
+    def valor_da_celula(texto):
+        if texto is None or texto in ('nan', 'None'):
+            return None
+        try:
+            numero = float(texto)
+        except ValueError:
+            return texto
+        return numero if '.' in texto and numero.is_integer() else texto
+
+    linhas = conn.execute(
+        "SELECT id, identificador, tipo_manutencao FROM manutencoes_realizadas ORDER BY id"
+    ).fetchall()
+    normalizados = normalizar_identificador(pd.Series([valor_da_celula(linha[1]) for linha in linhas], dtype=object))
+    vistos = set()
+    remover = []
+    atualizar = []
+    for (registro_id, identificador, tipo_manutencao), normalizado in zip(linhas, normalizados.tolist()):
+        if normalizado is None or (normalizado, tipo_manutencao) in vistos:
+            remover.append((registro_id,))
+            continue
+        vistos.add((normalizado, tipo_manutencao))
+        if normalizado != identificador:
+            atualizar.append((normalizado, registro_id))
+    if not remover and not atualizar:
+        return
+
+    # Remoções antes das atualizações: nenhum identificador novo colide com um registro que vai sair
+    conn.executemany("DELETE FROM manutencoes_realizadas WHERE id = ?", remover)
+    conn.executemany("UPDATE manutencoes_realizadas SET identificador = ? WHERE id = ?", atualizar)
+    for origem in TABELAS_PLANILHA:
+        _materializar_status(conn, origem)
+        _materializar_contagens(conn, origem)
+    _incrementar_versao(conn)
+
+
+# Função para salvar a planilha no banco de dados de acordo com o tipo
+def salvar_planilha(df, tipo_manutencao=TIPO_MANUTENCAO_MENSAL, hash_conteudo=None):
+    # Se não for um tipo conhecido, usar mensal como padrão
+    origem = tipo_manutencao if tipo_manutencao in TABELAS_PLANILHA else TIPO_MANUTENCAO_MENSAL
+    return _salvar_snapshot(origem, [df], hash_conteudo)
+
+
+# Função para salvar uma planilha lida em blocos (ver ingestao.ler_planilha_em_blocos)
+def salvar_planilha_em_blocos(blocos, tipo_manutencao=TIPO_MANUTENCAO_MENSAL, hash_conteudo=None):
+    origem = tipo_manutencao if tipo_manutencao in TABELAS_PLANILHA else TIPO_MANUTENCAO_MENSAL
+    return _salvar_snapshot(origem, blocos, hash_conteudo)
+
+
+# Função para salvar a planilha mensal no banco de dados (mantida para compatibilidade)
+def salvar_planilha_mensal(df):
+    return salvar_planilha(df, TIPO_MANUTENCAO_MENSAL)
+
+
+# Função para salvar a planilha de equipamentos no banco de dados
+def salvar_equipamentos(df, hash_conteudo=None):
+    return _salvar_snapshot(ORIGEM_EQUIPAMENTOS, [df], hash_conteudo)
+
+
+# Função para salvar a planilha de equipamentos lida em blocos
+def salvar_equipamentos_em_blocos(blocos, hash_conteudo=None):
+    return _salvar_snapshot(ORIGEM_EQUIPAMENTOS, blocos, hash_conteudo)
+
+
+# Função para obter o id do snapshot atual de uma origem, se ele veio de um arquivo com o mesmo hash.
+# Um reenvio idêntico reaproveita esse snapshot sem ler a planilha de novo.
+def obter_snapshot_por_hash(origem, hash_conteudo):
+    with conexao() as conn:
+        resultado = conn.execute(
+            "SELECT snapshot_id, hash_conteudo FROM catalogo_planilhas WHERE origem = ?", (origem,)
+        ).fetchone()
+    if resultado and hash_conteudo and resultado[1] == hash_conteudo:
+        return resultado[0]
+    return None
+
+
+# Função para obter o snapshot atual (id, colunas e arquivo Arrow) de uma origem, pelo catálogo
+def _snapshot_atual(conn, origem):
+    try:
+        resultado = conn.execute(
+            "SELECT snapshot_id, colunas, arquivo FROM catalogo_planilhas WHERE origem = ?", (origem,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Migrações anteriores à 16 (banco antigo sendo migrado): o catálogo ainda não existe
+        return _snapshot_mais_recente(conn, origem)
+    if not resultado:
+        return None, None, None
+    return resultado[0], json.loads(resultado[1]), resultado[2]
+
+
+# Função para obter o snapshot mais recente de uma origem direto da tabela de snapshots
+# (usada pelas migrações anteriores ao catálogo e para atualizá-lo)
+def _snapshot_mais_recente(conn, origem):
+    tabela = TABELAS_SNAPSHOT[origem]
+    resultado = conn.execute(
+        f"SELECT id, colunas, arquivo FROM {tabela} WHERE colunas IS NOT NULL ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    if not resultado:
+        return None, None, None
+    return resultado[0], json.loads(resultado[1]), resultado[2]
+
+
+# Função para registrar no catálogo um snapshot como o atual da origem (na transação da gravação)
+def _atualizar_catalogo(conn, origem, snapshot_id):
+    conn.execute(
+        "INSERT OR REPLACE INTO catalogo_planilhas "
+        "(origem, snapshot_id, colunas, arquivo, linhas, data_upload, hash_conteudo) "
+        f"SELECT ?, id, colunas, arquivo, linhas, data_upload, hash_conteudo FROM {TABELAS_SNAPSHOT[origem]} WHERE id = ?",
+        (origem, snapshot_id)
+    )
+
+
+# Função para obter o catálogo das planilhas: origem -> {snapshot_id, linhas, data_upload, hash_conteudo}
+# (None para as origens ainda não carregadas)
+def obter_catalogo_planilhas():
+    catalogo = {origem: None for origem in TABELAS_SNAPSHOT}
+    with conexao() as conn:
+        for origem, snapshot_id, linhas, data_upload, hash_conteudo in conn.execute(
+            "SELECT origem, snapshot_id, linhas, data_upload, hash_conteudo FROM catalogo_planilhas"
+        ):
+            catalogo[origem] = {
+                'snapshot_id': snapshot_id,
+                'linhas': linhas,
+                'data_upload': data_upload,
+                'hash_conteudo': hash_conteudo,
+            }
+    return catalogo
+
+
+# Função para ler as linhas de um snapshot, apenas com as colunas pedidas
+def _ler_snapshot(conn, origem, snapshot_id, colunas_planilha, colunas=None, arquivo=None):
+    colunas_lidas = [c for c in colunas_planilha if colunas is None or c in colunas]
+
+    # Snapshot em arquivo: memory-map e projeção direto no Arrow
+    if arquivo:
+        df = arquivos_snapshot.ler(arquivo, colunas_lidas)
+        if df is not None:
+            df.index.name = 'linha'
+            return df
+
+    # Colunas próprias: uma única leitura pela chave primária
+    tipadas = [c for c in colunas_lidas if c in COLUNAS_TIPADAS]
+    campos = ', '.join(['linha'] + [COLUNAS_TIPADAS[c] for c in tipadas])
+    df = pd.read_sql_query(
+        f"SELECT {campos} FROM planilha_linhas WHERE origem = ? AND snapshot_id = ? ORDER BY linha",
+        conn, params=(origem, snapshot_id), index_col='linha'
+    )
+    df.columns = tipadas
+    if 'Identificador' in df.columns:
+        df['Identificador'] = df['Identificador'].astype(object)
+
+    # Demais colunas: apenas as pedidas, remontadas em formato largo
+    extras = [c for c in colunas_lidas if c not in COLUNAS_TIPADAS]
+    if extras:
+        marcadores = ', '.join('?' * len(extras))
+        atributos = pd.read_sql_query(
+            f"SELECT linha, coluna, valor FROM planilha_atributos "
+            f"WHERE origem = ? AND snapshot_id = ? AND coluna IN ({marcadores})",
+            conn, params=[origem, snapshot_id] + extras
+        )
+        largos = atributos.pivot(index='linha', columns='coluna', values='valor')
+        df = df.join(largos.reindex(columns=extras).infer_objects())
+
+    return df.reindex(columns=colunas_lidas)
+
+
+# Função para obter a planilha inicial mais recente de um tipo de manutenção
+@rastreado()
+def obter_planilha(tipo_manutencao=TIPO_MANUTENCAO_MENSAL, colunas=None):
+    origem = tipo_manutencao if tipo_manutencao in TABELAS_PLANILHA else TIPO_MANUTENCAO_MENSAL
+    with conexao() as conn:
+        snapshot_id, colunas_planilha, arquivo = _snapshot_atual(conn, origem)
+        if snapshot_id is None:
+            return None
+        return _ler_snapshot(conn, origem, snapshot_id, colunas_planilha, colunas, arquivo).reset_index(drop=True)
+
+
+# Função para obter a planilha mensal mais recente
+def obter_planilha_mensal(colunas=None):
+    return obter_planilha(TIPO_MANUTENCAO_MENSAL, colunas)
+
+
+# Função para obter a planilha de equipamentos mais recente
+@rastreado()
+def obter_equipamentos(colunas=None):
+    with conexao() as conn:
+        snapshot_id, colunas_planilha, arquivo = _snapshot_atual(conn, ORIGEM_EQUIPAMENTOS)
+        if snapshot_id is None:
+            return None
+        return _ler_snapshot(
+            conn, ORIGEM_EQUIPAMENTOS, snapshot_id, colunas_planilha, colunas, arquivo
+        ).reset_index(drop=True)
+
+
+# Função para combinar a planilha inicial com a de equipamentos por um join indexado no SQLite.
+# Equivale a pd.merge(planilha, equipamentos, on='Identificador', how='left', suffixes=('', '_equip')).
+@rastreado()
+def combinar_planilhas(tipo_manutencao=TIPO_MANUTENCAO_MENSAL, colunas=None):
+    origem = tipo_manutencao if tipo_manutencao in TABELAS_PLANILHA else TIPO_MANUTENCAO_MENSAL
+    with conexao() as conn:
+        planilha_id, colunas_planilha, arquivo_planilha = _snapshot_atual(conn, origem)
+        equipamentos_id, colunas_equipamentos, arquivo_equipamentos = _snapshot_atual(conn, ORIGEM_EQUIPAMENTOS)
+        if planilha_id is None or equipamentos_id is None:
+            return None
+
+        if 'Identificador' not in colunas_planilha or 'Identificador' not in colunas_equipamentos:
+            raise ValueError("As planilhas devem conter a coluna 'Identificador' para a combinação de dados.")
+
+        # Pares (linha da planilha, linha do equipamento) resolvidos pelo índice de identificador
+        pares = pd.read_sql_query(
+            """
+            SELECT p.linha AS linha_planilha, e.linha AS linha_equipamento
+            FROM planilha_linhas p
+            LEFT JOIN planilha_linhas e
+                ON e.origem = ? AND e.snapshot_id = ? AND e.identificador = p.identificador
+            WHERE p.origem = ? AND p.snapshot_id = ?
+            ORDER BY p.linha, e.linha
+            """,
+            conn, params=(ORIGEM_EQUIPAMENTOS, equipamentos_id, origem, planilha_id)
+        )
+
+        # Colunas do equipamento com o mesmo nome de uma coluna da planilha recebem o sufixo _equip
+        nomes_equipamento = {
+            c: (f"{c}_equip" if c in colunas_planilha else c)
+            for c in colunas_equipamentos if c != 'Identificador'
+        }
+        colunas_equipamento_lidas = [
+            c for c, nome in nomes_equipamento.items() if colunas is None or nome in colunas
+        ]
+        colunas_planilha_lidas = None if colunas is None else list(dict.fromkeys(['Identificador'] + list(colunas)))
+
+        df_planilha = _ler_snapshot(
+            conn, origem, planilha_id, colunas_planilha, colunas_planilha_lidas, arquivo_planilha
+        )
+        df_equipamentos = _ler_snapshot(
+            conn, ORIGEM_EQUIPAMENTOS, equipamentos_id, colunas_equipamentos, colunas_equipamento_lidas,
+            arquivo_equipamentos
+        )
+
+    df_combinado = df_planilha.reindex(pares['linha_planilha']).reset_index(drop=True)
+    if not df_equipamentos.columns.empty:
+        parte_equipamentos = df_equipamentos.reindex(pares['linha_equipamento']).reset_index(drop=True)
+        parte_equipamentos.columns = [nomes_equipamento[c] for c in parte_equipamentos.columns]
+        df_combinado = pd.concat([df_combinado, parte_equipamentos], axis=1)
+    return df_combinado
+
+
+# Função para obter as fotos de um equipamento nos snapshots atuais, apenas quando pedidas.
+# Retorna uma lista de (origem, coluna, url).
+def obter_fotos(identificador):
+    identificador = normalizar_identificador(pd.Series([identificador])).iloc[0]
+    fotos = []
+    if identificador is None:
+        return fotos
+    with conexao() as conn:
+        for origem in TABELAS_SNAPSHOT:
+            snapshot_id, _, _ = _snapshot_atual(conn, origem)
+            if snapshot_id is None:
+                continue
+            fotos.extend(conn.execute(
+                "SELECT origem, coluna, url FROM anexos_fotos "
+                "WHERE origem = ? AND snapshot_id = ? AND identificador = ? ORDER BY linha, coluna",
+                (origem, snapshot_id, identificador)
+            ).fetchall())
+    return fotos
+
+
+# Função para listar o catálogo de snapshots de todas as origens, do mais recente para o mais antigo
+def listar_snapshots():
+    partes = []
+    with conexao() as conn:
+        for origem, tabela in TABELAS_SNAPSHOT.items():
+            atual = _snapshot_atual(conn, origem)[0]
+            df = pd.read_sql_query(
+                f"SELECT id, data_upload, linhas, arquivo, hash_conteudo, fixado, colunas IS NOT NULL AS legivel "
+                f"FROM {tabela} WHERE publicado = 1 ORDER BY id DESC",
+                conn
+            )
+            df.insert(0, 'origem', origem)
+            df['atual'] = df['id'] == atual
+            partes.append(df)
+    catalogo = pd.concat(partes, ignore_index=True)
+    catalogo['fixado'] = catalogo['fixado'].astype(bool)
+    catalogo['legivel'] = catalogo['legivel'].astype(bool)
+    return catalogo
+
+
+# Função para fixar (ou liberar) um snapshot: snapshots fixados não são removidos pela retenção
+def fixar_snapshot(origem, snapshot_id, fixado=True):
+    with transacao() as conn:
+        conn.execute(f"UPDATE {TABELAS_SNAPSHOT[origem]} SET fixado = ? WHERE id = ?", (int(fixado), snapshot_id))
+
+
+# Função para escolher os snapshots de uma origem que a política de retenção não mantém.
+# Retorna [(id, arquivo)]; snapshots sem colunas (JSON antigo, não mais lido) só ficam se fixados.
+# Snapshots preparados e nunca publicados (tarefa interrompida) também saem: a compactação roda na fila
+# das tarefas, então nenhuma preparação está em andamento.
+def _snapshots_expirados(conn, origem, versoes, meses):
+    tabela = TABELAS_SNAPSHOT[origem]
+    abandonados = conn.execute(f"SELECT id, arquivo FROM {tabela} WHERE publicado = 0").fetchall()
+    linhas = conn.execute(
+        f"SELECT id, data_upload, fixado, arquivo, colunas IS NOT NULL FROM {tabela} WHERE publicado = 1 ORDER BY id DESC"
+    ).fetchall()
+    legiveis = [linha for linha in linhas if linha[4]]
+    manter = {linha[0] for linha in legiveis[:max(versoes, 1)]}
+    meses_vistos = set()
+    for snapshot_id, data_upload, _, _, _ in legiveis:
+        mes = (data_upload or '')[:7]
+        if mes not in meses_vistos and len(meses_vistos) < meses:
+            meses_vistos.add(mes)
+            manter.add(snapshot_id)
+    return abandonados + [(linha[0], linha[3]) for linha in linhas if linha[0] not in manter and not linha[2]]
+
+
+# Função para compactar o banco: remove os snapshots fora da política de retenção (linhas, atributos,
+# fotos e arquivos Arrow), apaga arquivos Arrow sem snapshot e devolve o espaço livre ao sistema.
+# Retorna {'removidos': quantidade de snapshots, 'paginas_liberadas': páginas devolvidas}.
+def compactar_snapshots(versoes=RETENCAO_VERSOES, meses=RETENCAO_MESES):
+    arquivos_removidos = []
+    removidos = 0
+    with transacao() as conn:
+        for origem, tabela in TABELAS_SNAPSHOT.items():
+            expirados = _snapshots_expirados(conn, origem, versoes, meses)
+            for snapshot_id, arquivo in expirados:
+                _remover_snapshot(conn, origem, snapshot_id)
+                if arquivo:
+                    arquivos_removidos.append(arquivo)
+            removidos += len(expirados)
+        referenciados = set()
+        for tabela in TABELAS_SNAPSHOT.values():
+            referenciados.update(
+                arquivo for (arquivo,) in conn.execute(f"SELECT arquivo FROM {tabela} WHERE arquivo IS NOT NULL")
+            )
+
+    # Arquivos apagados só depois da confirmação (leitores podem estar com o snapshot anterior aberto,
+    # o que o sistema permite: o arquivo some do diretório, mas o mapeamento continua válido)
+    for arquivo in arquivos_removidos:
+        arquivos_snapshot.remover(arquivo)
+    for arquivo in arquivos_snapshot.listar():
+        if arquivo not in referenciados:
+            arquivos_snapshot.remover(arquivo)
+
+    return {'removidos': removidos, 'paginas_liberadas': _recuperar_espaco()}
+
+
+# Função para devolver as páginas livres do banco ao sistema de arquivos, sem VACUUM completo.
+# Um banco ainda sem auto_vacuum incremental (convertido por migrar) reaproveita as páginas livres nas gravações.
+def _recuperar_espaco():
+    with conexao() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        try:
+            if livres:
+                # executescript executa o pragma até o fim (execute libera apenas uma página por passo)
+                conn.executescript("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        except sqlite3.OperationalError:
+            # Banco ocupado por outra conexão: o espaço fica para a próxima compactação
+            return 0
+    return livres
+
+
+# Função para obter o número de páginas livres do banco (usado para decidir quando compactar)
+def obter_paginas_livres():
+    with conexao() as conn:
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+# Função para verificar quais planilhas já foram carregadas
+def obter_status_planilhas():
+    return status_do_catalogo(obter_catalogo_planilhas())
+
+
+# Função para obter, a partir do catálogo, quais planilhas já foram carregadas
+def status_do_catalogo(catalogo):
+    return {origem: entrada is not None for origem, entrada in catalogo.items()}
+
+
+# Função para limpar as manutenções realizadas para que todas comecem como "não realizadas"
+def limpar_manutencoes_realizadas(tipo_manutencao=None):
+    with transacao() as conn:
+        if tipo_manutencao:
+            conn.execute("DELETE FROM manutencoes_realizadas WHERE tipo_manutencao = ?", (tipo_manutencao,))
+            conn.execute("UPDATE status_equipamento SET realizada = 0 WHERE tipo_manutencao = ?", (tipo_manutencao,))
+            conn.execute("UPDATE contagens_status SET realizadas = 0 WHERE tipo_manutencao = ?", (tipo_manutencao,))
+        else:
+            conn.execute("DELETE FROM manutencoes_realizadas")
+            conn.execute("UPDATE status_equipamento SET realizada = 0")
+            conn.execute("UPDATE contagens_status SET realizadas = 0")
+        _incrementar_versao(conn)
+
+
+# Função para obter, em uma única consulta, os identificadores com manutenção realizada
+def obter_identificadores_realizados(tipo_manutencao=None):
+    consulta = "SELECT DISTINCT identificador FROM manutencoes_realizadas"
+    parametros = []
+
+    # Adicionar filtro por tipo de manutenção, se fornecido
+    if tipo_manutencao and tipo_manutencao in TIPOS_MANUTENCAO:
+        consulta += " WHERE tipo_manutencao = ?"
+        parametros.append(tipo_manutencao)
+
+    with conexao() as conn:
+        return {linha[0] for linha in conn.execute(consulta, parametros)}
+
+
+# Função para obter, do status materializado, o status de cada identificador da planilha atual em todos os tipos.
+# Retorna um DataFrame indexado pelo identificador com uma coluna booleana por tipo (COLUNAS_STATUS).
+@rastreado()
+def obter_matriz_status(tipo_planilha=TIPO_MANUTENCAO_MENSAL):
+    origem = tipo_planilha if tipo_planilha in TABELAS_PLANILHA else TIPO_MANUTENCAO_MENSAL
+    campos = ', '.join(
+        f"MAX(CASE WHEN tipo_manutencao = '{tipo}' THEN realizada ELSE 0 END) AS {coluna}"
+        for tipo, coluna in COLUNAS_STATUS.items()
+    )
+    with conexao() as conn:
+        planilha_id = _snapshot_atual(conn, origem)[0]
+        matriz = pd.read_sql_query(
+            f"SELECT identificador, {campos} FROM status_equipamento "
+            f"WHERE origem = ? AND snapshot_id = ? GROUP BY identificador",
+            conn, params=(origem, planilha_id), index_col='identificador'
+        )
+    return matriz.astype(bool)
+
+
+# Função para obter os contadores materializados da planilha atual (cubo de contagens).
+# Retorna (versão dos dados, DataFrame com Colaborador, Cliente, Tipo, Linhas, Total_Equipamentos e
+# Manutencoes_Realizadas), lidos na mesma consulta para que a versão corresponda aos contadores.
+def obter_contagens_status(tipo_planilha=TIPO_MANUTENCAO_MENSAL):
+    origem = tipo_planilha if tipo_planilha in TABELAS_PLANILHA else TIPO_MANUTENCAO_MENSAL
+    with conexao() as conn:
+        contagens = pd.read_sql_query(
+            '''
+            SELECT (SELECT versao FROM versao_dados WHERE id = 1) AS versao,
+                colaborador AS Colaborador, cliente AS Cliente, tipo_manutencao AS Tipo,
+                linhas AS Linhas, total AS Total_Equipamentos, realizadas AS Manutencoes_Realizadas
+            FROM contagens_status
+            WHERE origem = ? AND snapshot_id = (SELECT snapshot_id FROM catalogo_planilhas WHERE origem = ?)
+            ''',
+            conn, params=(origem, origem)
+        )
+    versao = int(contagens['versao'].iloc[0]) if len(contagens) else None
+    return versao, contagens.drop(columns='versao')
+
+
+# Função para registrar manutenções realizadas em lote, em uma única transação.
+# Cada registro é (data_upload, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, cumprimento);
+# identificadores já registrados para o tipo são ignorados pelo índice único.
+# O status materializado é atualizado na mesma transação, apenas para os pares novos.
+def inserir_manutencoes_realizadas(registros):
+    registros = list(registros)
+    with transacao() as conn:
+        novos = _pares_nao_registrados(conn, {(r[1], r[5]) for r in registros})
+        alteracoes_antes = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO manutencoes_realizadas (data_upload, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, cumprimento) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            registros
+        )
+        inseridos = conn.total_changes - alteracoes_antes
+        if inseridos:
+            _marcar_realizadas(conn, novos)
+            _incrementar_versao(conn)
+        return inseridos
+
+
+# Função para filtrar os pares (identificador, tipo) que ainda não têm manutenção registrada
+def _pares_nao_registrados(conn, pares):
+    por_tipo = {}
+    for identificador, tipo_manutencao in pares:
+        por_tipo.setdefault(tipo_manutencao, []).append(identificador)
+    novos = set(pares)
+    for tipo_manutencao, identificadores in por_tipo.items():
+        for inicio in range(0, len(identificadores), TAMANHO_LOTE_CONSULTA):
+            lote = identificadores[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+            marcadores = ', '.join('?' * len(lote))
+            existentes = conn.execute(
+                f"SELECT identificador FROM manutencoes_realizadas "
+                f"WHERE tipo_manutencao = ? AND identificador IN ({marcadores})",
+                [tipo_manutencao] + lote
+            )
+            novos.difference_update((identificador, tipo_manutencao) for (identificador,) in existentes)
+    return novos
+
+
+# Função para montar, como operações de conjunto, as manutenções de uma planilha diária a registrar.
+# Retorna (tem_planilha_inicial, registros, registros_processados), onde registros_processados
+# segue a contagem exibida ao usuário: uma por linha correspondente na planilha inicial.
+def montar_manutencoes_diarias(df_diaria, df_inicial, ja_registrados, tipo_manutencao, data_upload):
+    total = len(df_diaria)
+    hoje = datetime.now().strftime('%Y-%m-%d')
+
+    def coluna_texto(coluna):
+        if coluna not in df_diaria.columns:
+            return pd.Series([None] * total, index=df_diaria.index, dtype=object)
+        return pd.Series(_textos_sqlite(df_diaria[coluna]), index=df_diaria.index, dtype=object)
+
+    # Normalizar os identificadores uma única vez
+    diaria = pd.DataFrame({
+        'identificador': (
+            normalizar_identificador(df_diaria['Identificador'])
+            if 'Identificador' in df_diaria.columns
+            else pd.Series([None] * total, index=df_diaria.index, dtype=object)
+        ),
+        'colaborador': coluna_texto('Colaborador'),
+        'cliente': coluna_texto('Cliente'),
+        'data_manutencao': (
+            [str(valor) for valor in df_diaria['Data'].tolist()] if 'Data' in df_diaria.columns else hoje
+        ),
+    }, index=df_diaria.index)
+    diaria = diaria[diaria['identificador'].notna()]
+
+    # Colaborador e cliente da própria planilha diária só valem se estiverem preenchidos
+    invalidos = ['', 'nan', 'None']
+    diaria_valida = diaria['colaborador'].notna() & ~diaria['colaborador'].isin(invalidos) \
+        & diaria['cliente'].notna() & ~diaria['cliente'].isin(invalidos)
+
+    colunas_registro = ['identificador', 'colaborador', 'cliente', 'data_manutencao']
+
+    if df_inicial is None:
+        novos = diaria[diaria_valida & ~diaria['identificador'].isin(ja_registrados)]
+        novos = novos.drop_duplicates('identificador')[colunas_registro]
+        registros_processados = len(novos)
+    elif 'Identificador' not in df_inicial.columns:
+        novos = diaria.iloc[0:0][colunas_registro]
+        registros_processados = 0
+    else:
+        # Descartar identificadores já registrados
+        diaria_nova = diaria[~diaria['identificador'].isin(ja_registrados)]
+        diaria_valida = diaria_valida[diaria_nova.index]
+
+        plano = pd.DataFrame({
+            'identificador': normalizar_identificador(df_inicial['Identificador']),
+            'colaborador': _textos_sqlite(df_inicial['Colaborador']) if 'Colaborador' in df_inicial.columns else None,
+            'cliente': _textos_sqlite(df_inicial['Cliente']) if 'Cliente' in df_inicial.columns else None,
+        })
+        no_plano = diaria_nova['identificador'].isin(plano['identificador'])
+
+        # Identificadores do plano: uma linha por registro correspondente da planilha inicial
+        casadas = diaria_nova[no_plano].drop_duplicates('identificador')[['identificador', 'data_manutencao']]
+        casadas = casadas.merge(plano, on='identificador', how='inner')
+
+        # Identificadores fora do plano: cliente e colaborador da própria planilha diária
+        fora_do_plano = diaria_nova[~no_plano & diaria_valida].drop_duplicates('identificador')
+
+        novos = pd.concat([casadas[colunas_registro], fora_do_plano[colunas_registro]], ignore_index=True)
+        registros_processados = len(novos)
+
+    registros = [
+        (data_upload, identificador, colaborador, cliente, data_manutencao, tipo_manutencao, 'Sim')
+        for identificador, colaborador, cliente, data_manutencao in novos.itertuples(index=False, name=None)
+    ]
+    return df_inicial is not None, registros, registros_processados
+
+
+# Função para montar, sem gravar, as manutenções de uma planilha diária lida em blocos.
+# A planilha inicial e os identificadores já registrados são lidos uma vez; cada bloco só
+# acrescenta os seus identificadores ao conjunto, então o resultado é o mesmo da planilha inteira.
+# Retorna (tem_planilha_inicial, registros, registros_processados, linhas_lidas).
+def montar_manutencoes_diarias_em_blocos(blocos, tipo_manutencao=TIPO_MANUTENCAO_MENSAL):
+    data_upload = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    registros = []
+    registros_processados = 0
+    linhas_lidas = 0
+    ja_registrados = obter_identificadores_realizados(tipo_manutencao)
+    df_inicial = obter_planilha(tipo_manutencao, colunas=['Identificador', 'Colaborador', 'Cliente'])
+    for bloco in blocos:
+        _, novos, processados = montar_manutencoes_diarias(
+            bloco, df_inicial, ja_registrados, tipo_manutencao, data_upload
+        )
+        registros.extend(novos)
+        ja_registrados.update(registro[1] for registro in novos)
+        registros_processados += processados
+        linhas_lidas += len(bloco)
+    return df_inicial is not None, registros, registros_processados, linhas_lidas
+
+
+# Função para registrar as manutenções de uma planilha diária lida em blocos: a leitura fica fora
+# da transação e os registros são gravados de uma vez (os já registrados são ignorados pelo índice único).
+# Retorna (tem_planilha_inicial, registros_processados, linhas_lidas).
+@rastreado()
+def registrar_manutencoes_diarias_em_blocos(blocos, tipo_manutencao=TIPO_MANUTENCAO_MENSAL):
+    tem_planilha_inicial, registros, registros_processados, linhas_lidas = montar_manutencoes_diarias_em_blocos(
+        blocos, tipo_manutencao
+    )
+    inserir_manutencoes_realizadas(registros)
+    return tem_planilha_inicial, registros_processados, linhas_lidas
+
+
+# Função para registrar as manutenções de uma planilha diária em uma única transação.
+# Retorna (tem_planilha_inicial, registros_processados).
+def registrar_manutencoes_diarias(df_diaria, tipo_manutencao=TIPO_MANUTENCAO_MENSAL):
+    tem_planilha_inicial, registros_processados, _ = registrar_manutencoes_diarias_em_blocos(
+        [df_diaria], tipo_manutencao
+    )
+    return tem_planilha_inicial, registros_processados
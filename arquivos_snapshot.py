@@ -0,0 +1,186 @@
+import os
+
+import pandas as pd
+
+# O pyarrow é opcional: sem ele, os snapshots continuam inteiramente no SQLite
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+    feather = None
+
+# Diretório dos arquivos Arrow dos snapshots (vazio desativa os arquivos)
+DIRETORIO_SNAPSHOTS = os.environ.get('MANUTENCAO_SNAPSHOT_DIR', 'snapshots')
+
+
+# Função para verificar se os snapshots em arquivo estão disponíveis
+def arquivos_habilitados():
+    return pa is not None and bool(DIRETORIO_SNAPSHOTS)
+
+
+# Função para montar o caminho do arquivo de um snapshot (relativo ao diretório de snapshots)
+def nome_arquivo(origem, snapshot_id):
+    return f"{origem}_{snapshot_id}.arrow"
+
+
+# Função para obter o caminho absoluto de um arquivo de snapshot
+def caminho_arquivo(nome):
+    return os.path.join(DIRETORIO_SNAPSHOTS, nome)
+
+
+# Função para converter uma célula em texto (números inteiros sem ".0"; vazias continuam vazias)
+def _texto(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+# Função para converter uma coluna em um array Arrow com o tipo nativo dela (número, data, texto...).
+# Colunas com valores de tipos incompatíveis no mesmo bloco (texto e número, por exemplo) viram texto.
+def _array(serie):
+    try:
+        array = pa.array(serie, from_pandas=True)
+    except (pa.ArrowException, TypeError, ValueError):
+        return _array_texto(serie.tolist())
+    # Tipos equivalentes ficam iguais em todos os blocos (texto do pandas e datas em qualquer precisão)
+    if pa.types.is_large_string(array.type):
+        return array.cast(pa.string())
+    if pa.types.is_timestamp(array.type) and array.type.unit != 'us':
+        return array.cast(pa.timestamp('us', array.type.tz), safe=False)
+    return array
+
+
+def _array_texto(valores):
+    return pa.array([_texto(valor) for valor in valores], type=pa.string())
+
+
+# Função para obter o tipo comum de uma coluna entre blocos: uma coluna vazia assume o tipo da outra,
+# inteiros e decimais viram decimais e os demais conflitos viram texto
+def _tipo_comum(atual, novo):
+    if atual == novo or pa.types.is_null(novo):
+        return atual
+    if pa.types.is_null(atual):
+        return novo
+    numericos = (pa.types.is_integer, pa.types.is_floating)
+    if any(teste(atual) for teste in numericos) and any(teste(novo) for teste in numericos):
+        return pa.float64()
+    return pa.string()
+
+
+# Função para converter um array Arrow para o tipo comum da coluna
+def _converter(array, tipo):
+    if array.type == tipo:
+        return array
+    if pa.types.is_string(tipo):
+        return _array_texto(array.to_pylist())
+    return array.cast(tipo)
+
+
+# Função para montar a tabela Arrow de um bloco, com o tipo nativo de cada coluna
+def preparar_tabela(df):
+    colunas = [str(coluna) for coluna in df.columns]
+    return pa.Table.from_arrays([_array(df[coluna]) for coluna in df.columns], names=colunas)
+
+
+# Classe para gravar um snapshot em blocos num arquivo Arrow sem compressão (pronto para memory-map).
+# Grava em um arquivo temporário e renomeia ao concluir, para que leitores nunca vejam um arquivo pela metade.
+# Cada coluna mantém o tipo nativo do primeiro bloco; se um bloco seguinte trouxer um tipo incompatível
+# (número depois de vazio, texto depois de número), o que já foi gravado é regravado com o tipo comum.
+class EscritorArquivo:
+    def __init__(self, origem, snapshot_id, colunas):
+        self.nome = nome_arquivo(origem, snapshot_id)
+        self.caminho = caminho_arquivo(self.nome)
+        self.temporario = self.caminho + '.tmp'
+        self.colunas = [str(coluna) for coluna in colunas]
+        self.schema = None
+        self._escritor = None
+        os.makedirs(DIRETORIO_SNAPSHOTS, exist_ok=True)
+
+    def _abrir(self, schema):
+        self.schema = schema
+        self._escritor = pa.ipc.new_file(self.temporario, schema)
+
+    # Função para regravar os blocos já escritos com tipos mais amplos
+    def _ampliar(self, tipos):
+        self._escritor.close()
+        # Lido para a memória (não mapeado): o arquivo temporário é recriado em seguida
+        with pa.OSFile(self.temporario) as origem:
+            gravada = pa.ipc.open_file(origem).read_all()
+        colunas = [
+            pa.chunked_array([_converter(parte, tipo) for parte in coluna.chunks], type=tipo)
+            for coluna, tipo in zip(gravada.columns, tipos)
+        ]
+        schema = pa.schema([(coluna, tipo) for coluna, tipo in zip(self.colunas, tipos)])
+        gravada = pa.Table.from_arrays(colunas, schema=schema)
+        self._abrir(schema)
+        self._escritor.write_table(gravada)
+
+    def escrever(self, df):
+        tabela = preparar_tabela(df).select(self.colunas)
+        if self.schema is None:
+            self._abrir(tabela.schema)
+        else:
+            tipos = [_tipo_comum(atual, novo) for atual, novo in zip(self.schema.types, tabela.schema.types)]
+            if tipos != self.schema.types:
+                self._ampliar(tipos)
+        colunas = [
+            _converter(coluna.combine_chunks(), tipo) for coluna, tipo in zip(tabela.columns, self.schema.types)
+        ]
+        self._escritor.write_table(pa.Table.from_arrays(colunas, schema=self.schema))
+
+    def concluir(self):
+        if self._escritor is None:
+            # Planilha só com o cabeçalho
+            self._abrir(pa.schema([(coluna, pa.string()) for coluna in self.colunas]))
+        self._escritor.close()
+        os.replace(self.temporario, self.caminho)
+        return self.nome
+
+    def descartar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
+
+
+# Função para gravar um snapshot completo de uma vez
+def gravar(origem, snapshot_id, df):
+    escritor = EscritorArquivo(origem, snapshot_id, df.columns)
+    try:
+        escritor.escrever(df)
+    except Exception:
+        escritor.descartar()
+        raise
+    return escritor.concluir()
+
+
+# Função para ler um snapshot mapeado em memória, apenas com as colunas pedidas.
+# A conversão libera cada coluna Arrow assim que ela vira pandas e mantém um bloco por coluna,
+# sem juntar as colunas do mesmo tipo em uma cópia consolidada.
+def ler(nome, colunas=None):
+    caminho = caminho_arquivo(nome)
+    if pa is None or not os.path.exists(caminho):
+        return None
+    tabela = feather.read_table(caminho, columns=colunas, memory_map=True)
+    if colunas is not None and not colunas:
+        # Uma lista vazia de colunas faz o Arrow ler todas: apenas as linhas, sem colunas
+        return pd.DataFrame(index=pd.RangeIndex(tabela.num_rows))
+    return tabela.to_pandas(self_destruct=True, split_blocks=True)
+
+
+# Função para listar os arquivos de snapshot concluídos no diretório
+def listar():
+    if not DIRETORIO_SNAPSHOTS or not os.path.isdir(DIRETORIO_SNAPSHOTS):
+        return []
+    return sorted(nome for nome in os.listdir(DIRETORIO_SNAPSHOTS) if nome.endswith('.arrow'))
+
+
+# Função para remover o arquivo de um snapshot (arquivos já removidos são ignorados)
+def remover(nome):
+    caminho = caminho_arquivo(nome)
+    if os.path.exists(caminho):
+        os.remove(caminho)
@@ -0,0 +1,177 @@
+import os
+import time
+
+import pandas as pd
+
+from armazenamento import (
+    TIPO_MANUTENCAO_MENSAL,
+    TIPO_MANUTENCAO_SEMESTRAL,
+    TIPO_MANUTENCAO_CORRETIVA,
+    ORIGEM_EQUIPAMENTOS,
+    salvar_planilha,
+    salvar_equipamentos,
+    obter_planilha_mensal,
+    combinar_planilhas,
+    limpar_manutencoes_realizadas,
+    registrar_manutencoes_diarias,
+    obter_identificadores_realizados,
+    obter_matriz_status,
+)
+from busca import IndiceBusca
+from cache_compartilhado import DIMENSOES_CUBO, obter_cubo, obter_dados_manutencao, resumir_cubo
+from ingestao import ler_planilha_em_blocos, preparar_blocos
+
+# Linhas acima das quais database.importar_dados_excel não é medido (uma consulta do ORM por linha)
+LIMITE_LINHAS_ORM = int(os.environ.get('MANUTENCAO_BENCHMARK_LIMITE_ORM', 50_000))
+
+
+# Função para medir uma operação várias vezes. preparar() roda antes de cada medição, fora do tempo.
+# Retorna {'segundos': mediana, 'medicoes': [...]} e as informações devolvidas pela última execução.
+def cronometrar(executar, repeticoes=1, preparar=None):
+    medicoes = []
+    info = None
+    for _ in range(max(repeticoes, 1)):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        info = executar()
+        medicoes.append(time.perf_counter() - inicio)
+    ordenadas = sorted(medicoes)
+    resultado = {'segundos': round(ordenadas[len(ordenadas) // 2], 6), 'medicoes': [round(m, 6) for m in medicoes]}
+    if isinstance(info, dict):
+        resultado.update(info)
+    return resultado
+
+
+# Leitura da planilha mensal inteira com pd.read_excel (como o aplicativo fazia antes da leitura em blocos)
+def read_excel(contexto, repeticoes):
+    caminho = contexto['caminhos'][TIPO_MANUTENCAO_MENSAL]
+    return cronometrar(lambda: {'linhas': len(pd.read_excel(caminho))}, repeticoes)
+
+
+# Leitura em blocos usada pela ingestão (openpyxl em modo streaming, validação e mapeamento de setores)
+def leitura_em_blocos(contexto, repeticoes):
+    caminho = contexto['caminhos'][TIPO_MANUTENCAO_MENSAL]
+    return cronometrar(
+        lambda: {'linhas': sum(len(bloco) for bloco in preparar_blocos(ler_planilha_em_blocos(caminho)))},
+        repeticoes
+    )
+
+
+# Gravação dos snapshots: equipamentos e planilha mensal (as demais planilhas são gravadas uma vez, fora do tempo)
+def salvar_planilhas(contexto, repeticoes):
+    planilhas = contexto['planilhas']
+    resultado = {
+        'salvar_equipamentos': cronometrar(lambda: salvar_equipamentos(planilhas[ORIGEM_EQUIPAMENTOS]), repeticoes),
+        'salvar_planilha': cronometrar(
+            lambda: salvar_planilha(planilhas[TIPO_MANUTENCAO_MENSAL], TIPO_MANUTENCAO_MENSAL), repeticoes
+        ),
+    }
+    for tipo_manutencao in (TIPO_MANUTENCAO_SEMESTRAL, TIPO_MANUTENCAO_CORRETIVA):
+        salvar_planilha(planilhas[tipo_manutencao], tipo_manutencao)
+    return resultado
+
+
+# Leitura de volta da planilha mensal gravada (ida e volta pelo armazenamento)
+def obter_planilha(contexto, repeticoes):
+    esperadas = len(contexto['planilhas'][TIPO_MANUTENCAO_MENSAL])
+    return cronometrar(lambda: _conferir_linhas(obter_planilha_mensal(), esperadas), repeticoes)
+
+
+def _conferir_linhas(df, esperadas):
+    linhas = 0 if df is None else len(df)
+    if linhas != esperadas:
+        raise AssertionError(f"{linhas} linhas lidas, {esperadas} esperadas")
+    return {'linhas': linhas}
+
+
+# Combinação da planilha mensal com a de equipamentos: direto do banco e pelo cache compartilhado
+# (com os dados alterados antes de cada medição, para que o cache precise ser refeito)
+def combinar_dados(contexto, repeticoes):
+    return {
+        'combinar_planilhas': cronometrar(lambda: {'linhas': len(combinar_planilhas(TIPO_MANUTENCAO_MENSAL))}, repeticoes),
+        'obter_dados_manutencao': cronometrar(
+            lambda: {'linhas': len(obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL))},
+            repeticoes,
+            preparar=lambda: limpar_manutencoes_realizadas(TIPO_MANUTENCAO_CORRETIVA),
+        ),
+        'obter_dados_manutencao_em_cache': cronometrar(
+            lambda: {'linhas': len(obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL))}, repeticoes
+        ),
+    }
+
+
+# Registro da planilha diária mensal (as manutenções do tipo são apagadas antes de cada medição)
+def registrar_manutencao(contexto, repeticoes):
+    diaria = contexto['planilhas'][f"diario_{TIPO_MANUTENCAO_MENSAL}"]
+
+    def executar():
+        _, registros = registrar_manutencoes_diarias(diaria, TIPO_MANUTENCAO_MENSAL)
+        return {'linhas': len(diaria), 'registros': registros}
+
+    return cronometrar(executar, repeticoes, preparar=lambda: limpar_manutencoes_realizadas(TIPO_MANUTENCAO_MENSAL))
+
+
+# Cálculo do status: a verificação de todos os equipamentos (consulta única + isin), a leitura do
+# status materializado e a montagem do cubo e do índice de busca.
+# O DataFrame vai sem os atributos do cache, então cubo e índice são montados a cada medição.
+def status(contexto, repeticoes):
+    df = obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL)
+    df.attrs = {}
+    identificadores = df['Identificador'].map(str)
+
+    def resumir():
+        cubo = obter_cubo(df)
+        for tipo_manutencao in (TIPO_MANUTENCAO_MENSAL, TIPO_MANUTENCAO_SEMESTRAL, TIPO_MANUTENCAO_CORRETIVA):
+            for dimensao in DIMENSOES_CUBO:
+                resumir_cubo(cubo, tipo_manutencao, dimensao)
+        return {'linhas_cubo': len(cubo)}
+
+    return {
+        'verificar_identificadores': cronometrar(
+            lambda: {'realizadas': int(identificadores.isin(obter_identificadores_realizados(TIPO_MANUTENCAO_MENSAL)).sum())},
+            repeticoes
+        ),
+        'matriz_status': cronometrar(
+            lambda: {'linhas': len(obter_matriz_status(TIPO_MANUTENCAO_MENSAL).reindex(identificadores.to_numpy()))},
+            repeticoes
+        ),
+        'cubo_e_resumos': cronometrar(resumir, repeticoes),
+        'indice_busca': cronometrar(lambda: {'chaves': len(IndiceBusca(df['Identificador']))}, repeticoes),
+    }
+
+
+# Importação pelo módulo database (SQLAlchemy), contra um SQLite no diretório do benchmark
+def importar_dados_excel(contexto, repeticoes):
+    linhas = len(contexto['planilhas'][ORIGEM_EQUIPAMENTOS])
+    if linhas > LIMITE_LINHAS_ORM:
+        return {'ignorado': f"mais de {LIMITE_LINHAS_ORM} linhas (MANUTENCAO_BENCHMARK_LIMITE_ORM)"}
+    try:
+        import database
+    except ImportError as e:
+        return {'ignorado': f"dependência ausente: {e.name}"}
+
+    caminhos = contexto['caminhos']
+
+    def recriar():
+        database.Base.metadata.drop_all(database.obter_engine())
+        database.Base.metadata.create_all(database.obter_engine())
+
+    return cronometrar(
+        lambda: {'sucesso': database.importar_dados_excel(caminhos[TIPO_MANUTENCAO_MENSAL], caminhos[ORIGEM_EQUIPAMENTOS])},
+        repeticoes,
+        preparar=recriar,
+    )
+
+
+# Cenários na ordem de execução (cada um usa o estado do banco deixado pelos anteriores)
+CENARIOS = {
+    'read_excel': read_excel,
+    'leitura_em_blocos': leitura_em_blocos,
+    'salvar_planilhas': salvar_planilhas,
+    'obter_planilha_mensal': obter_planilha,
+    'combinar_dados': combinar_dados,
+    'registrar_manutencao': registrar_manutencao,
+    'status': status,
+    'database_importar_dados_excel': importar_dados_excel,
+}
@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Suíte de benchmarks dos caminhos de ingestão, status e exibição:
+#     python -m benchmarks.executar --tamanho medio --repeticoes 3 --saida resultado.json
+# Gera as planilhas sintéticas (reaproveitadas entre execuções em --planilhas), grava tudo em um banco
+# SQLite temporário e imprime (ou grava em --saida) um JSON com os tempos de cada cenário, para comparar
+# execuções de commits diferentes na mesma máquina.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tamanhos de carga pré-definidos (linhas da planilha mensal e de equipamentos)
+TAMANHOS = {
+    'pequeno': 1_000,
+    'medio': 50_000,
+    'grande': 500_000,
+}
+
+# Cenários que não dependem das planilhas já gravadas no banco
+CENARIOS_SEM_BANCO = {'read_excel', 'leitura_em_blocos', 'database_importar_dados_excel'}
+
+
+# Função para obter o commit atual do repositório (None fora de um checkout do git)
+def _commit_atual():
+    try:
+        resultado = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=RAIZ, check=True
+        )
+        return resultado.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Função para descrever o ambiente da execução (os tempos só são comparáveis no mesmo ambiente)
+def _ambiente(linhas, semente, repeticoes):
+    import pandas as pd
+
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_atual(),
+        'linhas': linhas,
+        'semente': semente,
+        'repeticoes': repeticoes,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'nucleos': os.cpu_count(),
+    }
+
+
+def executar(linhas, repeticoes=1, semente=0, cenarios=None, diretorio_planilhas=None):
+    # O banco, os snapshots e o banco do SQLAlchemy ficam em um diretório temporário.
+    # As variáveis precisam estar definidas antes de importar os módulos do aplicativo.
+    diretorio = tempfile.mkdtemp(prefix='benchmarks_')
+    os.environ['MANUTENCAO_DB_PATH'] = os.path.join(diretorio, 'manutencao.db')
+    os.environ['MANUTENCAO_SNAPSHOT_DIR'] = os.path.join(diretorio, 'snapshots')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(diretorio, 'database.db')}"
+    sys.path.insert(0, RAIZ)
+    from benchmarks import gerador
+    from benchmarks.cenarios import CENARIOS, salvar_planilhas
+
+    try:
+        diretorio_planilhas = diretorio_planilhas or os.path.join(tempfile.gettempdir(), 'benchmarks_planilhas')
+        diretorio_planilhas = os.path.join(diretorio_planilhas, f"{linhas}_{semente}")
+
+        inicio = time.perf_counter()
+        planilhas = gerador.gerar_planilhas(linhas, semente)
+        caminhos = {}
+        for nome, df in planilhas.items():
+            caminho = os.path.join(diretorio_planilhas, f"{nome}.xlsx")
+            if not os.path.exists(caminho):
+                os.makedirs(diretorio_planilhas, exist_ok=True)
+                gerador.gravar_xlsx(df, caminho + '.tmp')
+                os.replace(caminho + '.tmp', caminho)
+            caminhos[nome] = caminho
+        contexto = {'planilhas': planilhas, 'caminhos': caminhos}
+
+        resultado = {
+            'ambiente': _ambiente(linhas, semente, repeticoes),
+            'preparacao_segundos': round(time.perf_counter() - inicio, 3),
+            'cenarios': {},
+        }
+        selecionados = [nome for nome in CENARIOS if cenarios is None or nome in cenarios]
+        if 'salvar_planilhas' not in selecionados and set(selecionados) - CENARIOS_SEM_BANCO:
+            # Cenários que leem o banco precisam das planilhas gravadas (fora da medição)
+            salvar_planilhas(contexto, 1)
+        for nome in selecionados:
+            resultado['cenarios'][nome] = CENARIOS[nome](contexto, repeticoes)
+        return resultado
+    finally:
+        from armazenamento import fechar_conexoes
+
+        fechar_conexoes()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa os benchmarks de ingestão, status e exibição.")
+    parser.add_argument('--tamanho', choices=sorted(TAMANHOS), default='pequeno', help="Carga pré-definida")
+    parser.add_argument('--linhas', type=int, help="Linhas da carga (substitui --tamanho)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Medições por cenário (usa a mediana)")
+    parser.add_argument('--semente', type=int, default=0, help="Semente do gerador de planilhas")
+    parser.add_argument('--cenarios', nargs='*', help="Cenários a executar (padrão: todos)")
+    parser.add_argument('--planilhas', help="Diretório onde as planilhas geradas são guardadas e reaproveitadas")
+    parser.add_argument('--saida', help="Arquivo JSON de saída (padrão: saída padrão)")
+    args = parser.parse_args()
+
+    resultado = executar(
+        args.linhas or TAMANHOS[args.tamanho], args.repeticoes, args.semente, args.cenarios, args.planilhas
+    )
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import (
+    TIPO_MANUTENCAO_MENSAL,
+    TIPO_MANUTENCAO_SEMESTRAL,
+    TIPO_MANUTENCAO_CORRETIVA,
+    ORIGEM_EQUIPAMENTOS,
+    COLUNAS_FOTOS,
+)
+from setores import SETOR_MAP_EXATO
+
+# Colaboradores: os nomes mapeáveis para setores (escritos como nas planilhas reais, com sobrenome
+# e variações de maiúsculas) e alguns sem setor, que continuam com o próprio nome
+COLABORADORES = [
+    f"{nome} {sufixo}"
+    for nomes in SETOR_MAP_EXATO.values()
+    for nome in nomes
+    for sufixo in ('', 'Refrigeração', 'LTDA')
+] + ['Pako ruhan técnico', 'gwsb manutenção', 'Carlos Alberto Lima', 'Marina Costa Refrigeração']
+
+MODELOS = ['Split Hi-Wall', 'Piso Teto', 'Cassete', 'Janela', 'Multi Split', 'VRF']
+MARCAS = ['Carrier', 'Daikin', 'LG', 'Samsung', 'Midea', 'Elgin', 'Fujitsu']
+CAPACIDADES = [9000, 12000, 18000, 24000, 30000, 36000, 48000, 60000]
+
+# Fração dos equipamentos de cada tipo de planilha e das planilhas diárias
+FRACAO_TIPO = {
+    TIPO_MANUTENCAO_MENSAL: 1.0,
+    TIPO_MANUTENCAO_SEMESTRAL: 0.3,
+    TIPO_MANUTENCAO_CORRETIVA: 0.05,
+}
+FRACAO_DIARIA = 0.2
+
+
+# Função para gerar os identificadores dos equipamentos (códigos alfanuméricos, como nas etiquetas QR)
+def _identificadores(linhas):
+    return [f"AC-{numero:07d}" for numero in range(1, linhas + 1)]
+
+
+# Função para gerar a planilha de equipamentos
+def gerar_equipamentos(linhas, semente=0):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'Identificador': _identificadores(linhas),
+        'Modelo': rng.choice(MODELOS, linhas),
+        'Marca': rng.choice(MARCAS, linhas),
+        'Capacidade (BTU)': rng.choice(CAPACIDADES, linhas),
+        'Descrição': [f"Sala {numero % 400 + 1} - Andar {numero % 20}" for numero in range(linhas)],
+    })
+
+
+# Função para gerar uma planilha de manutenção (mensal, semestral ou corretiva) com as colunas de fotos.
+# Cerca de 2% dos identificadores aparecem repetidos (mais de uma tarefa para o mesmo equipamento).
+def gerar_planilha(linhas, tipo_manutencao=TIPO_MANUTENCAO_MENSAL, semente=0):
+    rng = np.random.default_rng(semente + 1 + list(FRACAO_TIPO).index(tipo_manutencao))
+    quantidade = max(int(linhas * FRACAO_TIPO[tipo_manutencao]), 1)
+    identificadores = np.array(_identificadores(linhas), dtype=object)
+    escolhidos = rng.choice(identificadores, quantidade, replace=False)
+    repetidos = rng.choice(escolhidos, max(quantidade // 50, 1))
+    escolhidos = np.concatenate([escolhidos, repetidos])
+    clientes = [f"Cliente {numero:04d}" for numero in range(max(quantidade // 40, 5))]
+
+    df = pd.DataFrame({
+        'Colaborador': rng.choice(COLABORADORES, len(escolhidos)),
+        'Identificador': escolhidos,
+        'Cliente': rng.choice(clientes, len(escolhidos)),
+        'Tarefa': [f"{tipo_manutencao.upper()}-{numero:07d}" for numero in range(len(escolhidos))],
+        'Data': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 28, len(escolhidos)), unit='D'),
+    })
+    for posicao, coluna in enumerate(COLUNAS_FOTOS):
+        df[coluna] = [
+            f"https://storage.exemplo.com/fotos/{identificador}/{posicao + 1}.jpg" for identificador in escolhidos
+        ]
+    return df
+
+
+# Função para gerar uma planilha diária a partir da planilha do tipo: parte dos equipamentos
+# do plano e alguns fora dele (com colaborador e cliente próprios)
+def gerar_diaria(planilha, semente=0):
+    rng = np.random.default_rng(semente + 10)
+    quantidade = max(int(len(planilha) * FRACAO_DIARIA), 1)
+    do_plano = planilha.sample(quantidade, random_state=semente)[['Identificador', 'Colaborador', 'Cliente']]
+    fora = max(quantidade // 20, 1)
+    fora_do_plano = pd.DataFrame({
+        'Identificador': [f"AC-X{numero:06d}" for numero in range(fora)],
+        'Colaborador': rng.choice(COLABORADORES, fora),
+        'Cliente': 'Cliente avulso',
+    })
+    df = pd.concat([do_plano, fora_do_plano], ignore_index=True)
+    df['CUMPRIMENTO DOS ITENS MENCIONADOS'] = 'Sim'
+    df['Data'] = pd.Timestamp('2025-01-15')
+    return df
+
+
+# Função para gerar todas as planilhas de uma carga: {nome: DataFrame}.
+# Nomes: equipamentos, mensal, semestral, corretiva e diario_<tipo>.
+def gerar_planilhas(linhas, semente=0):
+    planilhas = {ORIGEM_EQUIPAMENTOS: gerar_equipamentos(linhas, semente)}
+    for tipo_manutencao in FRACAO_TIPO:
+        planilhas[tipo_manutencao] = gerar_planilha(linhas, tipo_manutencao, semente)
+    for tipo_manutencao in (TIPO_MANUTENCAO_MENSAL, TIPO_MANUTENCAO_SEMESTRAL, TIPO_MANUTENCAO_CORRETIVA):
+        planilhas[f"diario_{tipo_manutencao}"] = gerar_diaria(planilhas[tipo_manutencao], semente)
+    return planilhas
+
+
+# Função para gravar um DataFrame em .xlsx com o openpyxl em modo de escrita contínua
+# (bem mais rápido que DataFrame.to_excel nas cargas grandes)
+def gravar_xlsx(df, caminho):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet()
+    planilha.append([str(coluna) for coluna in df.columns])
+    colunas = [
+        df[coluna].dt.to_pydatetime() if pd.api.types.is_datetime64_any_dtype(df[coluna]) else df[coluna].tolist()
+        for coluna in df.columns
+    ]
+    for linha in zip(*colunas):
+        planilha.append([valor.item() if isinstance(valor, np.generic) else valor for valor in linha])
+    workbook.save(caminho)
+    return caminho
+
+
+# Função para gerar e gravar as planilhas de uma carga em um diretório: {nome: caminho do .xlsx}
+def gravar_planilhas(diretorio, linhas, semente=0):
+    os.makedirs(diretorio, exist_ok=True)
+    return {
+        nome: gravar_xlsx(df, os.path.join(diretorio, f"{nome}.xlsx"))
+        for nome, df in gerar_planilhas(linhas, semente).items()
+    }
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Medição do tempo de inicialização do aplicativo:
+#     python benchmarks/medir_inicializacao.py [--banco manutencao.db] [--snapshots snapshots] [--repeticoes 3]
+# Cada medição roda em um processo novo (importações e caches frios, como numa instância recém-criada).
+# Mede o tempo de importação dos módulos e o tempo da primeira e da segunda renderização do aplicativo,
+# com e sem o aquecimento do cache (cache_compartilhado.aquecer) antes da primeira sessão.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APLICATIVO = os.path.join(RAIZ, 'app_manutencao.py')
+
+# Módulos importados pelo aplicativo, na ordem em que aparecem (cada tempo exclui os anteriores)
+MODULOS = ['pandas', 'pyarrow', 'streamlit', 'armazenamento', 'cache_compartilhado', 'tarefas', 'plotly.express']
+
+_CODIGO_IMPORTACAO = '''
+import importlib, json, sys, time
+sys.path.insert(0, {raiz!r})
+tempos = {{}}
+for modulo in {modulos!r}:
+    inicio = time.perf_counter()
+    try:
+        importlib.import_module(modulo)
+    except ImportError:
+        continue
+    tempos[modulo] = time.perf_counter() - inicio
+print(json.dumps(tempos))
+'''
+
+_CODIGO_RENDERIZACAO = '''
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+tempos = {{'importacao_streamlit': time.perf_counter() - inicio}}
+if {aquecer!r}:
+    from cache_compartilhado import aquecer
+    inicio = time.perf_counter()
+    aquecer()
+    tempos['aquecimento'] = time.perf_counter() - inicio
+app = AppTest.from_file({aplicativo!r}, default_timeout=600)
+for rotulo in ('primeira_renderizacao', 'segunda_renderizacao'):
+    inicio = time.perf_counter()
+    app.run()
+    tempos[rotulo] = time.perf_counter() - inicio
+tempos['erros'] = [str(erro.value) for erro in app.exception]
+print(json.dumps(tempos))
+'''
+
+
+# Função para executar um trecho de código em um processo novo e ler o JSON impresso por ele
+def _medir_em_subprocesso(codigo, ambiente):
+    resultado = subprocess.run(
+        [sys.executable, '-c', codigo], capture_output=True, text=True, env=ambiente, cwd=RAIZ
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1] if resultado.stderr.strip() else "falha na medição")
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+# Função para obter a mediana de cada tempo entre as repetições
+def _medianas(medicoes):
+    medianas = {}
+    for chave in medicoes[0]:
+        valores = sorted(medicao[chave] for medicao in medicoes if isinstance(medicao.get(chave), float))
+        if valores:
+            medianas[chave] = round(valores[len(valores) // 2], 4)
+    return medianas
+
+
+def medir(banco=None, snapshots=None, repeticoes=3):
+    ambiente = dict(os.environ)
+    if banco:
+        ambiente['MANUTENCAO_DB_PATH'] = os.path.abspath(banco)
+    if snapshots:
+        ambiente['MANUTENCAO_SNAPSHOT_DIR'] = os.path.abspath(snapshots)
+
+    codigo_importacao = _CODIGO_IMPORTACAO.format(raiz=RAIZ, modulos=MODULOS)
+    resultado = {
+        'importacao': _medianas([_medir_em_subprocesso(codigo_importacao, ambiente) for _ in range(repeticoes)]),
+    }
+    for rotulo, aquecer in (('sem_aquecimento', False), ('com_aquecimento', True)):
+        codigo = _CODIGO_RENDERIZACAO.format(raiz=RAIZ, aplicativo=APLICATIVO, aquecer=aquecer)
+        medicoes = [_medir_em_subprocesso(codigo, ambiente) for _ in range(repeticoes)]
+        resultado[rotulo] = _medianas(medicoes)
+        resultado[rotulo]['erros'] = medicoes[-1]['erros']
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação e da primeira renderização do aplicativo.")
+    parser.add_argument('--banco', help="Banco SQLite usado nas medições (padrão: MANUTENCAO_DB_PATH ou manutencao.db)")
+    parser.add_argument('--snapshots', help="Diretório dos arquivos Arrow (padrão: MANUTENCAO_SNAPSHOT_DIR ou snapshots)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Processos medidos por cenário (usa a mediana)")
+    args = parser.parse_args()
+    print(json.dumps(medir(args.banco, args.snapshots, args.repeticoes), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import bisect
+import re
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import normalizar_identificador
+
+# Modos de busca por identificador
+BUSCA_EXATA = 'exata'
+BUSCA_PREFIXO = 'prefixo'
+BUSCA_CONTEM = 'contem'
+MODOS_BUSCA = [BUSCA_EXATA, BUSCA_PREFIXO, BUSCA_CONTEM]
+
+# Maior caractere Unicode: limite superior dos textos que começam com um prefixo
+_MAIOR_CARACTERE = '\U0010ffff'
+
+
+# Função para normalizar os textos buscados: mesmo formato de identificador do banco.
+# Maiúsculas e minúsculas continuam diferentes, como no filtro original (str.contains).
+def normalizar_busca(serie):
+    return [texto if texto is not None else '' for texto in normalizar_identificador(serie).tolist()]
+
+
+# Função para codificar os trigramas de um conjunto de textos de mesmo tamanho máximo.
+# Cada trigrama vira um inteiro de 63 bits (três pontos de código de 21 bits); retorna (códigos, posição do texto).
+def _trigramas(textos):
+    tamanho = max((len(texto) for texto in textos), default=0)
+    if tamanho < 3:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    matriz = np.array(textos, dtype=f'<U{tamanho}').view(np.uint32).reshape(len(textos), tamanho).astype(np.int64)
+    codigos = (matriz[:, :-2] << 42) | (matriz[:, 1:-1] << 21) | matriz[:, 2:]
+    # Posições completadas com "\0" no fim dos textos curtos não formam trigramas
+    validos = matriz[:, 2:] != 0
+    textos_ids = np.broadcast_to(np.arange(len(textos))[:, None], codigos.shape)
+    return codigos[validos], textos_ids[validos]
+
+
+# Classe do índice de busca dos identificadores de um DataFrame, montado uma vez por versão dos dados.
+# Os identificadores distintos ficam ordenados (busca exata e por prefixo com bisect) e cada trigrama
+# aponta para os identificadores que o contêm (busca por trecho com interseção das listas).
+# As buscas são literais (sem expressão regular) e retornam as posições das linhas no DataFrame.
+class IndiceBusca:
+    def __init__(self, identificadores):
+        normalizados = normalizar_busca(identificadores)
+        codigos, distintos = pd.factorize(pd.Series(normalizados, dtype=object))
+        # Identificadores distintos em ordem (sorted do Python é mais rápido que ordenar o array de objetos)
+        distintos = distintos.tolist()
+        ordem = sorted(range(len(distintos)), key=distintos.__getitem__)
+        self.chaves = [distintos[i] for i in ordem]
+        posto = np.empty(len(ordem), dtype=np.int64)
+        posto[ordem] = np.arange(len(ordem))
+        codigos = posto[codigos]
+
+        # Linhas de cada identificador distinto: self.linhas[self.inicios[i]:self.inicios[i + 1]]
+        self.linhas = np.argsort(codigos, kind='stable')
+        self.inicios = np.concatenate([[0], np.cumsum(np.bincount(codigos, minlength=len(self.chaves)))])
+
+        # Listas de trigramas: identificadores (ordenados) de cada trigrama
+        trigramas, chaves_ids = _trigramas(self.chaves)
+        ordem = np.lexsort((chaves_ids, trigramas))
+        trigramas, chaves_ids = trigramas[ordem], chaves_ids[ordem]
+        # Um identificador com o mesmo trigrama repetido entra uma vez só na lista
+        distintos = np.ones(len(trigramas), dtype=bool)
+        distintos[1:] = (trigramas[1:] != trigramas[:-1]) | (chaves_ids[1:] != chaves_ids[:-1])
+        trigramas, chaves_ids = trigramas[distintos], chaves_ids[distintos]
+        self.trigramas, inicios = np.unique(trigramas, return_index=True)
+        self.trigramas_inicios = np.append(inicios, len(trigramas))
+        self.trigramas_chaves = chaves_ids
+
+        # Texto único com todos os identificadores, para trechos curtos demais para trigramas
+        self._texto = '\n'.join(self.chaves)
+        self._inicios_texto = np.cumsum([0] + [len(chave) + 1 for chave in self.chaves[:-1]])
+
+    def __len__(self):
+        return len(self.chaves)
+
+    # Função para buscar identificadores (exata, por prefixo ou por trecho) e obter as posições das linhas
+    def buscar(self, termo, modo=BUSCA_CONTEM):
+        termo = str(termo).strip()
+        if not termo:
+            return np.empty(0, dtype=np.int64)
+        if modo == BUSCA_EXATA:
+            inicio = bisect.bisect_left(self.chaves, termo)
+            fim = inicio + 1 if inicio < len(self.chaves) and self.chaves[inicio] == termo else inicio
+            chaves_ids = np.arange(inicio, fim)
+        elif modo == BUSCA_PREFIXO:
+            inicio = bisect.bisect_left(self.chaves, termo)
+            fim = bisect.bisect_left(self.chaves, termo + _MAIOR_CARACTERE, lo=inicio)
+            chaves_ids = np.arange(inicio, fim)
+        elif modo == BUSCA_CONTEM:
+            chaves_ids = self._buscar_trecho(termo)
+        else:
+            raise ValueError(f"Modo de busca desconhecido: {modo}")
+        return self._linhas_das_chaves(chaves_ids)
+
+    def _buscar_trecho(self, termo):
+        if len(termo) < 3:
+            # Trecho curto: procura literal no texto único e converte as posições nos identificadores
+            ocorrencias = [m.start() for m in re.finditer(re.escape(termo), self._texto)]
+            chaves_ids = np.searchsorted(self._inicios_texto, ocorrencias, side='right') - 1
+            return np.unique(chaves_ids)
+
+        trigramas, _ = _trigramas([termo])
+        listas = []
+        for trigrama in np.unique(trigramas):
+            posicao = np.searchsorted(self.trigramas, trigrama)
+            if posicao == len(self.trigramas) or self.trigramas[posicao] != trigrama:
+                return np.empty(0, dtype=np.int64)
+            listas.append(self.trigramas_chaves[self.trigramas_inicios[posicao]:self.trigramas_inicios[posicao + 1]])
+
+        # Interseção a partir da menor lista; a conferência final elimina trigramas fora de ordem
+        listas.sort(key=len)
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+            if len(candidatos) == 0:
+                break
+        return np.array([i for i in candidatos.tolist() if termo in self.chaves[i]], dtype=np.int64)
+
+    def _linhas_das_chaves(self, chaves_ids):
+        if len(chaves_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        # Concatena as faixas self.linhas[inicio:fim] de cada identificador sem laço em Python
+        inicios = self.inicios[chaves_ids]
+        tamanhos = self.inicios[chaves_ids + 1] - inicios
+        deslocamentos = np.repeat(inicios - np.cumsum(tamanhos) + tamanhos, tamanhos)
+        posicoes = self.linhas[deslocamentos + np.arange(tamanhos.sum())]
+        # Posições na ordem original do DataFrame
+        return np.sort(posicoes)
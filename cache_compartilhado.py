@@ -0,0 +1,252 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from busca import IndiceBusca
+from diagnostico import rastreado
+from memoria import tamanho_em_bytes
+from armazenamento import (
+    TIPO_MANUTENCAO_MENSAL,
+    COLUNAS_STATUS,
+    DIMENSOES_CONTAGENS,
+    combinar_planilhas,
+    obter_catalogo_planilhas,
+    obter_contagens_status,
+    obter_matriz_status,
+    obter_versao_dados,
+    status_do_catalogo,
+)
+
+# Cache do processo inteiro (compartilhado por todas as sessões do Streamlit):
+# tipo da planilha -> (versão dos dados, DataFrame combinado com as colunas de status de todos os tipos)
+_frames = {}
+# Dados derivados do DataFrame de cada versão, também compartilhados:
+# (tipo da planilha, ...) -> (versão dos dados, número de linhas, valor)
+_ordens = {}    # posições das linhas na ordem das colunas pedidas
+_indices = {}   # índice de busca dos identificadores
+_cubos = {}     # contagens por Colaborador, Cliente e tipo de manutenção
+# Catálogo das planilhas carregadas: (versão dos dados, catálogo)
+_catalogo = None
+
+# Dimensões do cubo de contagens
+DIMENSOES_CUBO = DIMENSOES_CONTAGENS
+_trava = threading.Lock()
+_travas_chave = {}
+
+
+# Função para montar o DataFrame combinado com uma coluna de status por tipo de manutenção
+# (Realizada_mensal, Realizada_semestral, Realizada_corretiva), lidas do status materializado da planilha
+@rastreado()
+def _montar_frame(tipo_planilha):
+    df = combinar_planilhas(tipo_planilha)
+    if df is None:
+        return None
+    if 'Identificador' in df.columns:
+        matriz = obter_matriz_status(tipo_planilha)
+        status = matriz.reindex(df['Identificador'].map(str).to_numpy())
+        for coluna in COLUNAS_STATUS.values():
+            df[coluna] = status[coluna].eq(True).to_numpy()
+    else:
+        for coluna in COLUNAS_STATUS.values():
+            df[coluna] = pd.Series(False, index=df.index, dtype=bool)
+    return df
+
+
+# Função para obter os dados de manutenção compartilhados entre as sessões.
+# Só o primeiro acesso depois de uma gravação (nova versão dos dados) refaz a combinação;
+# os demais recebem uma cópia rasa do mesmo DataFrame, sem duplicar os dados em memória.
+# A cópia rasa permite filtrar e acrescentar colunas sem afetar as outras sessões,
+# mas os valores não devem ser alterados no lugar.
+@rastreado()
+def obter_dados_manutencao(tipo_planilha=TIPO_MANUTENCAO_MENSAL):
+    chave = tipo_planilha
+    with _trava:
+        trava_chave = _travas_chave.setdefault(chave, threading.Lock())
+
+    # Uma trava por chave: sessões simultâneas esperam a primeira montar o DataFrame
+    with trava_chave:
+        versao = obter_versao_dados()
+        entrada = _frames.get(chave)
+        if entrada is None or entrada[0] != versao:
+            df = _montar_frame(tipo_planilha)
+            with _trava:
+                # Entradas de versões anteriores não serão mais usadas
+                for cache in (_frames, _ordens, _indices, _cubos):
+                    for outra_chave, outra_entrada in list(cache.items()):
+                        if outra_entrada[0] != versao:
+                            del cache[outra_chave]
+                if df is not None:
+                    df.attrs['tipo_planilha'] = tipo_planilha
+                    df.attrs['versao_dados'] = versao
+                _frames[chave] = (versao, df)
+            entrada = (versao, df)
+
+    df = entrada[1]
+    return None if df is None else df.copy(deep=False)
+
+
+# Função para obter o catálogo das planilhas carregadas, lido do banco apenas quando os dados mudam.
+# Toda gravação de snapshot incrementa a versão, então as execuções seguintes só consultam o contador.
+@rastreado()
+def obter_catalogo():
+    global _catalogo
+    versao = obter_versao_dados()
+    entrada = _catalogo
+    if entrada is None or entrada[0] != versao:
+        entrada = _catalogo = (versao, obter_catalogo_planilhas())
+    return entrada[1]
+
+
+# Função para saber quais planilhas já foram carregadas (pelo catálogo em cache)
+def obter_status_planilhas():
+    return status_do_catalogo(obter_catalogo())
+
+
+# Função para obter um dado derivado dos dados compartilhados, montado uma vez por versão dos dados.
+# Dados que não vieram do cache (ou filtrados a partir dele) recebem um resultado próprio, sem guardar.
+def _obter_derivado(cache, chave, df, montar):
+    versao = df.attrs.get('versao_dados')
+    with _trava:
+        entrada = cache.get(chave)
+    if versao is not None and entrada is not None and entrada[0] == versao and entrada[1] == len(df):
+        return entrada[2]
+
+    valor = montar(df)
+    with _trava:
+        # Só guarda o resultado da versão em cache (dados antigos de uma sessão não substituem a atual)
+        frame = _frames.get(chave[0])
+        if versao is not None and frame is not None and frame[0] == versao and len(frame[1]) == len(df):
+            cache[chave] = (versao, len(df), valor)
+    return valor
+
+
+# Função para obter as posições das linhas dos dados compartilhados ordenadas pelas colunas pedidas
+@rastreado()
+def obter_ordem(df, colunas):
+    colunas = list(colunas)
+    return _obter_derivado(
+        _ordens, (df.attrs.get('tipo_planilha'), tuple(colunas)), df,
+        lambda dados: dados.reset_index(drop=True).sort_values(colunas, kind='stable').index.to_numpy()
+    )
+
+
+# Função para obter o índice de busca dos identificadores dos dados compartilhados
+@rastreado()
+def obter_indice_busca(df):
+    return _obter_derivado(
+        _indices, (df.attrs.get('tipo_planilha'),), df,
+        lambda dados: IndiceBusca(dados['Identificador'])
+    )
+
+
+# Função para agrupar o cubo de contagens a partir de um DataFrame: uma linha por (Colaborador, Cliente, Tipo)
+# com o número de linhas, de equipamentos (identificadores preenchidos) e de manutenções realizadas
+def _agrupar_cubo(df):
+    base = pd.DataFrame({
+        dimensao: df[dimensao] if dimensao in df.columns else pd.Series(None, index=df.index, dtype=object)
+        for dimensao in DIMENSOES_CUBO
+    })
+    base['Identificador'] = df['Identificador']
+    for coluna in COLUNAS_STATUS.values():
+        base[coluna] = df[coluna]
+
+    grupos = base.groupby(DIMENSOES_CUBO, dropna=False, sort=False)
+    contagens = grupos.agg(Linhas=('Identificador', 'size'), Total_Equipamentos=('Identificador', 'count'))
+    realizadas = grupos[list(COLUNAS_STATUS.values())].sum()
+
+    partes = []
+    for tipo, coluna in COLUNAS_STATUS.items():
+        parte = contagens.copy()
+        parte['Tipo'] = tipo
+        parte['Manutencoes_Realizadas'] = realizadas[coluna].astype(int)
+        partes.append(parte.reset_index())
+    return pd.concat(partes, ignore_index=True)
+
+
+# Função para montar o cubo de contagens: os dados compartilhados usam os contadores materializados no banco
+# (mantidos a cada registro de manutenções); dados filtrados ou de outra versão são agrupados na hora
+def _montar_cubo(df):
+    tipo_planilha = df.attrs.get('tipo_planilha')
+    versao = df.attrs.get('versao_dados')
+    with _trava:
+        frame = _frames.get(tipo_planilha)
+    if versao is not None and frame is not None and frame[0] == versao and len(frame[1]) == len(df):
+        versao_contagens, cubo = obter_contagens_status(tipo_planilha)
+        if versao_contagens == versao:
+            return cubo
+    return _agrupar_cubo(df)
+
+
+# Função para obter o cubo de contagens dos dados compartilhados
+@rastreado()
+def obter_cubo(df):
+    return _obter_derivado(_cubos, (df.attrs.get('tipo_planilha'),), df, _montar_cubo)
+
+
+# Função para resumir o cubo de um tipo de manutenção por uma dimensão, com filtros opcionais
+# (por exemplo, Colaborador='...'). Linhas com a dimensão vazia ficam de fora, como no groupby.
+def resumir_cubo(cubo, tipo_manutencao, dimensao, **filtros):
+    selecao = cubo['Tipo'] == tipo_manutencao
+    for coluna, valor in filtros.items():
+        selecao &= cubo[coluna] == valor
+    resumo = cubo[selecao].groupby(dimensao)[['Linhas', 'Total_Equipamentos', 'Manutencoes_Realizadas']].sum().reset_index()
+    total = resumo['Total_Equipamentos'].to_numpy()
+    realizadas = resumo['Manutencoes_Realizadas'].to_numpy()
+    resumo['Manutencoes_Pendentes'] = total - realizadas
+    # Evitar divisão por zero
+    resumo['Percentual_Concluido'] = np.where(total > 0, np.round(realizadas / np.maximum(total, 1) * 100, 2), 0.0)
+    return resumo
+
+
+# Função para obter os totais de um tipo de manutenção no cubo: (linhas, realizadas)
+def totais_cubo(cubo, tipo_manutencao):
+    selecao = cubo[cubo['Tipo'] == tipo_manutencao]
+    return int(selecao['Linhas'].sum()), int(selecao['Manutencoes_Realizadas'].sum())
+
+
+# Função para medir a memória dos dados em cache: uma linha por entrada com o cache, a chave,
+# a versão dos dados e os bytes ocupados (o DataFrame combinado é o mesmo para todas as sessões)
+def uso_memoria():
+    with _trava:
+        entradas = [('dados', chave, entrada[0], entrada[1]) for chave, entrada in _frames.items()]
+        for nome, cache in (('ordens', _ordens), ('indices', _indices), ('cubos', _cubos)):
+            entradas.extend((nome, chave, entrada[0], entrada[2]) for chave, entrada in cache.items())
+    return [
+        {
+            'cache': nome,
+            'chave': '/'.join(str(parte) for parte in chave) if isinstance(chave, tuple) else str(chave),
+            'versao': versao,
+            'linhas': None if valor is None or not hasattr(valor, '__len__') else len(valor),
+            'bytes': 0 if valor is None else tamanho_em_bytes(valor),
+        }
+        for nome, chave, versao, valor in entradas
+    ]
+
+
+# Função para aquecer o cache antes da primeira sessão: migra o banco e monta o catálogo, o DataFrame
+# combinado da planilha exibida ao abrir o aplicativo, o cubo de contagens e o índice de busca.
+# Retorna o tempo gasto em cada etapa (segundos).
+def aquecer(tipo_planilha=TIPO_MANUTENCAO_MENSAL):
+    tempos = {}
+    inicio = time.perf_counter()
+    catalogo = obter_catalogo()
+    tempos['catalogo'] = time.perf_counter() - inicio
+    if catalogo.get(tipo_planilha) is None:
+        return tempos
+
+    inicio = time.perf_counter()
+    df = obter_dados_manutencao(tipo_planilha)
+    tempos['dados'] = time.perf_counter() - inicio
+    if df is None:
+        return tempos
+
+    inicio = time.perf_counter()
+    obter_cubo(df)
+    tempos['cubo'] = time.perf_counter() - inicio
+    if 'Identificador' in df.columns:
+        inicio = time.perf_counter()
+        obter_indice_busca(df)
+        tempos['indice_busca'] = time.perf_counter() - inicio
+    return tempos
@@ -1,14 +1,20 @@
 import os
+import threading
 import pandas as pd
 from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, Text, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
+from armazenamento import obter_regras_setores
+from setores import aplicar_setores
+
 # Obter a URL do banco de dados da variável de ambiente
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
-# Criar engine do SQLAlchemy
-engine = create_engine(DATABASE_URL)
+# Engine do SQLAlchemy, criada no primeiro acesso ao banco (e não na importação do módulo)
+_engine = None
+_trava = threading.Lock()
+_migrado = False
 
 # Criar base declarativa
 Base = declarative_base()
@@ -72,11 +78,36 @@ class Manutencao(Base):
         return f"<Manutencao(id={self.id}, data='{self.data}')>"
 
 
-# Criar todas as tabelas no banco de dados
-Base.metadata.create_all(engine)
+# Fábrica de sessões; a engine é associada a cada sessão por obter_sessao()
+Session = sessionmaker()
+
+
+# Função para obter a engine do SQLAlchemy (criada uma única vez por processo)
+def obter_engine():
+    global _engine
+    if _engine is None:
+        with _trava:
+            if _engine is None:
+                _engine = create_engine(DATABASE_URL)
+    return _engine
+
 
-# Criar uma sessão para interagir com o banco de dados
-Session = sessionmaker(bind=engine)
+# Função para criar as tabelas no banco de dados (executada uma vez por processo, no primeiro uso)
+def migrar():
+    global _migrado
+    if _migrado:
+        return
+    engine = obter_engine()
+    with _trava:
+        if not _migrado:
+            Base.metadata.create_all(engine)
+            _migrado = True
+
+
+# Função para abrir uma sessão com o banco de dados já migrado
+def obter_sessao():
+    migrar()
+    return Session(bind=obter_engine())
 
 
 # Funções para interagir com o banco de dados
@@ -84,7 +115,7 @@ def importar_dados_excel(arquivo_mensal, arquivo_equipamentos):
     """
     Importa dados das planilhas Excel para o banco de dados
     """
-    session = Session()
+    session = obter_sessao()
     try:
         # Limpar dados existentes (opcional, dependendo da necessidade)
         # session.query(Manutencao).delete()
@@ -96,6 +127,9 @@ def importar_dados_excel(arquivo_mensal, arquivo_equipamentos):
         df_mensal = pd.read_excel(arquivo_mensal)
         df_equipamentos = pd.read_excel(arquivo_equipamentos)
         
+        # Mapear os colaboradores para setores uma única vez, na importação (mesmas regras do aplicativo)
+        df_mensal = aplicar_setores(df_mensal, obter_regras_setores())
+        
         # Processar dados da planilha mensal
         for _, row in df_mensal.iterrows():
             # Adicionar colaborador se não existir
@@ -156,7 +190,7 @@ def obter_resumo_colaborador():
     """
     Obtém o resumo de quantidade de máquinas por colaborador e cliente
     """
-    session = Session()
+    session = obter_sessao()
     try:
         # Consulta SQL usando SQLAlchemy
         resultado = session.query(
@@ -186,7 +220,7 @@ def obter_total_por_colaborador():
     """
     Obtém o total de máquinas por colaborador
     """
-    session = Session()
+    session = obter_sessao()
     try:
         # Consulta SQL usando SQLAlchemy
         resultado = session.query(
@@ -214,7 +248,7 @@ def obter_identificadores_cliente(colaborador_nome, cliente_nome):
     Obtém os identificadores de equipamentos para um cliente específico
     atendido por um colaborador específico
     """
-    session = Session()
+    session = obter_sessao()
     try:
         # Consulta SQL usando SQLAlchemy
         resultado = session.query(
@@ -244,7 +278,7 @@ def verificar_dados_existentes():
     """
     Verifica se existem dados no banco
     """
-    session = Session()
+    session = obter_sessao()
     try:
         count = session.query(Manutencao).count()
         return count > 0
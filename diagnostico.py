@@ -0,0 +1,181 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Diagnóstico de desempenho: cada execução do script (ou tarefa em segundo plano) registra uma árvore de
+# trechos com a duração e a quantidade de linhas de cada etapa. Desligado, um trecho custa só uma consulta
+# ao estado da thread. Ligado pela variável de ambiente (todas as sessões e tarefas) ou, em uma sessão,
+# pelo parâmetro ?diagnostico=1 na URL.
+DIAGNOSTICO_HABILITADO = os.environ.get('MANUTENCAO_DIAGNOSTICO', '') == '1'
+
+# Arquivo JSON Lines onde cada árvore concluída é acrescentada (vazio desativa o arquivo)
+ARQUIVO_DIAGNOSTICO = os.environ.get('MANUTENCAO_DIAGNOSTICO_ARQUIVO', 'diagnostico.jsonl')
+
+# Medição da memória de cada trecho pelo tracemalloc (deixa o processo bem mais lento; só para investigação).
+# O tracemalloc conta as alocações de todas as threads, então com várias sessões ao mesmo tempo
+# a variação de um trecho inclui as alocações das outras.
+MEMORIA_HABILITADA = os.environ.get('MANUTENCAO_DIAGNOSTICO_MEMORIA', '') == '1'
+if MEMORIA_HABILITADA and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# Execução em andamento em cada thread (as sessões do Streamlit rodam cada uma em sua thread)
+_local = threading.local()
+_trava_arquivo = threading.Lock()
+
+
+# Classe de um trecho medido: nome, duração, linhas processadas e trechos internos
+class Trecho:
+    def __init__(self, nome, atributos=None):
+        self.nome = nome
+        self.atributos = dict(atributos or {})
+        self.linhas = None
+        self.filhos = []
+        self.segundos = None
+        # Variação da memória alocada durante o trecho, em bytes (só com o tracemalloc ativo)
+        self.memoria = None
+        self._memoria_inicio = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self._inicio = time.perf_counter()
+
+    def concluir(self):
+        self.segundos = time.perf_counter() - self._inicio
+        if self._memoria_inicio is not None and tracemalloc.is_tracing():
+            self.memoria = tracemalloc.get_traced_memory()[0] - self._memoria_inicio
+
+    def como_dict(self):
+        dados = {'nome': self.nome, 'ms': round((self.segundos or 0.0) * 1000, 3)}
+        if self.linhas is not None:
+            dados['linhas'] = self.linhas
+        if self.memoria is not None:
+            dados['memoria_kb'] = round(self.memoria / 1024, 1)
+        if self.atributos:
+            dados['atributos'] = self.atributos
+        if self.filhos:
+            dados['filhos'] = [filho.como_dict() for filho in self.filhos]
+        return dados
+
+
+# Função para iniciar a árvore de trechos de uma execução na thread atual.
+# Sem diagnóstico ativo (nem pela variável de ambiente nem pelo parâmetro), não registra nada.
+def iniciar_execucao(nome, ativo=False, **atributos):
+    if not (ativo or DIAGNOSTICO_HABILITADO):
+        _local.pilha = None
+        return None
+    raiz = Trecho(nome, atributos)
+    _local.pilha = [raiz]
+    return raiz
+
+
+# Função para concluir a execução da thread atual: fecha a raiz, grava a linha no arquivo
+# e retorna a árvore (dict), ou None se o diagnóstico não estava ativo
+def concluir_execucao():
+    pilha = getattr(_local, 'pilha', None)
+    _local.pilha = None
+    if not pilha:
+        return None
+    raiz = pilha[0]
+    raiz.concluir()
+    arvore = raiz.como_dict()
+    gravar_registro(arvore)
+    return arvore
+
+
+# Função para acrescentar um registro (dict) como uma linha JSON ao arquivo de diagnóstico, com a data
+def gravar_registro(registro):
+    if not ARQUIVO_DIAGNOSTICO:
+        return
+    linha = json.dumps(dict(registro, data=datetime.now().isoformat(timespec='milliseconds')), ensure_ascii=False)
+    try:
+        with _trava_arquivo, open(ARQUIVO_DIAGNOSTICO, 'a', encoding='utf-8') as f:
+            f.write(linha + '\n')
+    except OSError:
+        # O diagnóstico nunca interrompe o aplicativo
+        pass
+
+
+# Função para saber se há diagnóstico ativo na thread atual
+def diagnostico_ativo():
+    return bool(getattr(_local, 'pilha', None))
+
+
+# Função para abrir um trecho dentro da execução atual (para etapas que não cabem em um bloco with,
+# como os ramos do script ou as fases de uma tarefa). Sem execução ativa, retorna None.
+def iniciar_trecho(nome, **atributos):
+    pilha = getattr(_local, 'pilha', None)
+    if not pilha:
+        return None
+    atual = Trecho(nome, atributos)
+    pilha[-1].filhos.append(atual)
+    pilha.append(atual)
+    return atual
+
+
+# Função para fechar um trecho aberto por iniciar_trecho (e os trechos internos que ficaram abertos,
+# por exemplo depois de um st.stop()/st.rerun())
+def concluir_trecho(atual):
+    pilha = getattr(_local, 'pilha', None)
+    if atual is None or not pilha or atual not in pilha:
+        return
+    while pilha:
+        aberto = pilha[-1]
+        if aberto is pilha[0]:
+            break
+        pilha.pop()
+        aberto.concluir()
+        if aberto is atual:
+            break
+
+
+# Contexto para medir um trecho dentro da execução atual. O trecho recebido permite informar
+# as linhas processadas (trecho.linhas = len(df)). Sem execução ativa, recebe None.
+@contextmanager
+def trecho(nome, **atributos):
+    atual = iniciar_trecho(nome, **atributos)
+    try:
+        yield atual
+    finally:
+        concluir_trecho(atual)
+
+
+# Função para obter a quantidade de linhas de um resultado (DataFrame, Series, array, lista ou conjunto)
+def _linhas(resultado):
+    if hasattr(resultado, 'shape') and len(getattr(resultado, 'shape', ())) > 0:
+        return int(resultado.shape[0])
+    if isinstance(resultado, (list, set)):
+        return len(resultado)
+    return None
+
+
+# Decorador para medir uma função como um trecho (com as linhas do resultado, quando houver)
+def rastreado(nome=None):
+    def decorador(funcao):
+        rotulo = nome or funcao.__name__
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if not diagnostico_ativo():
+                return funcao(*args, **kwargs)
+            with trecho(rotulo) as atual:
+                resultado = funcao(*args, **kwargs)
+                atual.linhas = _linhas(resultado)
+                return resultado
+        return envoltorio
+    return decorador
+
+
+# Função para achatar uma árvore em linhas (nome indentado pela profundidade), para exibir em tabela
+def linhas_da_arvore(arvore, profundidade=0):
+    linhas = [{
+        'Trecho': '    ' * profundidade + arvore['nome'],
+        'ms': arvore['ms'],
+        'Linhas': arvore.get('linhas'),
+    }]
+    if 'memoria_kb' in arvore:
+        linhas[0]['Memória (KB)'] = arvore['memoria_kb']
+    for filho in arvore.get('filhos', []):
+        linhas.extend(linhas_da_arvore(filho, profundidade + 1))
+    return linhas
@@ -0,0 +1,250 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from armazenamento import obter_regras_setores
+from setores import aplicar_setores
+
+# Quantidade de linhas de cada bloco lido das planilhas
+TAMANHO_BLOCO = 5000
+
+# Função para contar os núcleos disponíveis para este processo (respeita limites de afinidade do contêiner)
+def _nucleos_disponiveis():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Colunas descartadas já na leitura (nunca chegam ao DataFrame nem ao banco),
+# configuráveis pela variável de ambiente com os nomes separados por ";"
+COLUNAS_IGNORADAS = [
+    coluna.strip() for coluna in os.environ.get('MANUTENCAO_COLUNAS_IGNORADAS', '').split(';') if coluna.strip()
+]
+
+# Quantidade máxima de processos usados para ler planilhas em paralelo (1 desativa o paralelismo)
+PROCESSOS_INGESTAO = int(os.environ.get('MANUTENCAO_PROCESSOS_INGESTAO', _nucleos_disponiveis()))
+
+
+# Exceção para planilhas que não passam na validação de colunas
+class PlanilhaInvalidaError(ValueError):
+    pass
+
+
+# Função para calcular o hash SHA-256 do conteúdo de um arquivo enviado (ou de um caminho em disco)
+def calcular_hash_arquivo(arquivo):
+    sha = hashlib.sha256()
+    if hasattr(arquivo, 'getvalue'):
+        sha.update(arquivo.getvalue())
+    else:
+        with open(arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(bloco)
+    return sha.hexdigest()
+
+
+# Função para montar os nomes das colunas como o pandas faz (vazias viram "Unnamed: n", repetidas ganham ".1", ".2"...)
+def _nomes_colunas(cabecalho):
+    nomes = []
+    vistos = {}
+    for posicao, valor in enumerate(cabecalho):
+        if valor is None or (isinstance(valor, str) and not valor.strip()):
+            nome = f"Unnamed: {posicao}"
+        elif isinstance(valor, float) and valor.is_integer():
+            nome = str(int(valor))
+        else:
+            nome = str(valor)
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+# Função para agrupar linhas (tuplas de células) em DataFrames de tamanho fixo.
+# Linhas totalmente vazias são descartadas; sempre gera pelo menos um bloco (mesmo vazio) com as colunas.
+# As colunas ignoradas são removidas de cada linha antes de o bloco ser montado.
+def _agrupar_em_blocos(linhas, tamanho_bloco, colunas_ignoradas=()):
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    nomes = _nomes_colunas(cabecalho)
+    posicoes = [posicao for posicao, nome in enumerate(nomes) if nome not in colunas_ignoradas]
+    colunas = [nomes[posicao] for posicao in posicoes]
+    largura = len(nomes)
+
+    bloco = []
+    gerou = False
+    for linha in linhas:
+        linha = tuple(linha[:largura]) + (None,) * (largura - len(linha))
+        linha = tuple(linha[posicao] for posicao in posicoes)
+        if all(valor is None or valor == '' for valor in linha):
+            continue
+        bloco.append(linha)
+        if len(bloco) >= tamanho_bloco:
+            yield pd.DataFrame.from_records(bloco, columns=colunas)
+            gerou = True
+            bloco = []
+    if bloco or not gerou:
+        yield pd.DataFrame.from_records(bloco, columns=colunas)
+
+
+# Função para ler as linhas de um .xlsx em modo streaming (o openpyxl não carrega a planilha inteira)
+def _linhas_xlsx(conteudo):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(conteudo, read_only=True, data_only=True)
+    try:
+        for linha in workbook.worksheets[0].iter_rows(values_only=True):
+            yield linha
+    finally:
+        workbook.close()
+
+
+# Função para ler as linhas de um .xls antigo (limitado a 65.536 linhas pelo próprio formato)
+def _linhas_xls(conteudo):
+    import xlrd
+
+    workbook = xlrd.open_workbook(file_contents=conteudo.read(), on_demand=True)
+    try:
+        planilha = workbook.sheet_by_index(0)
+        for indice in range(planilha.nrows):
+            linha = []
+            for celula in planilha.row(indice):
+                if celula.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    linha.append(None)
+                elif celula.ctype == xlrd.XL_CELL_DATE:
+                    linha.append(xlrd.xldate_as_datetime(celula.value, workbook.datemode))
+                elif celula.ctype == xlrd.XL_CELL_BOOLEAN:
+                    linha.append(bool(celula.value))
+                elif celula.ctype == xlrd.XL_CELL_NUMBER and float(celula.value).is_integer():
+                    linha.append(int(celula.value))
+                elif celula.ctype == xlrd.XL_CELL_ERROR:
+                    linha.append(None)
+                else:
+                    linha.append(celula.value)
+            yield tuple(linha)
+    finally:
+        workbook.release_resources()
+
+
+# Função para ler uma planilha Excel (arquivo enviado ou caminho) em blocos de tamanho fixo.
+# Apenas um bloco de linhas fica em memória por vez, independentemente do tamanho da planilha.
+def ler_planilha_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, colunas_ignoradas=None):
+    if colunas_ignoradas is None:
+        colunas_ignoradas = COLUNAS_IGNORADAS
+    nome = str(getattr(arquivo, 'name', arquivo)).lower()
+    if hasattr(arquivo, 'getvalue'):
+        conteudo = io.BytesIO(arquivo.getvalue())
+    else:
+        conteudo = open(arquivo, 'rb')
+
+    with conteudo:
+        linhas = _linhas_xls(conteudo) if nome.endswith('.xls') else _linhas_xlsx(conteudo)
+        yield from _agrupar_em_blocos(linhas, tamanho_bloco, set(colunas_ignoradas))
+
+
+# Função para validar e preparar cada bloco de uma planilha antes de gravá-lo:
+# confere as colunas obrigatórias e aplica o mapeamento de setores à coluna Colaborador.
+# As regras de setores são lidas do banco uma vez por planilha (ou recebidas prontas).
+def preparar_blocos(blocos, colunas_obrigatorias=('Identificador',), mapear_setores=True, regras_setores=None):
+    if mapear_setores and regras_setores is None:
+        regras_setores = obter_regras_setores()
+    for bloco in blocos:
+        faltando = [coluna for coluna in colunas_obrigatorias if coluna not in bloco.columns]
+        if faltando:
+            raise PlanilhaInvalidaError(
+                f"A planilha deve conter a(s) coluna(s) {', '.join(repr(coluna) for coluna in faltando)}."
+            )
+        if mapear_setores:
+            bloco = aplicar_setores(bloco, regras_setores)
+        yield bloco
+
+
+# Função executada em um processo separado: lê e valida a planilha e grava cada bloco
+# em disco, devolvendo os caminhos na ordem (só caminhos voltam ao processo principal)
+def _analisar_em_disco(caminho_planilha, diretorio, prefixo, colunas_obrigatorias, mapear_setores, regras_setores):
+    caminhos = []
+    blocos = preparar_blocos(
+        ler_planilha_em_blocos(caminho_planilha), colunas_obrigatorias, mapear_setores, regras_setores
+    )
+    for indice, bloco in enumerate(blocos):
+        caminho = os.path.join(diretorio, f"{prefixo}_{indice:06d}.pkl")
+        bloco.to_pickle(caminho)
+        caminhos.append(caminho)
+    return caminhos
+
+
+# Função para ler de volta os blocos gravados por um processo de leitura, um por vez
+def _blocos_em_disco(caminhos):
+    for caminho in caminhos:
+        bloco = pd.read_pickle(caminho)
+        os.remove(caminho)
+        yield bloco
+
+
+# Classe com o resultado da leitura de uma planilha (em outro processo ou no próprio processo)
+class PlanilhaAnalisada:
+    def __init__(self, arquivo, colunas_obrigatorias, mapear_setores, regras_setores, futuro=None):
+        self.arquivo = arquivo
+        self.colunas_obrigatorias = colunas_obrigatorias
+        self.mapear_setores = mapear_setores
+        self.regras_setores = regras_setores
+        self.futuro = futuro
+
+    # Blocos prontos para gravação; espera a leitura terminar e repassa os erros dela
+    def blocos(self):
+        if self.futuro is None:
+            return preparar_blocos(
+                ler_planilha_em_blocos(self.arquivo), self.colunas_obrigatorias, self.mapear_setores, self.regras_setores
+            )
+        return _blocos_em_disco(self.futuro.result())
+
+
+# Gerenciador para ler várias planilhas ao mesmo tempo em processos separados.
+# Recebe {chave: (arquivo, colunas_obrigatorias, mapear_setores)} e devolve {chave: PlanilhaAnalisada};
+# quem chama grava os blocos na ordem que quiser enquanto as demais leituras continuam.
+@contextmanager
+def analisar_planilhas_em_paralelo(planilhas):
+    processos = min(PROCESSOS_INGESTAO, len(planilhas))
+
+    # As regras de setores são lidas uma vez aqui; os processos de leitura não acessam o banco
+    regras_setores = obter_regras_setores()
+    if processos <= 1:
+        yield {
+            chave: PlanilhaAnalisada(arquivo, colunas_obrigatorias, mapear_setores, regras_setores)
+            for chave, (arquivo, colunas_obrigatorias, mapear_setores) in planilhas.items()
+        }
+        return
+
+    diretorio = tempfile.mkdtemp(prefix='ingestao_')
+    try:
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+            analisadas = {}
+            for posicao, (chave, (arquivo, colunas_obrigatorias, mapear_setores)) in enumerate(planilhas.items()):
+                # O conteúdo enviado vai para um arquivo temporário; o processo lê dali
+                caminho_planilha = arquivo
+                if hasattr(arquivo, 'getvalue'):
+                    extensao = os.path.splitext(str(getattr(arquivo, 'name', '')))[1].lower() or '.xlsx'
+                    caminho_planilha = os.path.join(diretorio, f"entrada_{posicao}{extensao}")
+                    with open(caminho_planilha, 'wb') as f:
+                        f.write(arquivo.getvalue())
+                futuro = executor.submit(
+                    _analisar_em_disco, caminho_planilha, diretorio, f"bloco_{posicao}",
+                    tuple(colunas_obrigatorias), mapear_setores, regras_setores
+                )
+                analisadas[chave] = PlanilhaAnalisada(
+                    arquivo, colunas_obrigatorias, mapear_setores, regras_setores, futuro
+                )
+            yield analisadas
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
@@ -0,0 +1,36 @@
+import os
+import sys
+import threading
+
+# Importações feitas antes da thread de aquecimento: dois imports simultâneos do pandas
+# (um por thread) encontram o módulo pela metade
+from streamlit.web import cli
+
+from cache_compartilhado import aquecer
+from memoria import iniciar_registro_periodico
+
+# Inicialização do servidor com o cache já aquecido:
+#     python iniciar.py --server.port 5000
+# Equivale a "streamlit run app_manutencao.py", mas monta os dados da última versão em segundo plano
+# enquanto o servidor sobe, no mesmo processo (o cache é compartilhado com as sessões).
+# MANUTENCAO_AQUECER=0 desativa o aquecimento. O registro periódico da memória (MANUTENCAO_MEMORIA_INTERVALO)
+# começa junto com o servidor, antes da primeira sessão.
+APLICATIVO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app_manutencao.py')
+
+
+# Função para aquecer o cache sem impedir a subida do servidor (um erro aqui só adia o trabalho para a primeira sessão)
+def _aquecer():
+    try:
+        tempos = aquecer()
+        print("Cache aquecido: " + ", ".join(f"{etapa} {segundos:.2f}s" for etapa, segundos in tempos.items()))
+    except Exception as e:
+        print(f"Não foi possível aquecer o cache: {str(e)}")
+
+
+if __name__ == '__main__':
+    if os.environ.get('MANUTENCAO_AQUECER', '1') != '0':
+        threading.Thread(target=_aquecer, name='aquecimento', daemon=True).start()
+    iniciar_registro_periodico()
+
+    sys.argv = ['streamlit', 'run', APLICATIVO] + sys.argv[1:]
+    sys.exit(cli.main())
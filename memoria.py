@@ -0,0 +1,151 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from diagnostico import DIAGNOSTICO_HABILITADO, gravar_registro
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem o pico de memória do processo
+    resource = None
+
+# Intervalo, em segundos, da linha periódica de memória no arquivo de diagnóstico (0 desativa).
+# Com o diagnóstico ligado pela variável de ambiente, o padrão é um registro por minuto.
+INTERVALO_REGISTRO_MEMORIA = int(os.environ.get(
+    'MANUTENCAO_MEMORIA_INTERVALO', 60 if DIAGNOSTICO_HABILITADO else 0
+))
+
+_trava = threading.Lock()
+_registro_periodico = None
+
+
+# Função para estimar os bytes ocupados por um valor: DataFrames e Series pelo memory_usage(deep=True),
+# arrays pelo nbytes, listas e conjuntos pelos itens e demais objetos pelos atributos (um nível)
+def tamanho_em_bytes(valor, profundidade=1):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        if valor.dtype == object:
+            return int(valor.nbytes + sum(sys.getsizeof(item) for item in valor.ravel()))
+        return int(valor.nbytes)
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(tamanho_em_bytes(item, 0) for item in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(
+            tamanho_em_bytes(chave, 0) + tamanho_em_bytes(item, 0) for chave, item in valor.items()
+        )
+    if profundidade > 0 and hasattr(valor, '__dict__'):
+        return sys.getsizeof(valor) + sum(
+            tamanho_em_bytes(atributo, profundidade - 1) for atributo in vars(valor).values()
+        )
+    return sys.getsizeof(valor)
+
+
+# Função para obter a memória do processo: residente atual e pico (KB) e, com o tracemalloc ativo,
+# a memória alocada pelo Python e o pico desde o início do rastreamento
+def uso_processo():
+    uso = {'rss_kb': None, 'rss_pico_kb': None}
+    try:
+        with open('/proc/self/statm') as f:
+            uso['rss_kb'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        uso['rss_pico_kb'] = pico // 1024 if sys.platform == 'darwin' else pico
+    if tracemalloc.is_tracing():
+        atual, pico = tracemalloc.get_traced_memory()
+        uso['tracemalloc_kb'] = round(atual / 1024, 1)
+        uso['tracemalloc_pico_kb'] = round(pico / 1024, 1)
+    return uso
+
+
+# Função para obter as sessões ativas do Streamlit e o que cada uma guarda no session_state:
+# uma linha por sessão com o número de chaves, de DataFrames e os bytes desses DataFrames.
+# Retorna None fora do servidor do Streamlit (por exemplo, no modo bare ou nos testes).
+def uso_sessoes():
+    try:
+        from streamlit.runtime import Runtime
+
+        if not Runtime.exists():
+            return None
+        # O Streamlit não expõe a lista de sessões publicamente
+        gerenciador = getattr(Runtime.instance(), '_session_mgr', None)
+        if gerenciador is None:
+            return None
+        sessoes_ativas = gerenciador.list_active_sessions()
+    except Exception:
+        return None
+
+    sessoes = []
+    for info in sessoes_ativas:
+        try:
+            estado = dict(info.session.session_state.filtered_state)
+        except Exception:
+            # Sessão encerrada durante a leitura
+            continue
+        frames = [valor for valor in estado.values() if isinstance(valor, pd.DataFrame)]
+        sessoes.append({
+            'sessao': info.session.id[:8],
+            'execucoes': info.script_run_count,
+            'chaves': len(estado),
+            'dataframes': len(frames),
+            'bytes_dataframes': sum(tamanho_em_bytes(df) for df in frames),
+        })
+    return sessoes
+
+
+# Função para montar o resumo da memória: processo, dados em cache (por entrada) e sessões ativas
+def resumo_memoria():
+    # Importado aqui: o cache compartilhado usa tamanho_em_bytes deste módulo
+    from cache_compartilhado import uso_memoria
+
+    cache = uso_memoria()
+    sessoes = uso_sessoes()
+    resumo = {
+        'nome': 'memoria',
+        'processo': uso_processo(),
+        'cache_kb': round(sum(entrada['bytes'] for entrada in cache) / 1024, 1),
+        'cache': cache,
+    }
+    if sessoes is not None:
+        resumo['sessoes'] = len(sessoes)
+        resumo['chaves_sessoes'] = sum(sessao['chaves'] for sessao in sessoes)
+        resumo['dataframes_sessoes_kb'] = round(sum(sessao['bytes_dataframes'] for sessao in sessoes) / 1024, 1)
+        resumo['detalhe_sessoes'] = sessoes
+    return resumo
+
+
+# Função para iniciar (uma vez por processo) a thread que grava o resumo da memória no arquivo de
+# diagnóstico a cada INTERVALO_REGISTRO_MEMORIA segundos. Sem intervalo configurado, não faz nada.
+def iniciar_registro_periodico(intervalo=None):
+    global _registro_periodico
+    intervalo = INTERVALO_REGISTRO_MEMORIA if intervalo is None else intervalo
+    if intervalo <= 0:
+        return False
+    with _trava:
+        if _registro_periodico is None:
+            _registro_periodico = threading.Thread(
+                target=_registrar_periodicamente, args=(intervalo,), name='registro_memoria', daemon=True
+            )
+            _registro_periodico.start()
+    return True
+
+
+def _registrar_periodicamente(intervalo):
+    while True:
+        try:
+            gravar_registro(resumo_memoria())
+        except Exception:
+            # O registro nunca interrompe o aplicativo; tenta de novo no próximo intervalo
+            pass
+        time.sleep(intervalo)
@@ -0,0 +1,60 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Mapeamento padrão dos colaboradores para os setores (usado para popular a tabela setores_mapa).
+# A ordem importa: o primeiro setor com um nome contido no colaborador é o escolhido.
+SETOR_MAP_EXATO = {
+    "Setor 3 GWSB e Vitor Hugo": ["Victor Hugo Nascimento Soares", "GWSB"],
+    "Setor 1 Paco Ruhan e LUKREFRIGERAÇÃO": ["Pako Ruhan", "LUKREFRIGERACAO"],
+    "Setor 5 RNCLIMATIZACAO e Robson": ["Robson Roque Bernardo", "RN CLIMATIZACAO"],
+    "Setor 4 ADS e Wando": ["Wanderley Souza da Silva", "ADS"],
+    "Setor 2 Renan e MVF": ["Renan de Souza Miranda", "MVF Climatizacao"],
+}
+
+# Regras padrão no formato da tabela: (setor, nome) em ordem de prioridade
+REGRAS_PADRAO = tuple((setor, nome) for setor, nomes in SETOR_MAP_EXATO.items() for nome in nomes)
+
+
+# Função para compilar as regras em uma única expressão, sem diferenciar maiúsculas de minúsculas.
+# Cada nome vira um grupo de uma alternância ancorada no início ("^(?:.*?(nome1)|.*?(nome2)|...)"),
+# então a primeira regra que aparece em qualquer posição do texto vence, como no laço original.
+# O resultado fica em cache para cada conjunto de regras.
+@lru_cache(maxsize=8)
+def compilar_regras(regras):
+    regras = tuple(regras)
+    if not regras:
+        return None, ()
+    alternativas = '|'.join(f".*?({re.escape(nome)})" for _, nome in regras)
+    expressao = re.compile(f"^(?:{alternativas})", re.IGNORECASE | re.DOTALL)
+    return expressao, tuple(setor for setor, _ in regras)
+
+
+# Função para substituir o nome do colaborador pelo setor correspondente
+def substituir_por_setor(colaborador, regras=REGRAS_PADRAO):
+    expressao, setores = compilar_regras(tuple(regras))
+    if expressao is None:
+        return colaborador
+    encontrado = expressao.match(str(colaborador))
+    if encontrado is None:
+        return colaborador
+    return setores[encontrado.lastindex - 1]
+
+
+# Função para aplicar o mapeamento de setores à coluna Colaborador de um DataFrame.
+# Cada nome distinto é verificado uma única vez e o resultado é espalhado pelos códigos
+# do pd.factorize; células vazias continuam vazias.
+def aplicar_setores(df, regras=REGRAS_PADRAO):
+    if 'Colaborador' not in df.columns:
+        return df
+    colaboradores = df['Colaborador']
+    codigos, distintos = pd.factorize(colaboradores)
+    if len(distintos) == 0:
+        return df
+    mapeados = np.empty(len(distintos), dtype=object)
+    mapeados[:] = [substituir_por_setor(colaborador, regras) for colaborador in distintos]
+    resultado = pd.Series(mapeados.take(codigos), index=df.index, dtype=object)
+    df['Colaborador'] = resultado.where(codigos >= 0, colaboradores.astype(object))
+    return df
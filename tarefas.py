@@ -0,0 +1,419 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from armazenamento import (
+    TIPO_MANUTENCAO_MENSAL,
+    ORIGEM_EQUIPAMENTOS,
+    LIMITE_PAGINAS_LIVRES,
+    BancoOcupadoError,
+    transacao,
+    salvar_ultima_atualizacao,
+    preparar_snapshot_em_blocos,
+    publicar_snapshots,
+    descartar_snapshots,
+    obter_snapshot_por_hash,
+    obter_status_planilhas,
+    montar_manutencoes_diarias_em_blocos,
+    inserir_manutencoes_realizadas,
+    obter_ultimo_id_tarefa_ingestao,
+    criar_tarefa_ingestao,
+    atualizar_tarefa_ingestao,
+    compactar_snapshots,
+    obter_paginas_livres,
+    obter_tarefa_ingestao,
+    obter_tarefas_ingestao,
+)
+from cache_compartilhado import obter_dados_manutencao
+from diagnostico import iniciar_execucao, concluir_execucao, iniciar_trecho, concluir_trecho
+from ingestao import (
+    PlanilhaInvalidaError,
+    analisar_planilhas_em_paralelo,
+    calcular_hash_arquivo,
+    ler_planilha_em_blocos,
+    preparar_blocos,
+)
+
+# Tipos de tarefa de ingestão
+TAREFA_CONFIGURACAO_INICIAL = 'configuracao_inicial'
+TAREFA_ATUALIZACAO_DIARIA = 'atualizacao_diaria'
+TAREFA_COMPACTACAO = 'compactacao'
+
+# Estados de uma tarefa (gravados em tarefas_ingestao)
+ESTADO_PENDENTE = 'pendente'
+ESTADO_EXECUTANDO = 'executando'
+ESTADO_CONCLUIDA = 'concluida'
+ESTADO_ERRO = 'erro'
+ESTADOS_ATIVOS = (ESTADO_PENDENTE, ESTADO_EXECUTANDO)
+
+# Um único trabalhador: as gravações no SQLite são serializadas de qualquer forma,
+# e as tarefas enviadas enquanto outra executa esperam na fila
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingestao')
+_trava = threading.Lock()
+# Tarefas deste processo ainda não terminadas: id -> Tarefa (com o progresso em memória)
+_tarefas = {}
+# Último id reservado para uma tarefa deste processo
+_ultimo_id = 0
+# Tarefas deixadas ativas no banco por um processo anterior já marcadas como interrompidas
+_interrompidas_marcadas = False
+
+
+# Classe com o estado, o progresso e as mensagens de uma tarefa ainda não terminada.
+# O progresso é lido da memória: o registro em tarefas_ingestao só é criado pelo trabalhador ao começar,
+# então enviar e acompanhar uma tarefa nunca espera pela trava de escrita. A fase atual também é
+# gravada no registro a cada mudança, para que ele mostre onde a tarefa estava se o processo parar.
+class Tarefa:
+    def __init__(self, tarefa_id, tipo, total_fases):
+        self.id = tarefa_id
+        self.tipo = tipo
+        self.estado = ESTADO_PENDENTE
+        self.criada_em = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.registrada = False
+        self.total_fases = max(total_fases, 1)
+        self.fases_iniciadas = 0
+        self.fase = "Aguardando na fila"
+        self.linhas = 0
+        self.mensagens = []
+        self.resultado = {}
+        # Snapshots novos publicados pela tarefa (as versões substituídas podem ser removidas)
+        self.publicou_snapshots = False
+        # Trecho do diagnóstico da fase atual e o tempo gasto esperando a leitura dos blocos
+        self._trecho = None
+        self._segundos_leitura = 0.0
+
+    # Função para iniciar uma nova fase (a fração concluída conta as fases anteriores)
+    def iniciar_fase(self, fase):
+        self.concluir_fase()
+        self.fases_iniciadas += 1
+        self.fase = fase
+        self.linhas = 0
+        self._segundos_leitura = 0.0
+        self._trecho = iniciar_trecho(fase)
+        if self.registrada:
+            try:
+                atualizar_tarefa_ingestao(self.id, self.estado, fase=fase, mensagens=self.mensagens)
+            except BancoOcupadoError:
+                # O andamento continua em memória; o registro recebe a próxima fase
+                pass
+
+    # Função para fechar o trecho do diagnóstico da fase atual, com as linhas e o tempo de leitura
+    def concluir_fase(self):
+        if self._trecho is not None:
+            self._trecho.linhas = self.linhas
+            if self._segundos_leitura:
+                self._trecho.atributos['leitura_ms'] = round(self._segundos_leitura * 1000, 3)
+            concluir_trecho(self._trecho)
+            self._trecho = None
+
+    # Função para contar as linhas dos blocos à medida que são consumidos
+    # (e o tempo de espera por cada bloco, que é a leitura da planilha)
+    def contar(self, blocos):
+        blocos = iter(blocos)
+        while True:
+            inicio = time.perf_counter()
+            bloco = next(blocos, None)
+            self._segundos_leitura += time.perf_counter() - inicio
+            if bloco is None:
+                return
+            yield bloco
+            self.linhas += len(bloco)
+
+    # Função para registrar uma mensagem para a interface (nível: success, info, warning ou error)
+    def mensagem(self, nivel, texto):
+        self.mensagens.append((nivel, texto))
+
+    def fracao(self):
+        return min(max(self.fases_iniciadas - 1, 0) / self.total_fases, 1.0)
+
+    # Função para obter o estado no formato dos registros de tarefas_ingestao, com o progresso
+    def como_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'fase': self.fase,
+            'mensagens': list(self.mensagens),
+            'resultado': dict(self.resultado),
+            'criada_em': self.criada_em,
+            'atualizada_em': None,
+            'fracao': self.fracao(),
+            'linhas': self.linhas,
+        }
+
+
+# Função para gravar os arquivos enviados em um diretório próprio da tarefa.
+# O trabalhador lê dali, então a tarefa não depende da sessão que a enviou.
+def _copiar_arquivos(arquivos):
+    diretorio = tempfile.mkdtemp(prefix='tarefa_')
+    caminhos = {}
+    try:
+        for posicao, (chave, arquivo) in enumerate(arquivos.items()):
+            extensao = os.path.splitext(str(getattr(arquivo, 'name', '')))[1].lower() or '.xlsx'
+            caminho = os.path.join(diretorio, f"{posicao}_{chave}{extensao}")
+            with open(caminho, 'wb') as f:
+                f.write(arquivo.getvalue())
+            caminhos[chave] = caminho
+    except BaseException:
+        shutil.rmtree(diretorio, ignore_errors=True)
+        raise
+    return diretorio, caminhos
+
+
+# Função para enviar uma tarefa ao trabalhador e obter o seu id.
+# O id é reservado em memória (acima do maior já gravado), sem escrever no banco:
+# o envio não espera pela gravação de uma tarefa anterior. Se o envio falhar, os arquivos copiados são removidos.
+def _enviar(tipo, executar, arquivos, total_fases):
+    global _ultimo_id
+    diretorio, caminhos = _copiar_arquivos(arquivos)
+    tarefa = None
+    try:
+        ultimo_gravado = obter_ultimo_id_tarefa_ingestao()
+        with _trava:
+            _ultimo_id = max(_ultimo_id, ultimo_gravado) + 1
+            tarefa = Tarefa(_ultimo_id, tipo, total_fases)
+            _tarefas[tarefa.id] = tarefa
+        _executor.submit(_executar, tarefa, executar, caminhos, diretorio)
+    except BaseException:
+        if tarefa is not None:
+            with _trava:
+                _tarefas.pop(tarefa.id, None)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        raise
+    return tarefa.id
+
+
+# Função executada pelo trabalhador: a leitura e a preparação das planilhas não reservam o banco por mais
+# que um bloco, e os dados novos aparecem para as sessões de uma vez, na transação curta de publicação
+# (até lá, elas continuam na versão anterior). Depois de substituir planilhas, os snapshots fora da política
+# de retenção são removidos.
+def _executar(tarefa, executar, caminhos, diretorio):
+    iniciar_execucao(f"tarefa {tarefa.tipo}", tarefa=tarefa.id)
+    try:
+        tarefa.estado = ESTADO_EXECUTANDO
+        criar_tarefa_ingestao(tarefa.id, tarefa.tipo, ESTADO_EXECUTANDO, tarefa.criada_em)
+        tarefa.registrada = True
+        if executar is not None:
+            executar(tarefa, caminhos)
+        # Versões antigas só surgem quando uma planilha é substituída; as demais tarefas (como a atualização
+        # diária) compactam apenas quando as páginas livres passam do limite
+        if executar is None or tarefa.publicou_snapshots or obter_paginas_livres() > LIMITE_PAGINAS_LIVRES:
+            _compactar(tarefa, obrigatoria=executar is None)
+
+        # Deixar pronto o DataFrame combinado da nova versão antes de liberar a interface
+        selecionados = tarefa.resultado.get('dados_selecionados')
+        if selecionados is not None:
+            tarefa.iniciar_fase("Preparando a visualização")
+            obter_dados_manutencao(selecionados)
+        atualizar_tarefa_ingestao(
+            tarefa.id, ESTADO_CONCLUIDA, fase="Concluída", mensagens=tarefa.mensagens, resultado=tarefa.resultado
+        )
+        tarefa.estado = ESTADO_CONCLUIDA
+    except Exception as e:
+        tarefa.mensagem('error', f"Erro ao processar as planilhas: {str(e)}")
+        if not tarefa.registrada:
+            criar_tarefa_ingestao(tarefa.id, tarefa.tipo, ESTADO_ERRO, tarefa.criada_em)
+        atualizar_tarefa_ingestao(tarefa.id, ESTADO_ERRO, fase=tarefa.fase, mensagens=tarefa.mensagens)
+        tarefa.estado = ESTADO_ERRO
+    finally:
+        tarefa.concluir_fase()
+        concluir_execucao()
+        with _trava:
+            _tarefas.pop(tarefa.id, None)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+# Função para remover as versões antigas dos snapshots. Depois de uma gravação, uma falha aqui
+# não desfaz os dados já confirmados: vira apenas um aviso e a compactação fica para a próxima tarefa.
+def _compactar(tarefa, obrigatoria):
+    tarefa.iniciar_fase("Removendo versões antigas")
+    try:
+        resumo = compactar_snapshots()
+    except Exception as e:
+        if obrigatoria:
+            raise
+        tarefa.mensagem('warning', f"Não foi possível remover as versões antigas: {str(e)}")
+        return
+    if resumo['removidos'] or obrigatoria:
+        tarefa.mensagem('info', f"{resumo['removidos']} versões antigas removidas ({resumo['paginas_liberadas']} páginas liberadas).")
+
+
+# Função da configuração inicial: prepara os equipamentos e cada planilha de manutenção e publica todas juntas.
+# Recebe {origem: caminho}, com os equipamentos primeiro. Uma planilha sem a coluna 'Identificador' é ignorada
+# com um aviso; qualquer outro erro descarta todas as planilhas preparadas, sem publicar nenhuma.
+def _configuracao_inicial(tarefa, caminhos):
+    # Reenvios idênticos (mesmo hash do snapshot atual) não precisam ser lidos
+    hashes = {}
+    planilhas_a_ler = {}
+    for origem, caminho in caminhos.items():
+        hashes[origem] = calcular_hash_arquivo(caminho)
+        if obter_snapshot_por_hash(origem, hashes[origem]) is None:
+            planilhas_a_ler[origem] = (caminho, ('Identificador',), origem != ORIGEM_EQUIPAMENTOS)
+
+    preparados = {}
+    sucessos = []
+    ultimo_tipo_processado = None
+    try:
+        # Todas as planilhas novas são lidas ao mesmo tempo; a preparação segue a ordem recebida
+        with analisar_planilhas_em_paralelo(planilhas_a_ler) as planilhas_analisadas:
+            tarefa.iniciar_fase("Gravando a planilha de equipamentos")
+            if ORIGEM_EQUIPAMENTOS not in planilhas_analisadas:
+                # Reenvio idêntico: reaproveitar o snapshot atual sem ler a planilha
+                tarefa.mensagem('info', "Planilha de equipamentos idêntica à já carregada. Dados existentes mantidos.")
+            else:
+                try:
+                    blocos_equipamentos = tarefa.contar(planilhas_analisadas[ORIGEM_EQUIPAMENTOS].blocos())
+                    preparados[ORIGEM_EQUIPAMENTOS] = preparar_snapshot_em_blocos(
+                        ORIGEM_EQUIPAMENTOS, blocos_equipamentos, hashes[ORIGEM_EQUIPAMENTOS]
+                    )
+                    sucessos.append("Planilha de equipamentos carregada com sucesso!")
+                except PlanilhaInvalidaError:
+                    tarefa.mensagem('error', "A planilha de equipamentos deve conter a coluna 'Identificador'.")
+                    return
+
+            # Processar cada tipo de planilha
+            for tipo_planilha in caminhos:
+                if tipo_planilha == ORIGEM_EQUIPAMENTOS:
+                    continue
+                tarefa.iniciar_fase(f"Gravando a planilha {tipo_planilha}")
+                if tipo_planilha not in planilhas_analisadas:
+                    # Reenvio idêntico: nada a gravar e as manutenções registradas são mantidas
+                    tarefa.mensagem('info', f"Planilha {tipo_planilha} idêntica à já carregada. Dados existentes mantidos.")
+                else:
+                    try:
+                        blocos_planilha = tarefa.contar(planilhas_analisadas[tipo_planilha].blocos())
+                        preparados[tipo_planilha] = preparar_snapshot_em_blocos(
+                            tipo_planilha, blocos_planilha, hashes[tipo_planilha]
+                        )
+                    except PlanilhaInvalidaError:
+                        tarefa.mensagem('warning', f"A planilha {tipo_planilha} deve conter a coluna 'Identificador'. Esta planilha foi ignorada.")
+                        continue
+                    sucessos.append(f"Planilha {tipo_planilha} processada com sucesso!")
+                ultimo_tipo_processado = tipo_planilha
+
+        # Nova planilha de um tipo: as manutenções do tipo voltam a "não realizadas" na mesma publicação
+        if preparados:
+            tarefa.iniciar_fase("Publicando as planilhas")
+            publicar_snapshots(
+                preparados, tipos_a_limpar=[origem for origem in preparados if origem != ORIGEM_EQUIPAMENTOS]
+            )
+            tarefa.publicou_snapshots = True
+    except BaseException:
+        descartar_snapshots(preparados)
+        raise
+
+    for texto in sucessos:
+        tarefa.mensagem('success', texto)
+    if ultimo_tipo_processado is not None:
+        # Selecionar o último tipo processado, já combinado com os equipamentos
+        tarefa.resultado = {'dados_selecionados': ultimo_tipo_processado, 'tipo_visualizacao': ultimo_tipo_processado}
+    else:
+        tarefa.mensagem('warning', "Nenhuma planilha de manutenção foi processada. Carregue pelo menos uma planilha (Mensal, Semestral ou Corretiva).")
+
+
+# Função da atualização diária: lê as manutenções de cada planilha diária recebida ({tipo: caminho})
+# fora das transações e registra todas, com a data da atualização, em uma única transação curta
+def _atualizacao_diaria(tarefa, caminhos):
+    lidas = {}
+    for tipo_manutencao, caminho in caminhos.items():
+        tarefa.iniciar_fase(f"Lendo a planilha diária {tipo_manutencao}")
+        try:
+            blocos = tarefa.contar(preparar_blocos(ler_planilha_em_blocos(caminho), colunas_obrigatorias=()))
+            lidas[tipo_manutencao] = montar_manutencoes_diarias_em_blocos(blocos, tipo_manutencao)
+        except Exception as e:
+            tarefa.mensagem('error', f"Erro ao processar a planilha diária {tipo_manutencao}: {str(e)}")
+    if not lidas:
+        return
+
+    tarefa.iniciar_fase("Registrando as manutenções")
+    status_planilhas = obter_status_planilhas()
+    tem_dados = status_planilhas[TIPO_MANUTENCAO_MENSAL] and status_planilhas['equipamentos']
+    with transacao():
+        for _, registros, _, _ in lidas.values():
+            inserir_manutencoes_realizadas(registros)
+        if tem_dados:
+            # Atualizar a data e hora da última atualização (na mesma transação)
+            salvar_ultima_atualizacao()
+
+    for tipo_manutencao, (tem_planilha_inicial, _, registros_processados, linhas_lidas) in lidas.items():
+        tarefa.mensagem('info', f"Processados {linhas_lidas} registros da planilha diária.")
+        if tem_planilha_inicial:
+            tarefa.mensagem('success', f"Total de {registros_processados} manutenções registradas com sucesso!")
+        else:
+            tarefa.mensagem('warning', "Não foram encontrados dados iniciais. Processando apenas com dados da planilha diária.")
+        tarefa.mensagem('success', f"Planilha diária {tipo_manutencao} processada com sucesso!")
+
+    if tem_dados:
+        tarefa.resultado = {'dados_selecionados': TIPO_MANUTENCAO_MENSAL, 'tipo_visualizacao': list(lidas)[-1]}
+    else:
+        tarefa.mensagem('error', "Não foi possível carregar os dados armazenados. Faça o upload das planilhas iniciais primeiro.")
+
+
+# Função para enviar a configuração inicial ({origem: arquivo enviado}, com os equipamentos primeiro)
+def enviar_configuracao_inicial(arquivos):
+    return _enviar(TAREFA_CONFIGURACAO_INICIAL, _configuracao_inicial, arquivos, len(arquivos) + 2)
+
+
+# Função para enviar as planilhas diárias ({tipo de manutenção: arquivo enviado})
+def enviar_atualizacao_diaria(arquivos):
+    return _enviar(TAREFA_ATUALIZACAO_DIARIA, _atualizacao_diaria, arquivos, len(arquivos) + 2)
+
+
+# Função para enviar a compactação manual dos snapshots (mesma fila das gravações)
+def enviar_compactacao():
+    return _enviar(TAREFA_COMPACTACAO, None, {}, 1)
+
+
+# Função para obter o estado de uma tarefa: da memória enquanto ela não terminou, depois do banco.
+# Uma tarefa ativa no banco que este processo não conhece foi interrompida (reinício do servidor).
+def obter_tarefa(tarefa_id):
+    with _trava:
+        em_memoria = _tarefas.get(tarefa_id)
+        if em_memoria is not None:
+            return em_memoria.como_dict()
+    # O trabalhador grava o estado final antes de tirar a tarefa da memória
+    tarefa = obter_tarefa_ingestao(tarefa_id)
+    if tarefa is None or tarefa['estado'] not in ESTADOS_ATIVOS:
+        return tarefa
+    mensagens = tarefa['mensagens'] + [('error', "A atualização foi interrompida antes de terminar. Envie as planilhas novamente.")]
+    try:
+        atualizar_tarefa_ingestao(tarefa_id, ESTADO_ERRO, fase=tarefa['fase'], mensagens=mensagens)
+    except BancoOcupadoError:
+        # A marcação fica para a próxima consulta; a interrupção já é exibida agora
+        pass
+    tarefa['estado'] = ESTADO_ERRO
+    tarefa['mensagens'] = mensagens
+    return tarefa
+
+
+# Função para obter a tarefa ainda em andamento mais recente (para reconectar depois de recarregar a página)
+def obter_tarefa_ativa():
+    marcar_tarefas_interrompidas()
+    with _trava:
+        if _tarefas:
+            return _tarefas[max(_tarefas)].como_dict()
+    return None
+
+
+# Função para marcar como interrompidas (erro) as tarefas que um processo anterior deixou ativas no banco,
+# por exemplo com o servidor reiniciado no meio de uma gravação. Executada uma vez por processo.
+def marcar_tarefas_interrompidas():
+    global _interrompidas_marcadas
+    with _trava:
+        if _interrompidas_marcadas:
+            return
+        _interrompidas_marcadas = True
+    for tarefa in obter_tarefas_ingestao(ESTADOS_ATIVOS):
+        # As tarefas deste processo estão em memória e não são alteradas
+        obter_tarefa(tarefa['id'])
+
+
+# Função para saber se há tarefa em andamento neste processo (sem consultar o banco).
+# Enquanto houver, a interface evita escritas: a tarefa reserva o banco a cada etapa
+# e grava a data da atualização ao terminar.
+def ha_tarefa_em_andamento():
+    with _trava:
+        return bool(_tarefas)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do aplicativo ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import armazenamento
+import arquivos_snapshot
+import cache_compartilhado
+
+
+# Banco SQLite e diretório de snapshots temporários (o mesmo efeito de MANUTENCAO_DB_PATH
+# e MANUTENCAO_SNAPSHOT_DIR, sem depender da ordem de importação dos módulos). O cache compartilhado
+# começa vazio: a versão dos dados de um banco novo repete a de testes anteriores.
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'manutencao.db')
+    monkeypatch.setenv('MANUTENCAO_DB_PATH', caminho)
+    monkeypatch.setattr(armazenamento, 'DB_PATH', caminho)
+    monkeypatch.setattr(arquivos_snapshot, 'DIRETORIO_SNAPSHOTS', str(tmp_path / 'snapshots'))
+    for cache in ('_frames', '_ordens', '_indices', '_cubos'):
+        monkeypatch.setattr(cache_compartilhado, cache, {})
+    yield caminho
+    armazenamento.fechar_conexoes()
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from armazenamento import TIPO_MANUTENCAO_MENSAL, salvar_equipamentos_em_blocos, salvar_planilha, combinar_planilhas
+
+
+def _blocos():
+    return [
+        pd.DataFrame({
+            'Identificador': ['AC-001', 'AC-002'],
+            'Capacidade (BTU)': [9000, 12000],
+            'Instalação': pd.to_datetime(['2024-01-10', '2024-02-20']),
+            'Observação': [None, None],
+            'Patrimônio': [1001, 1002],
+        }),
+        pd.DataFrame({
+            'Identificador': ['AC-003', 'AC-004'],
+            'Capacidade (BTU)': [18000, 24000],
+            'Instalação': pd.to_datetime(['2024-03-30', None]),
+            'Observação': ['Troca de filtro', None],
+            'Patrimônio': ['S/N', 1004],
+        }),
+    ]
+
+
+def test_colunas_mantem_o_tipo_nativo(banco):
+    salvar_equipamentos_em_blocos(iter(_blocos()))
+    salvar_planilha(pd.DataFrame({
+        'Colaborador': ['Ana'] * 4,
+        'Identificador': ['AC-001', 'AC-002', 'AC-003', 'AC-004'],
+        'Cliente': ['C1'] * 4,
+    }), TIPO_MANUTENCAO_MENSAL)
+    df = combinar_planilhas(TIPO_MANUTENCAO_MENSAL)
+
+    assert pd.api.types.is_integer_dtype(df['Capacidade (BTU)'])
+    assert df['Capacidade (BTU)'].tolist() == [9000, 12000, 18000, 24000]
+    assert pd.api.types.is_datetime64_any_dtype(df['Instalação'])
+    assert df['Instalação'].iloc[2] == pd.Timestamp('2024-03-30')
+    # Vazia no primeiro bloco: assume o tipo do bloco seguinte
+    assert df['Observação'].tolist()[2] == 'Troca de filtro'
+    # Número em um bloco e texto no outro: a coluna inteira vira texto
+    assert df['Patrimônio'].tolist() == ['1001', '1002', 'S/N', '1004']
+
+
+def test_equipamentos_apenas_com_identificador(banco):
+    salvar_equipamentos_em_blocos(iter([pd.DataFrame({'Identificador': ['AC-001', 'AC-002']})]))
+    salvar_planilha(pd.DataFrame({'Identificador': ['AC-002', 'AC-001'], 'Cliente': ['C1', 'C2']}), TIPO_MANUTENCAO_MENSAL)
+    df = combinar_planilhas(TIPO_MANUTENCAO_MENSAL)
+
+    assert df.columns.tolist() == ['Identificador', 'Cliente']
+    assert df['Cliente'].tolist() == ['C1', 'C2']
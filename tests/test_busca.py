@@ -0,0 +1,25 @@
+import pandas as pd
+
+from busca import BUSCA_CONTEM, BUSCA_EXATA, BUSCA_PREFIXO, IndiceBusca
+
+
+def _indice():
+    return IndiceBusca(pd.Series(['AC-001', 'ac-002', 'Ac-003', 101.0, 'AC-001']))
+
+
+# As buscas diferenciam maiúsculas de minúsculas, como o filtro original com str.contains
+def test_busca_diferencia_maiusculas():
+    indice = _indice()
+    assert indice.buscar('AC', BUSCA_CONTEM).tolist() == [0, 4]
+    assert indice.buscar('c-0', BUSCA_CONTEM).tolist() == [1, 2]
+    assert indice.buscar('ac-00', BUSCA_CONTEM).tolist() == [1]
+    assert indice.buscar('ac', BUSCA_PREFIXO).tolist() == [1]
+    assert indice.buscar('ac-001', BUSCA_EXATA).tolist() == []
+    assert indice.buscar(' AC-001 ', BUSCA_EXATA).tolist() == [0, 4]
+
+
+# Identificadores numéricos são buscados no formato do banco ("101", não "101.0")
+def test_busca_identificador_numerico():
+    indice = _indice()
+    assert indice.buscar('101', BUSCA_EXATA).tolist() == [3]
+    assert indice.buscar('.0', BUSCA_CONTEM).tolist() == []
@@ -0,0 +1,98 @@
+import json
+import sqlite3
+
+import pandas as pd
+
+import armazenamento
+from armazenamento import TIPO_MANUTENCAO_MENSAL, ORIGEM_EQUIPAMENTOS
+
+
+FOTO = armazenamento.COLUNAS_FOTOS[0]
+
+
+# Banco no formato do aplicativo original: esquema da migração 1, user_version 0 e cada planilha
+# gravada como JSON (df.to_json(orient='records')) em uma linha por envio
+def _banco_legado(caminho):
+    conn = sqlite3.connect(caminho)
+    conn.executescript(armazenamento.MIGRACOES[0])
+    mensais = [
+        pd.DataFrame({
+            'Identificador': [101, 102],
+            'Colaborador': ['GWSB', 'Ana'],
+            'Cliente': ['C1', 'C2'],
+            FOTO: ['http://fotos/101.jpg', None],
+        }),
+        pd.DataFrame({'Identificador': [101, 102, 103], 'Colaborador': 'Ana', 'Cliente': 'C1'}),
+    ]
+    for dia, df in enumerate(mensais, start=1):
+        conn.execute(
+            "INSERT INTO planilha_mensal (data_upload, dados, tipo_manutencao) VALUES (?, ?, ?)",
+            (f"2024-0{dia}-01 08:00:00", df.to_json(orient='records'), TIPO_MANUTENCAO_MENSAL)
+        )
+    conn.execute(
+        "INSERT INTO equipamentos (data_upload, dados) VALUES (?, ?)",
+        ("2024-01-01 08:00:00", pd.DataFrame({'Identificador': [101, 102, 103], 'Modelo': 'Split'}).to_json(orient='records'))
+    )
+    conn.execute(
+        "INSERT INTO manutencoes_realizadas (data_upload, identificador, colaborador, cliente, data_manutencao, "
+        "tipo_manutencao, cumprimento) VALUES ('2024-02-02', '101', 'Ana', 'C1', '2024-02-02', 'mensal', 'Sim')"
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_banco_legado_migra_todos_os_snapshots(banco):
+    _banco_legado(banco)
+    armazenamento.migrar()
+
+    catalogo = armazenamento.listar_snapshots()
+    assert catalogo['legivel'].all()
+    mensal = catalogo[catalogo['origem'] == TIPO_MANUTENCAO_MENSAL].set_index('id')
+    assert mensal['linhas'].to_dict() == {2: 3, 1: 2}
+    assert mensal['atual'].to_dict() == {2: True, 1: False}
+
+    # O snapshot anterior fica no formato atual: foto em anexos e colaborador mapeado para o setor
+    with armazenamento.conexao() as conn:
+        anterior = conn.execute("SELECT colunas, dados FROM planilha_mensal WHERE id = 1").fetchone()
+        assert anterior[1] is None
+        df = armazenamento._ler_snapshot(conn, TIPO_MANUTENCAO_MENSAL, 1, json.loads(anterior[0]))
+        fotos = conn.execute(
+            "SELECT identificador, url FROM anexos_fotos WHERE origem = ? AND snapshot_id = 1", (TIPO_MANUTENCAO_MENSAL,)
+        ).fetchall()
+    assert FOTO not in df.columns
+    assert df['Identificador'].tolist() == ['101', '102']
+    assert df['Colaborador'].tolist() == ['Setor 3 GWSB e Vitor Hugo', 'Ana']
+    assert fotos == [('101', 'http://fotos/101.jpg')]
+
+    # A planilha atual continua combinada com os equipamentos e com o status já registrado
+    combinado = armazenamento.combinar_planilhas(TIPO_MANUTENCAO_MENSAL)
+    assert combinado['Modelo'].tolist() == ['Split'] * 3
+    assert armazenamento.obter_matriz_status()[armazenamento.COLUNAS_STATUS[TIPO_MANUTENCAO_MENSAL]].to_dict() == {
+        '101': True, '102': False, '103': False
+    }
+    assert catalogo.loc[catalogo['origem'] == ORIGEM_EQUIPAMENTOS, 'linhas'].tolist() == [3]
+
+
+def test_identificadores_realizados_no_formato_das_planilhas(banco):
+    _banco_legado(banco)
+    conn = sqlite3.connect(banco)
+    # str() da célula no aplicativo original: float do Excel, espaços, célula vazia e um repetido
+    conn.executemany(
+        "INSERT INTO manutencoes_realizadas (data_upload, identificador, colaborador, cliente, data_manutencao, "
+        "tipo_manutencao, cumprimento) VALUES ('2024-02-03', ?, 'Ana', 'C1', '2024-02-03', ?, 'Sim')",
+        [('101.0', 'mensal'), (' 102 ', 'mensal'), ('nan', 'mensal'), ('103.0', 'semestral'), ('AC-1.5', 'mensal')]
+    )
+    conn.commit()
+    conn.close()
+    armazenamento.migrar()
+
+    with armazenamento.conexao() as conn:
+        registros = conn.execute(
+            "SELECT identificador, tipo_manutencao FROM manutencoes_realizadas ORDER BY id"
+        ).fetchall()
+    assert registros == [('101', 'mensal'), ('102', 'mensal'), ('103', 'semestral'), ('AC-1.5', 'mensal')]
+    matriz = armazenamento.obter_matriz_status()
+    assert matriz[armazenamento.COLUNAS_STATUS[TIPO_MANUTENCAO_MENSAL]].to_dict() == {
+        '101': True, '102': True, '103': False
+    }
+    assert matriz[armazenamento.COLUNAS_STATUS['semestral']].to_dict() == {'101': False, '102': False, '103': True}
@@ -0,0 +1,147 @@
+import pandas as pd
+import pytest
+
+from armazenamento import (
+    TIPO_MANUTENCAO_MENSAL,
+    TIPO_MANUTENCAO_SEMESTRAL,
+    TIPO_MANUTENCAO_CORRETIVA,
+    COLUNAS_STATUS,
+    conexao,
+    salvar_equipamentos,
+    salvar_planilha,
+    registrar_manutencoes_diarias,
+    limpar_manutencoes_realizadas,
+    obter_identificadores_realizados,
+)
+from cache_compartilhado import _agrupar_cubo, _montar_frame, obter_cubo, obter_dados_manutencao
+
+
+# Regra original, uma consulta por linha (verificar_manutencao_realizada): um equipamento está
+# realizado se houver registro do identificador para o tipo em manutencoes_realizadas
+def _realizada_por_linha(identificador, tipo_manutencao):
+    with conexao() as conn:
+        resultado = conn.execute(
+            "SELECT COUNT(*) FROM manutencoes_realizadas WHERE identificador = ? AND tipo_manutencao = ?",
+            (identificador, tipo_manutencao)
+        ).fetchone()
+    return bool(resultado and resultado[0] > 0)
+
+
+# Planilha mensal com identificadores de texto e numéricos, alguns repetidos
+def _planilha_mensal():
+    return pd.DataFrame({
+        'Colaborador': ['Ana', 'Ana', 'Bruno', 'Bruno', 'Carla', 'Carla', 'Carla'],
+        'Identificador': ['AC-001', 'AC-002', 'AC-002', 101, 101, 102, 'AC-003'],
+        'Cliente': ['C1', 'C1', 'C2', 'C2', 'C3', 'C3', 'C3'],
+    })
+
+
+def _diaria(identificadores):
+    return pd.DataFrame({
+        'Identificador': identificadores,
+        'Colaborador': 'Ana',
+        'Cliente': 'C1',
+        'CUMPRIMENTO DOS ITENS MENCIONADOS': 'Sim',
+    })
+
+
+def _carregar(planilha):
+    salvar_equipamentos(pd.DataFrame({
+        'Identificador': ['AC-001', 'AC-002', 'AC-003', 101, 102],
+        'Modelo': ['Split', 'Split', 'Cassete', 'Janela', 'VRF'],
+    }))
+    salvar_planilha(planilha, TIPO_MANUTENCAO_MENSAL)
+
+
+# Compara, linha a linha, o status calculado de uma vez com a regra original
+def _conferir(df):
+    for tipo, coluna in COLUNAS_STATUS.items():
+        esperado = [_realizada_por_linha(identificador, tipo) for identificador in df['Identificador']]
+        assert df[coluna].tolist() == esperado, tipo
+
+
+def test_todos_pendentes(banco):
+    _carregar(_planilha_mensal())
+    df = _montar_frame(TIPO_MANUTENCAO_MENSAL)
+
+    assert len(df) == 7
+    _conferir(df)
+    for coluna in COLUNAS_STATUS.values():
+        assert not df[coluna].any()
+
+
+def test_todos_realizados(banco):
+    _carregar(_planilha_mensal())
+    registrar_manutencoes_diarias(_diaria(['AC-001', 'AC-002', 'AC-003', 101, 102]), TIPO_MANUTENCAO_MENSAL)
+    df = _montar_frame(TIPO_MANUTENCAO_MENSAL)
+
+    _conferir(df)
+    assert df[COLUNAS_STATUS[TIPO_MANUTENCAO_MENSAL]].all()
+    assert not df[COLUNAS_STATUS[TIPO_MANUTENCAO_SEMESTRAL]].any()
+
+
+def test_identificadores_misturados_e_repetidos(banco):
+    _carregar(_planilha_mensal())
+    # Repetidos na própria diária, numéricos lidos como float pelo Excel e um fora do plano
+    registrar_manutencoes_diarias(_diaria(['AC-002', 'AC-002', 101.0, 'AC-999']), TIPO_MANUTENCAO_MENSAL)
+    registrar_manutencoes_diarias(_diaria([102]), TIPO_MANUTENCAO_SEMESTRAL)
+    df = _montar_frame(TIPO_MANUTENCAO_MENSAL)
+
+    _conferir(df)
+    realizadas = dict(zip(df['Identificador'].map(str), df[COLUNAS_STATUS[TIPO_MANUTENCAO_MENSAL]]))
+    assert realizadas == {'AC-001': False, 'AC-002': True, '101': True, '102': False, 'AC-003': False}
+    # Todas as linhas de um identificador repetido têm o mesmo status
+    assert df.loc[df['Identificador'].map(str) == 'AC-002', COLUNAS_STATUS[TIPO_MANUTENCAO_MENSAL]].all()
+    assert df.loc[df['Identificador'].map(str) == '102', COLUNAS_STATUS[TIPO_MANUTENCAO_SEMESTRAL]].all()
+    assert obter_identificadores_realizados(TIPO_MANUTENCAO_MENSAL) == {'AC-002', '101', 'AC-999'}
+
+
+@pytest.mark.parametrize('tipo_manutencao', list(COLUNAS_STATUS))
+def test_status_dos_dados_compartilhados_igual_a_por_linha(banco, tipo_manutencao):
+    _carregar(_planilha_mensal())
+    registrar_manutencoes_diarias(_diaria(['AC-001', 101]), TIPO_MANUTENCAO_MENSAL)
+    registrar_manutencoes_diarias(_diaria(['AC-003', 101.0]), TIPO_MANUTENCAO_SEMESTRAL)
+    registrar_manutencoes_diarias(_diaria([' AC-002 ']), TIPO_MANUTENCAO_CORRETIVA)
+
+    # Mesmo caminho da tela: status materializado lido pelo cache compartilhado
+    df = obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL)
+    por_linha = [_realizada_por_linha(str(identificador), tipo_manutencao) for identificador in df['Identificador']]
+    assert df[COLUNAS_STATUS[tipo_manutencao]].tolist() == por_linha
+    assert any(por_linha)
+
+# Cubo em uma ordem comparável, com as dimensões vazias como None
+def _cubo_ordenado(cubo):
+    cubo = cubo.astype({'Colaborador': object, 'Cliente': object})
+    cubo = cubo.where(cubo.notna(), None)
+    colunas = ['Tipo', 'Colaborador', 'Cliente', 'Linhas', 'Total_Equipamentos', 'Manutencoes_Realizadas']
+    linhas = sorted(cubo[colunas].itertuples(index=False, name=None), key=str)
+    return [tuple(int(v) if isinstance(v, (int, float)) else v for v in linha) for linha in linhas]
+
+
+def test_contadores_acompanham_os_registros_diarios(banco):
+    # Equipamento repetido (duas linhas combinadas), linha sem identificador e sem colaborador
+    salvar_equipamentos(pd.DataFrame({
+        'Identificador': ['AC-001', 'AC-002', 'AC-002', 101, 102],
+        'Modelo': ['Split', 'Split', 'Split', 'Janela', 'VRF'],
+    }))
+    planilha = _planilha_mensal()
+    planilha.loc[len(planilha)] = [None, None, 'C3']
+    planilha.loc[len(planilha)] = [None, 'AC-004', 'C1']
+    salvar_planilha(planilha, TIPO_MANUTENCAO_MENSAL)
+
+    registros = [
+        (['AC-002', 101.0], TIPO_MANUTENCAO_MENSAL),
+        (['AC-002', 'AC-004', 'AC-999'], TIPO_MANUTENCAO_MENSAL),
+        ([102, 'AC-003'], TIPO_MANUTENCAO_SEMESTRAL),
+    ]
+    for identificadores, tipo in registros:
+        registrar_manutencoes_diarias(_diaria(identificadores), tipo)
+        df = obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL)
+        assert _cubo_ordenado(obter_cubo(df)) == _cubo_ordenado(_agrupar_cubo(df))
+
+    limpar_manutencoes_realizadas(TIPO_MANUTENCAO_MENSAL)
+    df = obter_dados_manutencao(TIPO_MANUTENCAO_MENSAL)
+    cubo = obter_cubo(df)
+    assert _cubo_ordenado(cubo) == _cubo_ordenado(_agrupar_cubo(df))
+    assert cubo.loc[cubo['Tipo'] == TIPO_MANUTENCAO_MENSAL, 'Manutencoes_Realizadas'].sum() == 0
+    assert cubo.loc[cubo['Tipo'] == TIPO_MANUTENCAO_SEMESTRAL, 'Manutencoes_Realizadas'].sum() == 2
@@ -0,0 +1,176 @@
+import io
+import os
+import sqlite3
+import time
+
+import pandas as pd
+import pytest
+
+import armazenamento
+import tarefas
+
+
+# Arquivo enviado pela interface (o Streamlit entrega um objeto com name e getvalue)
+class ArquivoEnviado(io.BytesIO):
+    def __init__(self, conteudo, name):
+        super().__init__(conteudo)
+        self.name = name
+
+
+def _aguardar(tarefa_id, limite=30):
+    inicio = time.time()
+    while tarefas.ha_tarefa_em_andamento():
+        assert time.time() - inicio < limite
+        time.sleep(0.05)
+    return tarefas.obter_tarefa(tarefa_id)
+
+
+def test_envio_nao_espera_pela_trava_de_escrita(banco):
+    armazenamento.migrar()
+    # Outra conexão reservando o banco para escrita, como uma etapa longa de gravação
+    outra = sqlite3.connect(banco, isolation_level=None)
+    outra.execute("BEGIN IMMEDIATE")
+    try:
+        inicio = time.time()
+        tarefa_id = tarefas.enviar_compactacao()
+        assert time.time() - inicio < 1
+        assert tarefas.obter_tarefa(tarefa_id)['estado'] in tarefas.ESTADOS_ATIVOS
+        assert tarefas.obter_tarefa_ativa()['id'] == tarefa_id
+    finally:
+        outra.execute("ROLLBACK")
+        outra.close()
+
+    tarefa = _aguardar(tarefa_id)
+    assert tarefa['estado'] == tarefas.ESTADO_CONCLUIDA
+    assert armazenamento.obter_tarefa_ingestao(tarefa_id)['estado'] == tarefas.ESTADO_CONCLUIDA
+
+
+def test_ids_continuam_depois_das_tarefas_gravadas(banco):
+    armazenamento.migrar()
+    primeira = _aguardar(tarefas.enviar_compactacao())['id']
+    segunda = _aguardar(tarefas.enviar_compactacao())['id']
+    assert segunda > primeira
+
+
+def test_envio_que_falha_remove_os_arquivos_copiados(banco, monkeypatch, tmp_path):
+    armazenamento.migrar()
+    monkeypatch.setattr(tarefas.tempfile, 'tempdir', str(tmp_path))
+
+    def recusar(*args, **kwargs):
+        raise RuntimeError("executor encerrado")
+
+    monkeypatch.setattr(tarefas._executor, 'submit', recusar)
+    with pytest.raises(RuntimeError):
+        tarefas.enviar_atualizacao_diaria({'mensal': ArquivoEnviado(b'conteudo', 'diaria.xlsx')})
+    assert not [nome for nome in os.listdir(tmp_path) if nome.startswith('tarefa_')]
+    assert not tarefas.ha_tarefa_em_andamento()
+
+
+def test_escrita_com_banco_ocupado(banco, monkeypatch):
+    armazenamento.migrar()
+    armazenamento.fechar_conexoes()
+    monkeypatch.setattr(armazenamento, 'TIMEOUT_SEGUNDOS', 0.1)
+    outra = sqlite3.connect(banco, isolation_level=None)
+    outra.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(armazenamento.BancoOcupadoError):
+            armazenamento.salvar_ultima_atualizacao()
+    finally:
+        outra.execute("ROLLBACK")
+        outra.close()
+    armazenamento.salvar_ultima_atualizacao()
+
+
+def _xlsx(df):
+    saida = io.BytesIO()
+    df.to_excel(saida, index=False)
+    return saida.getvalue()
+
+
+def test_planilhas_preparadas_so_aparecem_na_publicacao(banco):
+    armazenamento.salvar_equipamentos(pd.DataFrame({'Identificador': ['A', 'B'], 'Modelo': ['x', 'y']}))
+    versao = armazenamento.obter_versao_dados()
+
+    equipamentos_id = armazenamento.preparar_snapshot_em_blocos(
+        armazenamento.ORIGEM_EQUIPAMENTOS, [pd.DataFrame({'Identificador': ['A', 'B', 'C'], 'Modelo': 'z'})]
+    )
+    mensal_id = armazenamento.preparar_snapshot_em_blocos(
+        armazenamento.TIPO_MANUTENCAO_MENSAL,
+        [pd.DataFrame({'Identificador': ['A', 'C'], 'Colaborador': 'X', 'Cliente': 'Y'})]
+    )
+    # Preparados: invisíveis para as leituras e para o catálogo de versões
+    assert armazenamento.obter_versao_dados() == versao
+    assert len(armazenamento.obter_equipamentos()) == 2
+    assert armazenamento.obter_planilha_mensal() is None
+    catalogo = armazenamento.listar_snapshots()
+    assert catalogo['origem'].tolist() == [armazenamento.ORIGEM_EQUIPAMENTOS]
+
+    armazenamento.publicar_snapshots({
+        armazenamento.ORIGEM_EQUIPAMENTOS: equipamentos_id,
+        armazenamento.TIPO_MANUTENCAO_MENSAL: mensal_id,
+    })
+    assert armazenamento.obter_versao_dados() == versao + 1
+    assert len(armazenamento.obter_equipamentos()) == 3
+    assert armazenamento.obter_planilha_mensal()['Identificador'].tolist() == ['A', 'C']
+
+
+def test_erro_na_configuracao_nao_publica_nenhuma_planilha(banco, monkeypatch):
+    armazenamento.migrar()
+    preparar = tarefas.preparar_snapshot_em_blocos
+
+    def falhar_na_mensal(origem, blocos, hash_conteudo=None):
+        if origem == armazenamento.TIPO_MANUTENCAO_MENSAL:
+            raise RuntimeError("disco cheio")
+        return preparar(origem, blocos, hash_conteudo)
+
+    monkeypatch.setattr(tarefas, 'preparar_snapshot_em_blocos', falhar_na_mensal)
+    tarefa_id = tarefas.enviar_configuracao_inicial({
+        armazenamento.ORIGEM_EQUIPAMENTOS: ArquivoEnviado(
+            _xlsx(pd.DataFrame({'Identificador': [1, 2], 'Modelo': 'M'})), 'equipamentos.xlsx'
+        ),
+        armazenamento.TIPO_MANUTENCAO_MENSAL: ArquivoEnviado(
+            _xlsx(pd.DataFrame({'Identificador': [1, 2], 'Colaborador': 'X', 'Cliente': 'Y'})), 'mensal.xlsx'
+        ),
+    })
+    tarefa = _aguardar(tarefa_id, limite=120)
+    assert tarefa['estado'] == tarefas.ESTADO_ERRO
+    assert not any(armazenamento.obter_status_planilhas().values())
+    with armazenamento.conexao() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM equipamentos").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM planilha_linhas").fetchone()[0] == 0
+
+
+def test_tarefas_de_um_processo_anterior_ficam_interrompidas(banco, monkeypatch):
+    armazenamento.migrar()
+    armazenamento.criar_tarefa_ingestao(7, tarefas.TAREFA_ATUALIZACAO_DIARIA, tarefas.ESTADO_EXECUTANDO)
+    monkeypatch.setattr(tarefas, '_interrompidas_marcadas', False)
+    tarefas.marcar_tarefas_interrompidas()
+    assert armazenamento.obter_tarefa_ingestao(7)['estado'] == tarefas.ESTADO_ERRO
+    assert not armazenamento.obter_tarefas_ingestao(tarefas.ESTADOS_ATIVOS)
+
+
+def test_atualizacao_diaria_so_compacta_acima_do_limite(banco, monkeypatch):
+    armazenamento.migrar()
+    compactacoes = []
+
+    def compactar():
+        compactacoes.append(1)
+        return {'removidos': 0, 'paginas_liberadas': 0}
+
+    monkeypatch.setattr(tarefas, 'compactar_snapshots', compactar)
+    planilha = pd.DataFrame({'Identificador': [1, 2], 'Colaborador': 'X', 'Cliente': 'Y'})
+    _aguardar(tarefas.enviar_configuracao_inicial({
+        armazenamento.ORIGEM_EQUIPAMENTOS: ArquivoEnviado(
+            _xlsx(planilha[['Identificador']].assign(Modelo='M')), 'equipamentos.xlsx'
+        ),
+        armazenamento.TIPO_MANUTENCAO_MENSAL: ArquivoEnviado(_xlsx(planilha), 'mensal.xlsx'),
+    }), limite=120)
+    assert len(compactacoes) == 1
+
+    diaria = {armazenamento.TIPO_MANUTENCAO_MENSAL: ArquivoEnviado(_xlsx(planilha.head(1)), 'diaria.xlsx')}
+    assert _aguardar(tarefas.enviar_atualizacao_diaria(diaria), limite=120)['estado'] == tarefas.ESTADO_CONCLUIDA
+    assert len(compactacoes) == 1
+
+    monkeypatch.setattr(tarefas, 'LIMITE_PAGINAS_LIVRES', -1)
+    _aguardar(tarefas.enviar_atualizacao_diaria(diaria), limite=120)
+    assert len(compactacoes) == 2